@@ -24,6 +24,7 @@ interface TransactionsResponse {
   page: number;
   size: number;
   pages: number;
+  next_cursor: string | null;
 }
 
 const StatusBadge = ({ status }: { status: string }) => {
@@ -63,12 +64,18 @@ export const TransactionsPage = () => {
   const dropdownRef = useRef<HTMLDivElement>(null);
   const uniqueStatuses = ['Borrowed', 'Returned', 'Overdue'];
 
+  // Cursor for each page, learned from the previous page's next_cursor. Paging
+  // forward/back then uses keyset pagination; jumps to unseen pages use page/offset.
+  const pageCursors = useRef(new Map<string, string>());
+  const filterKey = JSON.stringify([searchTerm, sortConfig, selectedStatuses]);
+
   const { data, isLoading, isError, error } = useQuery<TransactionsResponse>({
     queryKey: ['transactions', page, searchTerm, sortConfig, selectedStatuses],
     queryFn: async () => {
       const { data } = await api.get('/transactions', {
         params: { 
           page, 
+          cursor: pageCursors.current.get(`${filterKey}|${page}`),
           limit: 50,
           search_term: searchTerm,
           sort_by: sortConfig.key,
@@ -76,6 +83,9 @@ export const TransactionsPage = () => {
           status: selectedStatuses.length > 0 ? selectedStatuses.join(',') : undefined
         }
       });
+      if (data.next_cursor) {
+        pageCursors.current.set(`${filterKey}|${page + 1}`, data.next_cursor);
+      }
       return data;
     },
     placeholderData: (previousData) => previousData, // Keep previous data while fetching new sorted data
@@ -89,6 +99,8 @@ export const TransactionsPage = () => {
       await api.delete(`/transactions/${transactionId}`);
     },
     onSuccess: () => {
+      // Deleted rows shift page boundaries, so learned cursors are stale
+      pageCursors.current.clear();
       queryClient.invalidateQueries({ queryKey: ['transactions'] });
     },
   });
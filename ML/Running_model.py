@@ -1,8 +1,6 @@
 # Libraries
 import torch
-import torch.nn as nn
 from torchvision import transforms, models
-from torchvision.models import EfficientNet_V2_S_Weights
 from PIL import Image
 
 
@@ -37,20 +35,16 @@ inference_transform = transforms.Compose([
 
 def load_model(path, num_classes):
     print("Building model architecture...")
-    # Load the base architecture
-    weights = EfficientNet_V2_S_Weights.DEFAULT
-    model = models.efficientnet_v2_s(weights=weights)
-
-    # Re-create the modified head (Vital step!)
+    # Build the architecture with our head size (Vital step!)
     # The saved file only has numbers (weights), not the structure.
     # We must rebuild the structure exactly as it was during training.
-    in_features = model.classifier[1].in_features
-    model.classifier[1] = nn.Linear(in_features, num_classes)
+    # No ImageNet weights needed - the fine-tuned file overwrites all of them.
+    model = models.efficientnet_v2_s(weights=None, num_classes=num_classes)
 
     # Load the weights
     print(f"Loading weights from {path}...")
     # map_location ensures this runs even if you trained on GPU but test on CPU
-    model.load_state_dict(torch.load(path, map_location=device))
+    model.load_state_dict(torch.load(path, map_location=device, weights_only=True))
 
     model.to(device)
     model.eval() # Set to evaluation mode (Freezes Dropout/Batch Norm)
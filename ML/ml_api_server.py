@@ -2,10 +2,7 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-import torch
-import torch.nn as nn
-from torchvision import transforms, models
-from torchvision.models import EfficientNet_V2_S_Weights
+import numpy as np
 from PIL import Image
 import io
 import os
@@ -15,8 +12,18 @@ import json
 # CONFIGURATION
 # ==========================================
 MODEL_PATH = 'efficientnet_finetuned_sprint2.pth' 
+ONNX_MODEL_PATH = 'efficientnet_finetuned_sprint2.onnx'
 CLASS_NAMES_PATH = 'class_names.json'
 
+# 'torch' (eager PyTorch) or 'onnx' (ONNX Runtime CPU, no torch/torchvision needed)
+ML_BACKEND = os.getenv('ML_BACKEND', 'torch').lower()
+
+if ML_BACKEND == 'onnx':
+    import onnxruntime as ort
+else:
+    import torch
+    from torchvision import transforms, models
+
 # Load Class Names
 try:
     with open(CLASS_NAMES_PATH, 'r') as f:
@@ -36,28 +43,36 @@ NORMALIZE_STD = [0.229, 0.224, 0.225]
 # ==========================================
 # SETUP MODEL AND TRANSFORM
 # ==========================================
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-
-# Define the Transform 
-inference_transform = transforms.Compose([
-    transforms.Resize((IMG_SIZE, IMG_SIZE)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=NORMALIZE_MEAN, std=NORMALIZE_STD)
-])
+if ML_BACKEND == 'onnx':
+    device = "cpu"
+else:
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    # Define the Transform 
+    inference_transform = transforms.Compose([
+        transforms.Resize((IMG_SIZE, IMG_SIZE)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=NORMALIZE_MEAN, std=NORMALIZE_STD)
+    ])
+
+def preprocess_numpy(image):
+    # Same as inference_transform, in plain numpy for the ONNX backend
+    resized = image.resize((IMG_SIZE, IMG_SIZE), Image.BILINEAR)
+    array = np.asarray(resized, dtype=np.float32).transpose(2, 0, 1) / 255.0
+    mean = np.array(NORMALIZE_MEAN, dtype=np.float32).reshape(3, 1, 1)
+    std = np.array(NORMALIZE_STD, dtype=np.float32).reshape(3, 1, 1)
+    return (array - mean) / std
 
 def load_model(path, num_classes):
     print("Building model architecture...")
-    weights = EfficientNet_V2_S_Weights.DEFAULT
-    model = models.efficientnet_v2_s(weights=weights)
-
-    # Re-create the modified head
-    in_features = model.classifier[1].in_features
-    model.classifier[1] = nn.Linear(in_features, num_classes)
+    # No ImageNet weights: the fine-tuned file overwrites every parameter anyway,
+    # so skip the download / torchvision cache (works offline)
+    model = models.efficientnet_v2_s(weights=None, num_classes=num_classes)
 
     # Load the weights
     print(f"Loading weights from {path}...")
     if os.path.exists(path):
-        model.load_state_dict(torch.load(path, map_location=device))
+        model.load_state_dict(torch.load(path, map_location=device, weights_only=True))
     else:
         print(f"WARNING: Model file not found at {path}. Server handles requests but prediction will fail unless model is loaded.")
 
@@ -65,13 +80,43 @@ def load_model(path, num_classes):
     model.eval() 
     return model
 
+def load_onnx_model(path):
+    # Exported with Server/scripts/export_onnx.py
+    print(f"Loading ONNX model from {path}...")
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+
+    metadata = session.get_modelmeta().custom_metadata_map
+    if not CLASS_NAMES and 'class_names' in metadata:
+        CLASS_NAMES.extend(json.loads(metadata['class_names']))
+    return session
+
+def run_model(image):
+    """Returns the softmax probabilities for one image as a 1D numpy array"""
+    if ML_BACKEND == 'onnx':
+        input_batch = preprocess_numpy(image)[np.newaxis]
+        logits = model.run(None, {model.get_inputs()[0].name: input_batch})[0][0]
+        exp = np.exp(logits - logits.max())
+        return exp / exp.sum()
+
+    input_tensor = inference_transform(image)
+    input_batch = input_tensor.unsqueeze(0).to(device)
+    with torch.no_grad():
+        output = model(input_batch)
+        return torch.nn.functional.softmax(output[0], dim=0).cpu().numpy()
+
 # Initialize model on startup
-print("Initializing ML Model...")
+print(f"Initializing ML Model... (backend: {ML_BACKEND})")
 model = None
-if os.path.exists(MODEL_PATH):
-    model = load_model(MODEL_PATH, len(CLASS_NAMES))
+active_model_path = ONNX_MODEL_PATH if ML_BACKEND == 'onnx' else MODEL_PATH
+if os.path.exists(active_model_path):
+    if ML_BACKEND == 'onnx':
+        model = load_onnx_model(active_model_path)
+    else:
+        model = load_model(active_model_path, len(CLASS_NAMES))
 else:
-    print(f"Error: Model path {MODEL_PATH} does not exist.")
+    print(f"Error: Model path {active_model_path} does not exist.")
 
 # ==========================================
 # API SETUP
@@ -88,7 +133,7 @@ app.add_middleware(
 
 @app.get("/")
 def health_check():
-    return {"status": "running", "model_loaded": model is not None, "device": str(device)}
+    return {"status": "running", "model_loaded": model is not None, "device": str(device), "backend": ML_BACKEND}
 
 @app.post("/predict")
 async def predict_tool(file: UploadFile = File(...)):
@@ -103,23 +148,16 @@ async def predict_tool(file: UploadFile = File(...)):
         contents = await file.read()
         image = Image.open(io.BytesIO(contents)).convert('RGB')
         
-        # Preprocess
-        input_tensor = inference_transform(image)
-        input_batch = input_tensor.unsqueeze(0).to(device)
-
-        # Predict
-        with torch.no_grad():
-            output = model(input_batch)
-            probabilities = torch.nn.functional.softmax(output[0], dim=0)
+        # Preprocess + Predict
+        probabilities = run_model(image)
             
-            # Get top prediction
-            top_prob, top_catid = torch.topk(probabilities, 1)
-            class_id = top_catid.item()
-            score = top_prob.item()
-            class_name = CLASS_NAMES[class_id]
-            
-            # Get all probabilities for detailed response if needed
-            all_probs = {CLASS_NAMES[i]: prob.item() for i, prob in enumerate(probabilities)}
+        # Get top prediction
+        class_id = int(np.argmax(probabilities))
+        score = float(probabilities[class_id])
+        class_name = CLASS_NAMES[class_id]
+        
+        # Get all probabilities for detailed response if needed
+        all_probs = {CLASS_NAMES[i]: float(prob) for i, prob in enumerate(probabilities)}
 
         return {
             "success": True,
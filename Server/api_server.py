@@ -10,9 +10,7 @@ import secrets
 import io
 import json
 import torch
-import torch.nn as nn
 from torchvision import transforms, models
-from torchvision.models import EfficientNet_V2_S_Weights
 from PIL import Image
 from dotenv import load_dotenv
 from datetime import datetime, date, timedelta
@@ -90,17 +88,14 @@ def load_ml_model():
 
     print("[ML] Loading AI Model... (This may take a few seconds)")
     try:
-        weights = EfficientNet_V2_S_Weights.DEFAULT
-        model = models.efficientnet_v2_s(weights=weights)
-        
-        # Rebuild Head
-        in_features = model.classifier[1].in_features
         # Ensure we have class names to determine output size, default to 15 if missing
         num_classes = len(CLASS_NAMES) if CLASS_NAMES else 15
-        model.classifier[1] = nn.Linear(in_features, num_classes)
+        # Build without ImageNet weights (no download/cache needed) - the fine-tuned
+        # state_dict below overwrites every parameter anyway
+        model = models.efficientnet_v2_s(weights=None, num_classes=num_classes)
         
         # Load Weights
-        model.load_state_dict(torch.load(MODEL_PATH, map_location=device))
+        model.load_state_dict(torch.load(MODEL_PATH, map_location=device, weights_only=True))
         model.to(device)
         model.eval()
         ml_model = model
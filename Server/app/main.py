@@ -19,6 +19,10 @@ app.add_middleware(
 async def startup_event():
     # Load ML Model
     ml_service.load_ml_model()
+    ml_service.start_batch_scheduler()
+    ml_service.start_inference_executor()
+    ml_service.load_embedding_index()
+    ml_service.start_shadow_evaluation()
     
     # Init Paths
     image_service.init_image_dirs()
@@ -26,6 +30,14 @@ async def startup_event():
     # Run cleanup
     image_service.cleanup_temp_files(max_age_hours=24)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    ml_service.stop_shadow_evaluation()
+    ml_service.stop_inference_executor()
+    ml_service.stop_batch_scheduler()
+    ml_service.unload_ml_model()
+    ml_service.close_prediction_log()
+
 # Include Routers
 app.include_router(auth.router)
 app.include_router(tools.router)
@@ -1,32 +1,202 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks, Request
+from typing import Optional
 from app.services import ml_service, image_service
-from PIL import Image
-import io
+from app.services.raw_image import is_raw_image, RawImageError
+from app.services.inference_executor import InferenceRejected, QueueFullError
+from app.services.embedding_index import StaleIndexError
 
 router = APIRouter()
 
+def _save_upload(contents: bytes, background_tasks: BackgroundTasks) -> str:
+    """Saves the upload to temp storage and returns its image_filename"""
+    if not is_raw_image(contents):
+        return image_service.save_temp_image(contents)
+    # Raw pixel uploads are JPEG-encoded for storage after the response is sent
+    image_filename = image_service.new_temp_filename()
+    background_tasks.add_task(image_service.save_temp_raw_image, image_filename, contents)
+    return image_filename
+
+def _shed(e: InferenceRejected) -> HTTPException:
+    """429 when the inference queue is full, 503 when the deadline passed; both with Retry-After"""
+    status_code = 429 if isinstance(e, QueueFullError) else 503
+    return HTTPException(status_code=status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
 @router.post("/identify_tool")
-async def identify_tool(file: UploadFile = File(...)):
+async def identify_tool(request: Request, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """
     Receives an image file, runs it through the loaded ML model, 
     and returns the predicted tool class and classification score.
     Also returns an image_filename referencing the saved temp file.
+    The file can be a JPEG/PNG or a raw RGB buffer (application/x-toole-rgb8, see raw_image.py).
     """
     try:
         # 1. Read the file content
         contents = await file.read()
         
-        # 2. Save temp image
-        image_filename = image_service.save_temp_image(contents)
-        
-        # 3. Predict
-        image = Image.open(io.BytesIO(contents)).convert('RGB')
-        result = ml_service.predict_image(image)
+        # 2. Decode + predict on the inference executor (keeps the event loop free).
+        #    Shed requests fail here, before anything is written to disk.
+        result = await ml_service.run_inference(ml_service.predict_image_bytes, contents,
+                                                is_disconnected=request.is_disconnected)
         
-        result["image_filename"] = image_filename
+        # 3. Save temp image
+        result["image_filename"] = _save_upload(contents, background_tasks)
         result["success"] = True
+
+        # 4. After the response: persist the prediction, and let the candidate
+        #    model see a sample of traffic
+        background_tasks.add_task(ml_service.log_predictions, [contents], [result])
+        if ml_service.shadow_evaluator.should_sample():
+            background_tasks.add_task(ml_service.submit_shadow, contents, result, result["image_filename"])
         return result
 
+    except InferenceRejected as e:
+        raise _shed(e)
+    except RawImageError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid raw image: {str(e)}")
     except Exception as e:
         print(f"[ML] Prediction Error: {e}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+@router.post("/identify_tool/batch")
+async def identify_tool_batch(request: Request, background_tasks: BackgroundTasks, files: list[UploadFile] = File(...)):
+    """
+    Identifies several tools in one request (e.g. a multi-tool borrow session).
+    All images run through the model as a single batch; results are returned
+    in upload order, each with its own image_filename.
+    """
+    if len(files) > ml_service.BATCH_ENDPOINT_MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"Too many images (max {ml_service.BATCH_ENDPOINT_MAX_IMAGES})")
+
+    try:
+        contents_list = [await file.read() for file in files]
+
+        predictions = await ml_service.run_inference(ml_service.predict_images_bytes, contents_list,
+                                                     is_disconnected=request.is_disconnected)
+
+        results = []
+        for prediction, contents in zip(predictions, contents_list):
+            prediction["image_filename"] = _save_upload(contents, background_tasks)
+            results.append(prediction)
+        background_tasks.add_task(ml_service.log_predictions, contents_list, results)
+        return {"success": True, "results": results}
+
+    except InferenceRejected as e:
+        raise _shed(e)
+    except RawImageError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid raw image: {str(e)}")
+    except Exception as e:
+        print(f"[ML] Batch Prediction Error: {e}")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+@router.post("/identify_tool/knn")
+async def identify_tool_knn(request: Request, file: UploadFile = File(...), k: Optional[int] = None):
+    """
+    Identifies a tool by nearest-neighbour search over embeddings of confirmed
+    captures. Works for tools added after the classifier was trained.
+    """
+    try:
+        contents = await file.read()
+        result = await ml_service.run_inference(ml_service.knn_predict_image_bytes, contents, k,
+                                                is_disconnected=request.is_disconnected)
+        result["success"] = True
+        return result
+
+    except InferenceRejected as e:
+        raise _shed(e)
+    except RawImageError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid raw image: {str(e)}")
+    except StaleIndexError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        print(f"[ML] k-NN Prediction Error: {e}")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+@router.get("/ml/index")
+async def get_embedding_index():
+    return ml_service.embedding_index.get_stats()
+
+@router.post("/ml/index/refresh")
+async def refresh_embedding_index(background_tasks: BackgroundTasks):
+    """Incrementally re-indexes captured_images/Yes in the background"""
+    if ml_service.embedding_index.get_stats()["refreshing"]:
+        raise HTTPException(status_code=409, detail="An index refresh is already running")
+    background_tasks.add_task(_run_index_refresh)
+    return {"success": True, "message": "Index refresh started"}
+
+def _run_index_refresh():
+    try:
+        ml_service.refresh_embedding_index()
+    except Exception as e:
+        print(f"[ML] Index refresh failed: {e}")
+
+@router.get("/ml/models")
+async def get_model_versions():
+    """Lists registry versions plus the active and resident rollback versions"""
+    return ml_service.get_model_versions()
+
+@router.post("/ml/models/{version}/activate")
+async def activate_model_version(version: str, background_tasks: BackgroundTasks):
+    """
+    Loads a registry version in the background, warms it up and swaps it in
+    atomically. Requests keep being served by the current model meanwhile.
+    """
+    if ml_service.model_load_status["state"] == "loading":
+        raise HTTPException(status_code=409, detail="A model version is already loading")
+    try:
+        ml_service.model_registry.get(version)
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=404, detail=f"Model version not found: {e}")
+
+    ml_service.model_load_status.update(state="loading", version=version, error=None)
+    background_tasks.add_task(_run_model_activation, version)
+    return {"success": True, "message": f"Loading model version {version}"}
+
+def _run_model_activation(version):
+    try:
+        ml_service.activate_model_version(version)
+    except Exception:
+        pass  # Already logged and recorded in model_load_status
+
+@router.post("/ml/models/rollback")
+async def rollback_model():
+    """Instantly swaps back to the previous model (kept in memory)"""
+    try:
+        ml_service.rollback_model()
+    except Exception as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"success": True, "active_version": ml_service.active_version}
+
+@router.get("/ml/shadow")
+async def get_shadow_stats():
+    """Agreement and accuracy of the shadow candidate against the served model"""
+    return ml_service.get_shadow_stats()
+
+@router.post("/ml/shadow/{version}")
+async def start_shadow_evaluation(version: str, background_tasks: BackgroundTasks):
+    """Loads a registry version in the background and starts shadow-evaluating it (stats restart)"""
+    if ml_service.shadow_load_status["state"] == "loading":
+        raise HTTPException(status_code=409, detail="A shadow model version is already loading")
+    try:
+        ml_service.model_registry.get(version)
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=404, detail=f"Model version not found: {e}")
+
+    ml_service.shadow_load_status.update(state="loading", version=version, error=None)
+    background_tasks.add_task(_run_shadow_load, version)
+    return {"success": True, "message": f"Loading shadow model version {version}"}
+
+def _run_shadow_load(version):
+    try:
+        ml_service.load_shadow_model(version)
+    except Exception:
+        pass  # Already logged and recorded in shadow_load_status
+
+@router.delete("/ml/shadow")
+async def stop_shadow_evaluation():
+    ml_service.stop_shadow_evaluation()
+    return {"success": True, "message": "Shadow evaluation stopped"}
+
+@router.get("/ml/stats")
+async def get_ml_stats():
+    """Returns inference scheduler and executor stats (queue depth, batch sizes, timings) for tuning"""
+    return ml_service.get_ml_stats()
@@ -1,13 +1,81 @@
+import os
+import json
+import base64
 from fastapi import APIRouter, HTTPException
 from sqlalchemy import text
 from typing import Optional
 from datetime import datetime
 from app.models import TransactionInput, TransactionUpdate, TransactionBatchInput
 from app.database import engine_tools
-from app.services import image_service
+from app.services import image_service, ml_service
+from app.services.count_cache import CountCache
 
 router = APIRouter()
 
+# Totals for GET /transactions?approximate_total=true, cached per filter set.
+# Writes through this router clear it, but writes through other workers or
+# api_server.py don't, so a cached total can lag by up to the TTL.
+count_cache = CountCache(ttl_seconds=float(os.getenv('TRANSACTIONS_COUNT_TTL_SECONDS', '10')))
+
+def _approximate_row_count(conn):
+    """InnoDB's row estimate for the whole table (no scan), or None where unavailable"""
+    try:
+        return conn.execute(text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'transactions'"
+        )).scalar()
+    except Exception:
+        # Not MySQL (e.g. the SQLite benchmark database)
+        conn.rollback()
+        return None
+
+# --- Keyset pagination ---
+# OFFSET makes the database read and discard every earlier row, so deep pages get
+# slower and slower. With sort_by=dateOut each page also returns next_cursor, an
+# opaque token for its last (checkout_timestamp, transaction_id). Passing it back
+# as ?cursor= continues right after that row through the
+# (checkout_timestamp, transaction_id) index, at the same cost for every page.
+#
+# checkout_timestamp is nullable. MySQL (and SQLite) sort NULLs first ascending
+# and last descending, and NULL never satisfies < / = / >, so the keyset matches
+# NULL-timestamp rows explicitly; otherwise cursor pages would skip rows that
+# OFFSET pages and the total include.
+
+def _encode_cursor(checkout_timestamp, transaction_id, sort_order) -> str:
+    if isinstance(checkout_timestamp, datetime):
+        checkout_timestamp = checkout_timestamp.isoformat()
+    elif checkout_timestamp is not None:
+        checkout_timestamp = str(checkout_timestamp)
+    payload = json.dumps({"ts": checkout_timestamp, "id": transaction_id, "order": sort_order})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor: str, sort_order: str):
+    """Returns (checkout_timestamp or None, transaction_id)"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        checkout_timestamp = None if payload["ts"] is None else datetime.fromisoformat(payload["ts"])
+        transaction_id = int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if payload.get("order") != sort_order:
+        raise HTTPException(status_code=400, detail="Cursor was issued for a different sort order")
+    return checkout_timestamp, transaction_id
+
+def _keyset_condition(sort_order, cursor_ts_is_null) -> str:
+    """Rows after the cursor row in ORDER BY checkout_timestamp, transaction_id (NULLs lowest)"""
+    if sort_order == 'desc':
+        if cursor_ts_is_null:
+            # Only the remaining NULL rows, which come last
+            return "(t.checkout_timestamp IS NULL AND t.transaction_id < :cursor_id)"
+        return ("(t.checkout_timestamp < :cursor_ts "
+                "OR (t.checkout_timestamp = :cursor_ts AND t.transaction_id < :cursor_id) "
+                "OR t.checkout_timestamp IS NULL)")
+    if cursor_ts_is_null:
+        # The remaining NULL rows, then every row with a timestamp
+        return "(t.checkout_timestamp IS NOT NULL OR t.transaction_id > :cursor_id)"
+    return ("(t.checkout_timestamp > :cursor_ts "
+            "OR (t.checkout_timestamp = :cursor_ts AND t.transaction_id > :cursor_id))")
+
 @router.get("/transactions")
 async def get_transactions(
     user_id: Optional[int] = None, 
@@ -18,8 +86,23 @@ async def get_transactions(
     sort_by: str = 'dateOut',
     sort_order: str = 'desc',
     search_term: Optional[str] = None,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    approximate_total: bool = False
 ):
+    """
+    Page through transactions with page/limit (OFFSET), or with cursor: pass the
+    previous response's next_cursor to get the rows after it (sort_by=dateOut only).
+    include_total=false skips the count (total/pages are null; use has_more).
+    approximate_total=true answers an unfiltered count from table statistics and
+    a filtered one from a per-process cache that can lag writes by up to
+    TRANSACTIONS_COUNT_TTL_SECONDS (total_approximate tells which). Without it
+    the total is always counted exactly.
+    """
+    sort_order = 'asc' if sort_order.lower() == 'asc' else 'desc'
+    if cursor and sort_by != 'dateOut':
+        raise HTTPException(status_code=400, detail="cursor pagination requires sort_by=dateOut")
     offset = (page - 1) * limit
     with engine_tools.connect() as conn:
         conditions = []
@@ -37,6 +120,7 @@ async def get_transactions(
             conditions.append("t.checkout_timestamp < DATE_ADD(:end_date, INTERVAL 1 DAY)")
             params["end_date"] = end_date
 
+        status_filter = set()
         if status:
             status_list = status.split(',')
             status_conditions = []
@@ -48,6 +132,9 @@ async def get_transactions(
                     status_conditions.append("(t.return_timestamp IS NULL AND t.desired_return_date < NOW())")
                 elif s == 'Borrowed':
                     status_conditions.append("(t.return_timestamp IS NULL AND (t.desired_return_date >= NOW() OR t.desired_return_date IS NULL))")
+                else:
+                    continue
+                status_filter.add(s)
             
             if status_conditions:
                 conditions.append(f"({' OR '.join(status_conditions)})")
@@ -58,20 +145,39 @@ async def get_transactions(
 
         where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
 
-        order_clause = "ORDER BY t.checkout_timestamp DESC"
+        order_clause = "ORDER BY t.checkout_timestamp DESC, t.transaction_id DESC"
         if sort_by == 'dateOut':
-            order_clause = f"ORDER BY t.checkout_timestamp {sort_order.upper()}"
+            # transaction_id breaks timestamp ties, so pages never overlap or skip rows
+            order_clause = f"ORDER BY t.checkout_timestamp {sort_order.upper()}, t.transaction_id {sort_order.upper()}"
         elif sort_by == 'dateDue':
             order_clause = f"ORDER BY t.desired_return_date {sort_order.upper()}"
 
-        count_sql = f"""
-            SELECT COUNT(*) 
-            FROM transactions t 
-            LEFT JOIN users u ON t.user_id = u.user_id
-            LEFT JOIN tools tl ON t.tool_id = tl.tool_id
-            {where_clause}
-        """
-        total = conn.execute(text(count_sql), params).scalar()
+        # The cursor only narrows the page query; the total still covers the whole filter
+        page_where_clause = where_clause
+        if cursor:
+            cursor_ts, cursor_id = _decode_cursor(cursor, sort_order)
+            keyset = _keyset_condition(sort_order, cursor_ts is None)
+            page_where_clause = f"{where_clause} AND {keyset}" if where_clause else f" WHERE {keyset}"
+
+        total = None
+        total_approximate = False
+        if include_total:
+            # Same filters in another order/case are the same count
+            count_key = (user_id, start_date, end_date, tuple(sorted(status_filter)),
+                         search_term.lower() if search_term else None)
+            if approximate_total:
+                if not conditions:
+                    total = _approximate_row_count(conn)
+                if total is None:
+                    total = count_cache.get(count_key)
+                total_approximate = total is not None
+            if total is None:
+                generation = count_cache.generation
+                # The filters only touch t.*, so the count needs no joins
+                count_sql = f"SELECT COUNT(*) FROM transactions t {where_clause}"
+                total = conn.execute(text(count_sql), params).scalar()
+                if approximate_total:
+                    count_cache.set(count_key, total, generation)
 
         base_sql = f"""
             SELECT t.transaction_id, t.user_id, t.tool_id, t.checkout_timestamp, 
@@ -81,19 +187,35 @@ async def get_transactions(
             FROM transactions t
             LEFT JOIN users u ON t.user_id = u.user_id
             LEFT JOIN tools tl ON t.tool_id = tl.tool_id
-            {where_clause}
+            {page_where_clause}
             {order_clause}
         """
         
+        page_params = dict(params)
+        if cursor:
+            # limit <= 0 with a cursor returns every row after it
+            page_params["cursor_id"] = cursor_id
+            if cursor_ts is not None:
+                page_params["cursor_ts"] = cursor_ts
         if limit > 0:
-            base_sql += " LIMIT :limit OFFSET :offset"
-            params["limit"] = limit
-            params["offset"] = offset
+            # One extra row tells whether there is a next page
+            page_params["limit"] = limit + 1
+            if cursor:
+                base_sql += " LIMIT :limit"
+            else:
+                base_sql += " LIMIT :limit OFFSET :offset"
+                page_params["offset"] = offset
             
-        result = conn.execute(text(base_sql), params)
+        rows = conn.execute(text(base_sql), page_params).fetchall()
+        has_more = limit > 0 and len(rows) > limit
+        rows = rows[:limit] if has_more else rows
+
+        next_cursor = None
+        if has_more and sort_by == 'dateOut':
+            next_cursor = _encode_cursor(rows[-1].checkout_timestamp, rows[-1].transaction_id, sort_order)
         
         transactions = []
-        for row in result:
+        for row in rows:
             status = "Borrowed"
             if row.return_timestamp:
                 status = "Returned"
@@ -117,16 +239,22 @@ async def get_transactions(
         return {
             "items": transactions,
             "total": total,
+            "total_approximate": total_approximate,
             "page": page,
             "size": limit,
-            "pages": (total + limit - 1) // limit if limit > 0 else 1
+            "pages": ((total + limit - 1) // limit if limit > 0 else 1) if total is not None else None,
+            "has_more": has_more,
+            "next_cursor": next_cursor
         }
 
 @router.post("/transactions")
 async def create_transaction(transaction: TransactionInput):
+    after_commit = []
     with engine_tools.connect() as conn:
-        _process_single_transaction(conn, transaction)
+        _process_single_transaction(conn, transaction, after_commit)
         conn.commit()
+    count_cache.clear()
+    _run_after_commit(after_commit)
 
     return {"success": True, "message": "Transaction created successfully"}
 
@@ -136,21 +264,36 @@ async def create_transaction_batch(batch: TransactionBatchInput):
     Creates multiple transactions in one atomic operation.
     If any transaction fails, the entire batch is rolled back.
     """
+    after_commit = []
     with engine_tools.begin() as conn: # 'begin()' starts a transaction
         count = 0
         for transaction in batch.transactions:
             try:
-                _process_single_transaction(conn, transaction)
+                _process_single_transaction(conn, transaction, after_commit)
                 count += 1
             except Exception as e:
                 # SQLAlchemy's context manager will auto-rollback on exception
                 print(f"[SERVER] Batch Error on item {count}: {e}")
                 raise HTTPException(status_code=500, detail=f"Failed to process item {count+1}: {str(e)}")
+    count_cache.clear()
+    _run_after_commit(after_commit)
     
     return {"success": True, "message": f"Successfully created {count} transactions"}
 
-def _process_single_transaction(conn, transaction: TransactionInput):
-    """Helper to process logic for a single transaction inside an existing connection"""
+def _run_after_commit(callbacks):
+    """Runs the ML bookkeeping of committed transactions; a failure there must not fail the request"""
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            print(f"[SERVER] Post-commit ML bookkeeping failed: {e}")
+
+def _process_single_transaction(conn, transaction: TransactionInput, after_commit: list):
+    """
+    Helper to process logic for a single transaction inside an existing connection.
+    Side effects outside the database are appended to after_commit, so they only
+    run once the caller's transaction has committed.
+    """
     
     # --- Handle Image Move Logic ---
     if transaction.image_path:
@@ -163,11 +306,18 @@ def _process_single_transaction(conn, transaction: TransactionInput):
                   tool_name = tool_row[0]
                   is_correct = transaction.classification_correct if transaction.classification_correct is not None else False
                   
-                  new_path = image_service.move_image_to_permanent(transaction.image_path, tool_name, is_correct)
+                  temp_filename = transaction.image_path
+                  new_path = image_service.move_image_to_permanent(temp_filename, tool_name, is_correct)
                   
                   if new_path:
                       print(f"[SERVER] Moved image to {new_path}")
                       transaction.image_path = new_path
+                      # Link the upload's logged prediction, and label it for the shadow candidate,
+                      # once the borrow is committed (a failed batch rolls every item back)
+                      correct = transaction.classification_correct
+                      after_commit.append(lambda: ml_service.link_prediction_image(temp_filename, new_path))
+                      after_commit.append(lambda: ml_service.record_shadow_label(temp_filename, tool_name,
+                                                                                 correct, new_path))
                   else:
                       print(f"[SERVER] Warning: Image path provided {transaction.image_path} but file not found in temp.")
 
@@ -206,6 +356,7 @@ async def delete_transaction(transaction_id: int):
             {"id": transaction_id},
         )
         conn.commit()
+    count_cache.clear()
 
     return {"success": True, "message": "Transaction deleted successfully"}
 
@@ -256,5 +407,6 @@ async def update_transaction(transaction_id: int, transaction: TransactionUpdate
         sql = f"UPDATE transactions SET {', '.join(updates)} WHERE transaction_id = :id"
         conn.execute(text(sql), params)
         conn.commit()
+    count_cache.clear()
 
     return {"success": True, "message": "Transaction updated successfully"}
@@ -0,0 +1,156 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+# ==========================================
+# DYNAMIC MICRO-BATCHING
+# ==========================================
+# Concurrent /identify_tool calls each submit one image. A single worker thread
+# drains the queue, waits up to max_wait_ms for more requests to arrive, and runs
+# them through the model as one tensor batch. Every caller gets its own Future.
+
+class BatchScheduler:
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=15.0, name="ml-batch"):
+        """
+        batch_fn: callable taking a list of items and returning a list of results
+                  in the same order.
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+
+        # Stats
+        self._total_requests = 0
+        self._total_batches = 0
+        self._total_errors = 0
+        self._batch_size_histogram = {}
+        self._total_queue_wait = 0.0
+        self._total_batch_time = 0.0
+        self._max_queue_depth = 0
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        print(f"[ML] Batch scheduler started (max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait * 1000:.0f})")
+
+    def stop(self, timeout=5.0):
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put(None)  # Wake the worker up
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._running
+
+    def submit(self, item) -> Future:
+        """Queues a single item and returns a Future resolving to its result."""
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        depth = self._queue.qsize()
+        with self._lock:
+            if depth > self._max_queue_depth:
+                self._max_queue_depth = depth
+        return future
+
+    def _run(self):
+        while self._running:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._running = False
+                    break
+                batch.append(entry)
+
+            self._process(batch)
+
+        # Fail anything still waiting so callers don't hang forever
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not None:
+                entry[1].set_exception(RuntimeError("Batch scheduler stopped"))
+
+    def _process(self, batch):
+        # Drop requests whose callers already gave up
+        batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        items = [entry[0] for entry in batch]
+        try:
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                print(f"[ML] Batch of {len(batch)} failed: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                with self._lock:
+                    self._total_errors += 1
+                return
+            finished = time.perf_counter()
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+        finally:
+            # Whatever went wrong above, no caller may be left waiting
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Batch processing was interrupted"))
+
+        with self._lock:
+            size = len(batch)
+            self._total_requests += size
+            self._total_batches += 1
+            self._batch_size_histogram[size] = self._batch_size_histogram.get(size, 0) + 1
+            self._total_queue_wait += sum(started - enqueued for _, _, enqueued in batch)
+            self._total_batch_time += finished - started
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            batches = self._total_batches
+            requests = self._total_requests
+            return {
+                "running": self._running,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "total_requests": requests,
+                "total_batches": batches,
+                "total_errors": self._total_errors,
+                "avg_batch_size": requests / batches if batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_size_histogram.items())),
+                "avg_queue_wait_ms": (self._total_queue_wait / requests * 1000) if requests else 0.0,
+                "avg_batch_time_ms": (self._total_batch_time / batches * 1000) if batches else 0.0,
+            }
@@ -0,0 +1,82 @@
+import time
+import threading
+import numpy as np
+
+# ==========================================
+# TWO-STAGE MODEL CASCADE
+# ==========================================
+# Most kiosk captures are easy, high-confidence classes. Every image goes through
+# a small, fast model first; only images whose top-1 probability is below the
+# threshold are re-run on the full EfficientNetV2-S. Each result records which
+# stage answered it.
+
+class CascadeBackend:
+    def __init__(self, fast_backend, full_backend, threshold=0.9):
+        self.fast = fast_backend
+        self.full = full_backend
+        self.threshold = float(threshold)
+        self.name = f"cascade({fast_backend.name}->{full_backend.name})"
+        self.class_names = getattr(full_backend, 'class_names', None)
+        self.model = getattr(full_backend, 'model', None)
+
+        self._lock = threading.Lock()
+        self._images = 0
+        self._fast_hits = 0
+        self._fast_time = 0.0
+        self._full_time = 0.0
+
+    def predict_detailed(self, images):
+        """Returns (probabilities, [{"stage": "fast"|"full"}, ...])"""
+        started = time.perf_counter()
+        probabilities = self.fast.predict_proba(images)
+        fast_done = time.perf_counter()
+
+        confident = probabilities.max(axis=1) >= self.threshold
+        escalate = np.flatnonzero(~confident)
+        details = [{"stage": "fast" if c else "full"} for c in confident]
+        if len(escalate):
+            probabilities = probabilities.copy()
+            escalated_images = [images[i] for i in escalate]
+            if hasattr(self.full, 'predict_detailed'):
+                # Keep the full backend's own details (e.g. progressive resolution)
+                full_probabilities, full_details = self.full.predict_detailed(escalated_images)
+                for i, detail in zip(escalate, full_details):
+                    details[i].update(detail)
+            else:
+                full_probabilities = self.full.predict_proba(escalated_images)
+            probabilities[escalate] = full_probabilities
+        full_done = time.perf_counter()
+
+        with self._lock:
+            self._images += len(images)
+            self._fast_hits += int(confident.sum())
+            self._fast_time += fast_done - started
+            self._full_time += full_done - fast_done
+
+        return probabilities, details
+
+    def predict_proba(self, images):
+        return self.predict_detailed(images)[0]
+
+    def shutdown(self):
+        if hasattr(self.full, 'shutdown'):
+            self.full.shutdown()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            images = self._images
+            escalated = images - self._fast_hits
+            stats = {
+                "threshold": self.threshold,
+                "images": images,
+                "fast_hits": self._fast_hits,
+                "escalated": escalated,
+                "hit_rate": self._fast_hits / images if images else 0.0,
+                # Every image pays for the fast stage; only escalations pay for the full one
+                "fast_ms_per_image": (self._fast_time / images * 1000) if images else 0.0,
+                "full_ms_per_escalation": (self._full_time / escalated * 1000) if escalated else 0.0,
+                "avg_ms_per_image": ((self._fast_time + self._full_time) / images * 1000) if images else 0.0,
+            }
+        if hasattr(self.full, 'get_stats'):
+            stats["full_backend"] = self.full.get_stats()
+        return stats
@@ -0,0 +1,74 @@
+import time
+import threading
+from collections import OrderedDict
+
+# ==========================================
+# COUNT CACHE
+# ==========================================
+# GET /transactions needs the total row count for its pager, and a COUNT(*) over
+# the filtered table costs about as much as fetching the page itself. Paging
+# through the same filter repeats the same count, so when the client accepts an
+# approximate total (approximate_total=true) it is cached per normalized filter
+# set for a few seconds. Writes through the transactions router call clear().
+# The cache is per server process, so a total can lag a write made through
+# another worker or api_server.py by at most the TTL.
+
+class CountCache:
+    def __init__(self, ttl_seconds=10.0, max_entries=256):
+        self.ttl = float(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict()  # key -> (count, expires_at)
+        self._lock = threading.Lock()
+        self.generation = 0  # Bumped by clear()
+
+        # Stats
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, key):
+        """Returns the cached count, or None"""
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self._entries.pop(key, None)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def set(self, key, count, generation=None):
+        """
+        generation: self.generation read before counting. A write that happened
+        meanwhile makes the count stale, so it is not stored.
+        """
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (count, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self._invalidations += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / lookups) if lookups else 0.0,
+                "invalidations": self._invalidations,
+            }
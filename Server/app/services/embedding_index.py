@@ -0,0 +1,177 @@
+import os
+import time
+import threading
+import numpy as np
+
+# ==========================================
+# EMBEDDING INDEX (k-NN TOOL RECOGNITION)
+# ==========================================
+# Stores L2-normalized penultimate-layer embeddings of the labeled captures in
+# captured_images/Yes/<ToolName>/ as one NumPy matrix. Lookups are a single
+# matrix product (cosine similarity) followed by a vectorized top-k, so a new
+# tool becomes recognizable after a few captures and an index refresh instead
+# of retraining the classifier.
+
+class StaleIndexError(Exception):
+    """The index was built with a different model version than the one being served"""
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingIndex:
+    def __init__(self, path, dim=None):
+        self.path = path
+        self.embeddings = np.zeros((0, dim or 0), dtype=np.float32)
+        self.labels = np.array([], dtype=object)
+        self.paths = np.array([], dtype=object)
+        self.updated_at = None
+        self.model_version = None
+
+        # Swapping the arrays happens under the lock; searches use a snapshot
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.last_refresh = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    # --- Persistence ---
+    def load(self):
+        if not os.path.exists(self.path):
+            print(f"[ML] No embedding index at {self.path} yet")
+            return False
+        data = np.load(self.path, allow_pickle=True)
+        with self._lock:
+            self.embeddings = data['embeddings'].astype(np.float32)
+            self.labels = data['labels']
+            self.paths = data['paths']
+            self.updated_at = float(data['updated_at']) if 'updated_at' in data else None
+            self.model_version = (str(data['model_version']) or None) if 'model_version' in data else None
+        print(f"[ML] Loaded embedding index with {len(self)} images")
+        return True
+
+    def save(self):
+        embeddings, labels, paths = self._snapshot()
+        tmp_path = self.path + '.tmp.npz'
+        np.savez(tmp_path, embeddings=embeddings, labels=labels, paths=paths,
+                 updated_at=time.time(), model_version=self.model_version or '')
+        os.replace(tmp_path, self.path)
+
+    def _snapshot(self):
+        with self._lock:
+            return self.embeddings, self.labels, self.paths
+
+    # --- Updates ---
+    def refresh(self, samples, embed_fn, batch_size=16, model_version=None):
+        """
+        Incrementally syncs the index with samples ([(path, label)]):
+        only images not indexed yet are embedded, deleted images are dropped.
+        If model_version differs from the one the index was built with, every
+        image is re-embedded (embeddings from different models don't mix).
+        embed_fn: list of paths -> (N, D) embeddings.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            raise RuntimeError("An index refresh is already running")
+        try:
+            started = time.perf_counter()
+            embeddings, labels, paths = self._snapshot()
+            if model_version != self.model_version:
+                embeddings = np.zeros((0, 0), dtype=np.float32)
+                labels = np.array([], dtype=object)
+                paths = np.array([], dtype=object)
+            wanted = {path: label for path, label in samples}
+
+            # Keep rows whose file still exists with the same label
+            keep = np.array([wanted.get(path) == label for path, label in zip(paths, labels)], dtype=bool)
+            known = set(paths[keep]) if len(paths) else set()
+            new_samples = [(path, label) for path, label in samples if path not in known]
+
+            new_embeddings = []
+            for i in range(0, len(new_samples), batch_size):
+                chunk = new_samples[i:i + batch_size]
+                new_embeddings.append(l2_normalize(embed_fn([path for path, _ in chunk])))
+
+            if new_embeddings:
+                added = np.concatenate(new_embeddings)
+                base = embeddings[keep] if len(embeddings) else np.zeros((0, added.shape[1]), dtype=np.float32)
+                embeddings = np.concatenate([base, added])
+            else:
+                embeddings = embeddings[keep] if len(embeddings) else embeddings
+            labels = np.concatenate([labels[keep], np.array([l for _, l in new_samples], dtype=object)])
+            paths = np.concatenate([paths[keep], np.array([p for p, _ in new_samples], dtype=object)])
+
+            with self._lock:
+                self.embeddings = embeddings
+                self.labels = labels
+                self.paths = paths
+                self.updated_at = time.time()
+                self.model_version = model_version
+            self.save()
+
+            self.last_refresh = {
+                "added": len(new_samples),
+                "removed": int((~keep).sum()),
+                "total": len(labels),
+                "seconds": time.perf_counter() - started,
+            }
+            print(f"[ML] Embedding index refreshed: {self.last_refresh}")
+            return self.last_refresh
+        finally:
+            self._refresh_lock.release()
+
+    # --- Queries ---
+    def search(self, queries: np.ndarray, k=5):
+        """
+        Cosine top-k for a batch of query embeddings.
+        Returns (indices, scores), both shaped (num_queries, k), best first.
+        """
+        embeddings, _, _ = self._snapshot()
+        queries = l2_normalize(np.atleast_2d(queries))
+        k = min(k, len(embeddings))
+        if k == 0:
+            return np.zeros((len(queries), 0), dtype=int), np.zeros((len(queries), 0), dtype=np.float32)
+
+        scores = queries @ embeddings.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def predict(self, queries: np.ndarray, k=5) -> list[dict]:
+        """k-NN classification: neighbours vote for their label, weighted by similarity"""
+        _, labels, paths = self._snapshot()
+        indices, scores = self.search(queries, k)
+        results = []
+        for row_indices, row_scores in zip(indices, scores):
+            votes = {}
+            for i, score in zip(row_indices, row_scores):
+                votes[labels[i]] = votes.get(labels[i], 0.0) + float(score)
+            total = sum(votes.values()) or 1.0
+            prediction = max(votes, key=votes.get) if votes else None
+            results.append({
+                "prediction": prediction,
+                "score": votes[prediction] / total if prediction is not None else 0.0,
+                "neighbors": [
+                    {"label": labels[i], "similarity": float(score), "image_path": os.path.basename(paths[i])}
+                    for i, score in zip(row_indices, row_scores)
+                ],
+            })
+        return results
+
+    def get_stats(self) -> dict:
+        embeddings, labels, _ = self._snapshot()
+        unique, counts = np.unique(labels.astype(str), return_counts=True) if len(labels) else ([], [])
+        return {
+            "path": self.path,
+            "images": len(labels),
+            "dim": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+            "labels": {str(label): int(count) for label, count in zip(unique, counts)},
+            "updated_at": self.updated_at,
+            "model_version": self.model_version,
+            "refreshing": self._refresh_lock.locked(),
+            "last_refresh": self.last_refresh,
+        }
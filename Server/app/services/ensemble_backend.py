@@ -0,0 +1,87 @@
+import copy
+import time
+import threading
+import torch
+from torch.func import stack_module_state, functional_call
+
+# ==========================================
+# FUSED FOLD-ENSEMBLE BACKEND
+# ==========================================
+# TOOL-E_Train.ipynb trains one model per cross-validation fold and evaluates
+# them as an ensemble by looping over the models. Here the fold weights are
+# stacked into one set of batched parameters and torch.vmap runs all of them as
+# a single vectorized computation (convolutions become grouped convolutions),
+# then the softmax outputs are averaged. Only the stacked tensors are kept; the
+# per-fold modules are rebuilt from views of them if the fallback is needed.
+
+class EnsembleBackend:
+    name = "ensemble"
+
+    def __init__(self, models, preprocess, run_device, class_names=None):
+        if not models:
+            raise ValueError("Ensemble needs at least one model")
+        self.num_models = len(models)
+        self.preprocess = preprocess
+        self.device = run_device
+        self.class_names = class_names
+        self.vectorized = True
+
+        for model in models:
+            model.eval()
+        self.params, self.buffers = stack_module_state(models)
+        # Stateless copy of the architecture; the real tensors are passed in per call
+        base = copy.deepcopy(models[0]).to('meta')
+        self._base = base
+        self._models = None  # Sequential fallback, built on first use
+
+        def run_one(params, buffers, x):
+            return functional_call(base, (params, buffers), (x,))
+
+        self._forward = torch.vmap(run_one, in_dims=(0, 0, None))
+
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._total_time = 0.0
+
+    def _logits(self, input_batch):
+        """Returns (num_models, batch, num_classes) logits"""
+        if self.vectorized:
+            try:
+                return self._forward(self.params, self.buffers, input_batch)
+            except Exception as e:
+                # Some torch builds lack batching rules for an op - fall back to a loop
+                print(f"[ML] Vectorized ensemble failed ({e}); falling back to sequential forward passes")
+                self.vectorized = False
+        if self._models is None:
+            self._models = self._unstack()
+        return torch.stack([model(input_batch) for model in self._models])
+
+    def _unstack(self):
+        """One module per fold whose tensors are views into the stacked ones (no copy)"""
+        models = []
+        for i in range(self.num_models):
+            model = copy.deepcopy(self._base)
+            state = {name: tensor[i] for name, tensor in {**self.params, **self.buffers}.items()}
+            model.load_state_dict(state, assign=True)
+            models.append(model.eval())
+        return models
+
+    def predict_proba(self, images):
+        started = time.perf_counter()
+        input_batch = self.preprocess(images).to(self.device)
+        with torch.no_grad():
+            probabilities = torch.nn.functional.softmax(self._logits(input_batch), dim=2).mean(dim=0)
+
+        with self._lock:
+            self._calls += 1
+            self._total_time += time.perf_counter() - started
+        return probabilities.cpu().numpy()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "num_models": self.num_models,
+                "vectorized": self.vectorized,
+                "calls": self._calls,
+                "avg_call_ms": (self._total_time / self._calls * 1000) if self._calls else 0.0,
+            }
@@ -2,6 +2,8 @@ import os
 import uuid
 import time
 import shutil
+from PIL import Image
+from app.services.raw_image import decode_raw_image
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -11,13 +13,21 @@ TEMP_IMAGES_DIR = os.path.join(CAPTURED_IMAGES_DIR, 'temp')
 def init_image_dirs():
     os.makedirs(TEMP_IMAGES_DIR, exist_ok=True)
 
+def new_temp_filename() -> str:
+    return f"{uuid.uuid4()}.jpg"
+
 def save_temp_image(contents: bytes) -> str:
-    filename = f"{uuid.uuid4()}.jpg"
+    filename = new_temp_filename()
     temp_path = os.path.join(TEMP_IMAGES_DIR, filename)
     with open(temp_path, "wb") as f:
         f.write(contents)
     return filename
 
+def save_temp_raw_image(filename: str, contents: bytes):
+    """Stores a raw RGB upload (raw_image.py) as JPEG so captured_images stays browsable/trainable"""
+    temp_path = os.path.join(TEMP_IMAGES_DIR, filename)
+    Image.fromarray(decode_raw_image(contents), 'RGB').save(temp_path, quality=95)
+
 def get_temp_image_path(filename: str) -> str:
     return os.path.join(TEMP_IMAGES_DIR, filename)
 
@@ -63,3 +73,40 @@ def cleanup_temp_files(max_age_hours=24):
                         print(f"[SERVER] Error deleting {filename}: {e}")
     if count > 0:
         print(f"[SERVER] Cleaned up {count} old temp images.")
+
+def normalize_label(name: str) -> str:
+    """Tool names ("Tape Measure") and class names ("tape_measure") compare equal after this"""
+    return name.strip().lower().replace(' ', '_').replace('-', '_')
+
+def list_tool_images(decision='Yes', root=None):
+    """
+    Returns [(path, folder_name)] for every image under captured_images/<decision>/<ToolName>/
+    (or <root>/<ToolName>/ for another ImageFolder-style dataset)
+    """
+    root = root or os.path.join(CAPTURED_IMAGES_DIR, decision)
+    samples = []
+    if not os.path.isdir(root):
+        return samples
+
+    for folder in sorted(os.listdir(root)):
+        folder_path = os.path.join(root, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        for filename in sorted(os.listdir(folder_path)):
+            if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+                samples.append((os.path.join(folder_path, filename), folder))
+    return samples
+
+def list_labeled_images(class_names, decision='Yes', root=None):
+    """
+    Returns [(path, class_index)] for images filed under captured_images/<decision>/<ToolName>/.
+    Folder names come from the tools table (e.g. "Tape Measure") and are matched
+    to the model's class names (e.g. "tape_measure"). Unknown folders are skipped.
+    """
+    lookup = {normalize_label(name): i for i, name in enumerate(class_names)}
+    samples = []
+    for path, folder in list_tool_images(decision, root):
+        class_index = lookup.get(normalize_label(folder))
+        if class_index is not None:
+            samples.append((path, class_index))
+    return samples
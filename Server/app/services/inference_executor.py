@@ -0,0 +1,184 @@
+import math
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ==========================================
+# DEDICATED INFERENCE EXECUTOR
+# ==========================================
+# JPEG decoding and model forward passes are CPU-bound and would otherwise run
+# on the asyncio event loop, stalling every other request on the worker.
+# Routes await work submitted here instead; max_workers caps how many of these
+# jobs run at once so the rest of the API keeps responding.
+#
+# Admission control: at most max_queue jobs may wait for a worker. Beyond that
+# run() fails fast with QueueFullError instead of letting requests pile up until
+# the kiosk's own timeout fires. A job that is still queued when its deadline
+# passes, or whose client has disconnected, is dropped before it starts; the
+# caller stops waiting at the deadline either way (work that already started
+# can't be interrupted and finishes in the background).
+
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class InferenceRejected(Exception):
+    """Base for jobs the executor refused or gave up on"""
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class QueueFullError(InferenceRejected):
+    pass
+
+class DeadlineExceededError(InferenceRejected):
+    pass
+
+class ClientDisconnectedError(InferenceRejected):
+    pass
+
+
+class InferenceExecutor:
+    def __init__(self, max_workers=4, name="ml-exec", max_queue=0, deadline_seconds=0.0):
+        """
+        Args:
+            max_workers (int): Jobs that run at once.
+            name (str): Thread name prefix.
+            max_queue (int): Jobs allowed to wait for a worker (0 = unbounded).
+            deadline_seconds (float): Default time a caller waits for its result (0 = no deadline).
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.name = name
+        self.max_queue = max(0, int(max_queue))
+        self.deadline_seconds = max(0.0, float(deadline_seconds))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+
+        # Stats
+        self._pending = 0
+        self._max_pending = 0
+        self._rejected = 0
+        self._dropped = 0
+        self._timed_out = 0
+        self._disconnected = 0
+        self._active = 0
+        self._completed = 0
+        self._errors = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+        self._max_run = 0.0
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained"""
+        with self._lock:
+            avg_run = (self._total_run / self._completed) if self._completed else 1.0
+            backlog = self._pending + self._active
+        return max(1, math.ceil(backlog * avg_run / self.max_workers))
+
+    async def run(self, fn, *args, deadline_seconds=None, is_disconnected=None):
+        """
+        Runs fn(*args) on the executor and awaits the result.
+
+        Args:
+            deadline_seconds (float): Overrides the executor's default deadline.
+            is_disconnected: Optional async callable (e.g. Request.is_disconnected);
+                the job is abandoned once it returns True.
+
+        Raises:
+            QueueFullError: max_queue jobs are already waiting.
+            DeadlineExceededError: No result before the deadline.
+            ClientDisconnectedError: The client went away first.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.max_queue and self._pending >= self.max_queue:
+                self._rejected += 1
+                full = True
+            else:
+                full = False
+                self._pending += 1
+                self._max_pending = max(self._max_pending, self._pending)
+        if full:
+            raise QueueFullError(f"Inference queue is full ({self.max_queue} waiting)", self.retry_after())
+
+        deadline = self.deadline_seconds if deadline_seconds is None else deadline_seconds
+        submitted = time.perf_counter()
+        abandoned = threading.Event()
+
+        def timed_call():
+            started = time.perf_counter()
+            with self._lock:
+                self._pending -= 1
+                # Nobody is waiting for this result any more - don't compute it
+                if abandoned.is_set() or (deadline and started - submitted > deadline):
+                    self._dropped += 1
+                    skip = True
+                else:
+                    skip = False
+                    self._active += 1
+                    self._total_wait += started - submitted
+            if skip:
+                raise DeadlineExceededError("Request expired in the inference queue")
+            failed = False
+            try:
+                return fn(*args)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+                    self._total_run += elapsed
+                    self._max_run = max(self._max_run, elapsed)
+                    if failed:
+                        self._errors += 1
+
+        result = asyncio.wrap_future(self._executor.submit(timed_call), loop=loop)
+        try:
+            while True:
+                timeout = DISCONNECT_POLL_SECONDS if is_disconnected is not None else None
+                if deadline:
+                    remaining = deadline - (time.perf_counter() - submitted)
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+                done, _ = await asyncio.wait({result}, timeout=max(0.0, timeout) if timeout is not None else None)
+                if done:
+                    return result.result()
+                if deadline and time.perf_counter() - submitted >= deadline:
+                    with self._lock:
+                        self._timed_out += 1
+                    raise DeadlineExceededError(f"No result within {deadline:g}s", self.retry_after())
+                if is_disconnected is not None and await is_disconnected():
+                    with self._lock:
+                        self._disconnected += 1
+                    raise ClientDisconnectedError("Client disconnected")
+        except (asyncio.CancelledError, InferenceRejected):
+            abandoned.set()
+            # Retrieve the dropped job's outcome so asyncio doesn't log it as unhandled
+            result.add_done_callback(lambda f: f.cancelled() or f.exception())
+            raise
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            completed = self._completed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "deadline_seconds": self.deadline_seconds,
+                "active": self._active,
+                "pending": self._pending,
+                "max_pending": self._max_pending,
+                "completed": completed,
+                "errors": self._errors,
+                "rejected_queue_full": self._rejected,
+                "dropped_in_queue": self._dropped,
+                "deadline_exceeded": self._timed_out,
+                "client_disconnected": self._disconnected,
+                "avg_wait_ms": (self._total_wait / completed * 1000) if completed else 0.0,
+                "avg_run_ms": (self._total_run / completed * 1000) if completed else 0.0,
+                "max_run_ms": self._max_run * 1000,
+            }
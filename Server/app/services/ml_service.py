@@ -1,10 +1,36 @@
 import os
 import json
-import torch
-import torch.nn as nn
-from torchvision import transforms, models
-from torchvision.models import EfficientNet_V2_S_Weights
+import io
+import copy
+import glob
+import threading
+import numpy as np
 from PIL import Image
+from app.services.batch_scheduler import BatchScheduler
+from app.services.inference_executor import InferenceExecutor
+from app.services.prediction_cache import PredictionCache, hash_bytes
+from app.services.embedding_index import EmbeddingIndex, StaleIndexError
+from app.services.model_registry import ModelRegistry
+from app.services.shadow_evaluator import ShadowEvaluator
+from app.services.prediction_log import PredictionLog
+from app.services.raw_image import is_raw_image, decode_raw_image, to_pil
+
+# Inference backend:
+#   torch   - eager PyTorch model inside the server process (default)
+#   process - N worker processes each holding a copy of the model
+#   onnx    - exported ONNX graph on ONNX Runtime's CPU provider (no torch needed)
+#   int8    - INT8 quantized TorchScript model from scripts/quantize_model.py (CPU only)
+#   torchscript - self-contained TorchScript model from scripts/export_torchscript.py
+#   ensemble - all cross-validation fold models, run as one vectorized computation
+ML_BACKEND = os.getenv('ML_BACKEND', 'torch').lower()
+
+# ML-only nodes serving ONNX don't need torch/torchvision installed at all
+if ML_BACKEND != 'onnx':
+    import torch
+    from torchvision import transforms, models
+    from app.services.preprocessing import FusedPreprocessor
+else:
+    torch = transforms = models = FusedPreprocessor = None
 
 # ==========================================
 # ML CONFIGURATION & SETUP
@@ -12,13 +38,129 @@ from PIL import Image
 # Calculate paths relative to the Server root (assuming this file is in app/services)
 # We want to go up two levels to get to Server/
 BASE_DIR = os.path.dirname((os.path.abspath(__file__)))
-MODEL_PATH = os.path.join(BASE_DIR, 'efficientnet_finetuned_v2.pth')
+MODEL_PATH = os.getenv('ML_MODEL_PATH', os.path.join(BASE_DIR, 'efficientnet_finetuned_v2.pth'))
+# torchvision architecture of MODEL_PATH (e.g. mobilenet_v3_large for a distilled student)
+MODEL_ARCH = os.getenv('ML_MODEL_ARCH', 'efficientnet_v2_s')
 CLASS_NAMES_PATH = os.path.join(BASE_DIR, 'class_names.json')
+ONNX_MODEL_PATH = os.getenv('ML_ONNX_PATH', os.path.join(BASE_DIR, 'efficientnet_finetuned_v2.onnx'))
+INT8_MODEL_PATH = os.getenv('ML_INT8_PATH', os.path.join(BASE_DIR, 'efficientnet_int8.pt'))
+TORCHSCRIPT_MODEL_PATH = os.getenv('ML_TORCHSCRIPT_PATH', os.path.join(BASE_DIR, 'efficientnet_finetuned_v2_scripted.pt'))
 
-IMG_SIZE = 384
+IMG_SIZE = int(os.getenv('ML_IMG_SIZE', '384'))
 NORMALIZE_MEAN = [0.485, 0.456, 0.406]
 NORMALIZE_STD = [0.229, 0.224, 0.225]
 
+# Fold checkpoints from TOOL-E_Train.ipynb for ML_BACKEND=ensemble
+ENSEMBLE_GLOB = os.getenv('ML_ENSEMBLE_GLOB', os.path.join(BASE_DIR, 'efficientnet_fold_*_best.pth'))
+
+# CPU profile written by scripts/autotune_cpu.py for this machine. It supplies the
+# thread/worker settings below; an explicit ML_* environment variable still wins.
+CPU_PROFILE_PATH = os.getenv('ML_CPU_PROFILE', os.path.join(BASE_DIR, 'cpu_profile.json'))
+
+def _load_cpu_profile():
+    if not os.path.exists(CPU_PROFILE_PATH):
+        return {}
+    try:
+        with open(CPU_PROFILE_PATH, 'r') as f:
+            profile = json.load(f)
+    except Exception as e:
+        print(f"[ML] Error loading CPU profile {CPU_PROFILE_PATH}: {e}")
+        return {}
+    if profile.get('backend') != ML_BACKEND:
+        print(f"[ML] CPU profile was tuned for ML_BACKEND={profile.get('backend')}, not {ML_BACKEND}. Ignoring it.")
+        return {}
+    return profile
+
+CPU_PROFILE = _load_cpu_profile()
+
+def _cpu_setting(name, default):
+    """ML_<NAME> env var, else the CPU profile's <name>, else default"""
+    value = os.getenv(f'ML_{name}')
+    if value is None:
+        value = CPU_PROFILE.get(name.lower())
+    return default if value is None else value
+
+# In-process torch threads (0 = torch default: one per core)
+TORCH_THREADS = int(_cpu_setting('TORCH_THREADS', 0))
+TORCH_INTEROP_THREADS = int(_cpu_setting('TORCH_INTEROP_THREADS', 0))
+
+# Process backend: worker processes and torch threads per worker
+THREADS_PER_WORKER = int(_cpu_setting('THREADS_PER_WORKER', 1))
+# 0 = one worker per THREADS_PER_WORKER cores
+PROCESS_WORKERS = int(_cpu_setting('PROCESS_WORKERS', 0)) or max(1, (os.cpu_count() or 1) // max(1, THREADS_PER_WORKER))
+# Pin each worker process to its own THREADS_PER_WORKER cores (Linux)
+PIN_CPUS = str(_cpu_setting('PIN_CPUS', '0')).lower() in ('1', 'true')
+
+# ONNX Runtime intra-op threads (0 = let ONNX Runtime decide)
+ONNX_THREADS = int(_cpu_setting('ONNX_THREADS', 0))
+
+# Micro-batching: concurrent requests are grouped into one forward pass
+BATCH_ENABLED = os.getenv('ML_BATCH_ENABLED', '1') == '1'
+BATCH_MAX_SIZE = int(os.getenv('ML_BATCH_MAX_SIZE', '8'))
+BATCH_MAX_WAIT_MS = float(os.getenv('ML_BATCH_MAX_WAIT_MS', '15'))
+
+# Dedicated threads for decoding + inference so the event loop stays free.
+# Should be >= ML_BATCH_MAX_SIZE, otherwise batches can never fill up.
+EXECUTOR_WORKERS = int(_cpu_setting('EXECUTOR_WORKERS', max(BATCH_MAX_SIZE, 4)))
+
+# Admission control: requests allowed to wait for an executor worker (0 = unbounded)
+# and how long a request waits for its result. The deadline stays below the
+# Station's 10 s upload timeout so the kiosk gets an answer it can act on.
+QUEUE_MAX_DEPTH = int(os.getenv('ML_QUEUE_MAX_DEPTH', str(4 * EXECUTOR_WORKERS)))
+QUEUE_DEADLINE_SECONDS = float(os.getenv('ML_QUEUE_DEADLINE_SECONDS', '8'))
+
+# Prediction cache keyed by a hash of the uploaded bytes
+CACHE_ENABLED = os.getenv('ML_CACHE_ENABLED', '1') == '1'
+CACHE_MAX_ENTRIES = int(os.getenv('ML_CACHE_MAX_ENTRIES', '1024'))
+CACHE_TTL_SECONDS = float(os.getenv('ML_CACHE_TTL_SECONDS', '600'))
+CACHE_MAX_MB = float(os.getenv('ML_CACHE_MAX_MB', '32'))
+
+# Two-stage cascade: a small fast model answers confident images, the rest
+# escalate to the main model. The fast model is a state_dict for
+# ML_CASCADE_FAST_ARCH fine-tuned on the same classes (or a TorchScript .pt).
+CASCADE_ENABLED = os.getenv('ML_CASCADE_ENABLED', '0') == '1'
+CASCADE_FAST_PATH = os.getenv('ML_CASCADE_FAST_PATH', os.path.join(BASE_DIR, 'mobilenet_v3_finetuned.pth'))
+CASCADE_FAST_ARCH = os.getenv('ML_CASCADE_FAST_ARCH', 'mobilenet_v3_large')
+CASCADE_FAST_IMG_SIZE = int(os.getenv('ML_CASCADE_FAST_IMG_SIZE', '224'))
+CASCADE_THRESHOLD = float(os.getenv('ML_CASCADE_THRESHOLD', '0.9'))
+
+# Progressive resolution: run the served model at ML_PROGRESSIVE_LOW_SIZE first and
+# re-run at full size when top-1 < ML_PROGRESSIVE_MIN_CONFIDENCE or the top-1/top-2
+# margin < ML_PROGRESSIVE_MIN_MARGIN (pick both with scripts/calibrate_progressive.py).
+PROGRESSIVE_ENABLED = os.getenv('ML_PROGRESSIVE_ENABLED', '0') == '1'
+PROGRESSIVE_LOW_SIZE = int(os.getenv('ML_PROGRESSIVE_LOW_SIZE', '224'))
+PROGRESSIVE_MIN_CONFIDENCE = float(os.getenv('ML_PROGRESSIVE_MIN_CONFIDENCE', '0.9'))
+PROGRESSIVE_MIN_MARGIN = float(os.getenv('ML_PROGRESSIVE_MIN_MARGIN', '0.0'))
+
+# Versioned model registry (one directory per version, see model_registry.py).
+# ML_MODEL_VERSION picks the version served at startup instead of MODEL_PATH.
+REGISTRY_DIR = os.getenv('ML_REGISTRY_DIR', os.path.join(BASE_DIR, 'model_registry'))
+STARTUP_MODEL_VERSION = os.getenv('ML_MODEL_VERSION')
+WARMUP_ITERATIONS = int(os.getenv('ML_WARMUP_ITERATIONS', '2'))
+
+# Shadow evaluation: ML_SHADOW_VERSION (a registry version) also predicts a random
+# ML_SHADOW_SAMPLE_RATE of /identify_tool uploads in the background, see shadow_evaluator.py
+SHADOW_VERSION = os.getenv('ML_SHADOW_VERSION')
+SHADOW_SAMPLE_RATE = float(os.getenv('ML_SHADOW_SAMPLE_RATE', '0.1'))
+SHADOW_MAX_BACKLOG = int(os.getenv('ML_SHADOW_MAX_BACKLOG', '16'))
+SHADOW_LOG_PATH = os.getenv('ML_SHADOW_LOG_PATH', os.path.join(BASE_DIR, 'shadow_log.jsonl'))
+
+# Append-only binary log of every answered upload (float16 softmax, optional
+# embedding), linked to transactions.image_path, see prediction_log.py. Opt-in;
+# the default directory is Server/data/, which is not tracked by git.
+PREDICTION_LOG_ENABLED = os.getenv('ML_PREDICTION_LOG_ENABLED', '0') == '1'
+PREDICTION_LOG_DIR = os.getenv('ML_PREDICTION_LOG_DIR',
+                               os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), 'data', 'prediction_log'))
+PREDICTION_LOG_SEGMENT_RECORDS = int(os.getenv('ML_PREDICTION_LOG_SEGMENT_RECORDS', '65536'))
+PREDICTION_LOG_EMBEDDINGS = os.getenv('ML_PREDICTION_LOG_EMBEDDINGS', '0') == '1'
+
+# k-NN embedding index built from captured_images/Yes/<ToolName>/
+INDEX_PATH = os.getenv('ML_INDEX_PATH', os.path.join(BASE_DIR, 'embedding_index.npz'))
+KNN_K = int(os.getenv('ML_KNN_K', '5'))
+
+# Maximum images accepted by POST /identify_tool/batch
+BATCH_ENDPOINT_MAX_IMAGES = int(os.getenv('ML_BATCH_ENDPOINT_MAX_IMAGES', '16'))
+
 # Load Class Names
 CLASS_NAMES = []
 if os.path.exists(CLASS_NAMES_PATH):
@@ -32,71 +174,671 @@ else:
     print(f"[ML] Warning: Class names file not found at {CLASS_NAMES_PATH}")
 
 # Define Transform
-inference_transform = transforms.Compose([
-    transforms.Resize((IMG_SIZE, IMG_SIZE)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=NORMALIZE_MEAN, std=NORMALIZE_STD)
-])
+# Reference per-image transform (training notebook, offline scripts)
+def make_transform(img_size, mean, std):
+    return transforms.Compose([
+        transforms.Resize((img_size, img_size)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=mean, std=std)
+    ])
+
+def make_numpy_preprocess(img_size, mean, std):
+    """Same as make_transform but without torch: returns a normalized CHW float32 array"""
+    # /255 and Normalize folded into one multiply-add
+    scale = (1.0 / (255.0 * np.array(std, dtype=np.float32))).reshape(3, 1, 1)
+    shift = (-np.array(mean, dtype=np.float32) / np.array(std, dtype=np.float32)).reshape(3, 1, 1)
+
+    def preprocess(image) -> np.ndarray:
+        # PIL image or raw HWC uint8 array (raw_image.py)
+        if not (isinstance(image, np.ndarray) and image.shape[:2] == (img_size, img_size)):
+            image = to_pil(image)
+            if image.size != (img_size, img_size):
+                image = image.resize((img_size, img_size), Image.BILINEAR)
+        array = np.asarray(image, dtype=np.float32).transpose(2, 0, 1)
+        array *= scale
+        array += shift
+        return array
+    return preprocess
+
+# Batched serving path: PIL images -> one normalized (N, 3, H, W) tensor (see preprocessing.py)
+def make_batch_preprocess(img_size, mean, std):
+    return FusedPreprocessor(img_size, mean, std)
+
+inference_transform = make_transform(IMG_SIZE, NORMALIZE_MEAN, NORMALIZE_STD) if transforms is not None else None
+batch_preprocess = make_batch_preprocess(IMG_SIZE, NORMALIZE_MEAN, NORMALIZE_STD) if torch is not None else None
+preprocess_numpy = make_numpy_preprocess(IMG_SIZE, NORMALIZE_MEAN, NORMALIZE_STD)
+
+# JPEG decoding: large captures are decoded at reduced scale in the DCT domain
+# (PIL draft, 1/2 - 1/8) as long as both sides stay >= DRAFT_MIN_SIZE, the size
+# the image is resized to anyway. A 1920x1080 capture decodes at 960x540; the
+# Station's 384x384 uploads are not reduced. Raise ML_JPEG_DRAFT_MIN_SIZE when a
+# registry version runs at a larger img_size. ML_JPEG_DRAFT=0 always decodes at
+# full resolution.
+JPEG_DRAFT = os.getenv('ML_JPEG_DRAFT', '1') == '1'
+DRAFT_MIN_SIZE = int(os.getenv('ML_JPEG_DRAFT_MIN_SIZE', str(IMG_SIZE)))
 
 # Load Model Logic
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu") if torch is not None else "cpu"
 ml_model = None
+inference_backend = None
+active_version = None
+
+class TorchBackend:
+    """Runs a PyTorch (eager or TorchScript) model in this process"""
+
+    def __init__(self, model, name="torch", run_device=None, class_names=None, preprocess=None):
+        self.model = model
+        self.name = name
+        self.device = run_device or device
+        self.class_names = class_names
+        self.preprocess = preprocess or batch_preprocess
+
+    def predict_proba(self, images: list[Image.Image]) -> np.ndarray:
+        input_batch = self.preprocess(images).to(self.device)
+        with torch.no_grad():
+            output = self.model(input_batch)
+            probabilities = torch.nn.functional.softmax(output, dim=1)
+        return probabilities.cpu().numpy()
+
+def build_model(weights_path=None, num_classes=None, map_location=None, arch=None):
+    """
+    Builds EfficientNetV2-S (or another torchvision arch, e.g. mobilenet_v3_large)
+    with our classifier head and loads the fine-tuned weights.
+    No ImageNet weights are fetched: the fine-tuned state_dict overwrites every
+    parameter anyway, so this works offline without a torchvision cache.
+    """
+    weights_path = weights_path or MODEL_PATH
+    map_location = map_location or device
+    arch = arch or MODEL_ARCH
+    # Ensure we have class names to determine output size, default to 15 if missing
+    num_classes = num_classes or (len(CLASS_NAMES) if CLASS_NAMES else 15)
+
+    # Build on the meta device: no memory is allocated and no random init runs,
+    # the real tensors come straight from the checkpoint below
+    with torch.device('meta'):
+        model = getattr(models, arch)(weights=None, num_classes=num_classes)
+
+    # Load Weights (memory-mapped, then assigned in place instead of copied)
+    state_dict = torch.load(weights_path, map_location='cpu', weights_only=True, mmap=True)
+    model.load_state_dict(state_dict, assign=True)
+    model.to(map_location)
+    model.eval()
+    return model
+
+def load_torchscript_model(path):
+    """
+    Loads a self-contained TorchScript artifact (scripts/export_torchscript.py or
+    scripts/quantize_model.py). No torchvision model code is needed.
+    """
+    extra_files = {'metadata.json': ''}
+    model = torch.jit.load(path, map_location='cpu', _extra_files=extra_files)
+    metadata = json.loads(extra_files['metadata.json'] or '{}')
+
+    # Quantized kernels must run on the engine the model was converted for
+    engine = metadata.get('quantized_engine')
+    if engine and engine in torch.backends.quantized.supported_engines:
+        torch.backends.quantized.engine = engine
+    if not CLASS_NAMES and metadata.get('class_names'):
+        CLASS_NAMES.extend(metadata['class_names'])
+    model.eval()
+    return model
+
+def _model_path_for_backend():
+    if ML_BACKEND == 'onnx':
+        return ONNX_MODEL_PATH
+    if ML_BACKEND == 'int8':
+        return INT8_MODEL_PATH
+    if ML_BACKEND == 'torchscript':
+        return TORCHSCRIPT_MODEL_PATH
+    if ML_BACKEND == 'ensemble':
+        fold_paths = sorted(glob.glob(ENSEMBLE_GLOB))
+        return fold_paths[0] if fold_paths else ENSEMBLE_GLOB
+    return MODEL_PATH
+
+def apply_cpu_threads():
+    """Applies the in-process torch thread settings. Must run before the first forward pass."""
+    if torch is None:
+        return
+    if TORCH_THREADS:
+        torch.set_num_threads(TORCH_THREADS)
+    if TORCH_INTEROP_THREADS:
+        try:
+            torch.set_num_interop_threads(TORCH_INTEROP_THREADS)
+        except RuntimeError as e:
+            # Only allowed once, before any inter-op parallel work
+            print(f"[ML] Could not set inter-op threads: {e}")
+    source = f" (profile {os.path.basename(CPU_PROFILE_PATH)})" if CPU_PROFILE else ""
+    print(f"[ML] torch threads: {torch.get_num_threads()} intra-op / {torch.get_num_interop_threads()} inter-op{source}")
 
 def load_ml_model():
-    global ml_model
-    if not os.path.exists(MODEL_PATH):
-        print(f"[ML] Model file not found at {MODEL_PATH}. ML features disabled.")
+    global ml_model, inference_backend, active_version
+    apply_cpu_threads()
+    if STARTUP_MODEL_VERSION:
+        try:
+            activate_model_version(STARTUP_MODEL_VERSION)
+            return
+        except Exception as e:
+            print(f"[ML] Failed to load model version {STARTUP_MODEL_VERSION}: {e}. Falling back to {ML_BACKEND} backend.")
+
+    model_path = _model_path_for_backend()
+    if not os.path.exists(model_path):
+        print(f"[ML] Model file not found at {model_path}. ML features disabled.")
         return
 
     print("[ML] Loading AI Model... (This may take a few seconds)")
     try:
-        weights = EfficientNet_V2_S_Weights.DEFAULT
-        model = models.efficientnet_v2_s(weights=weights)
-        
-        # Rebuild Head
-        in_features = model.classifier[1].in_features
-        # Ensure we have class names to determine output size, default to 15 if missing
-        num_classes = len(CLASS_NAMES) if CLASS_NAMES else 15
-        model.classifier[1] = nn.Linear(in_features, num_classes)
-        
-        # Load Weights
-        model.load_state_dict(torch.load(MODEL_PATH, map_location=device))
-        model.to(device)
-        model.eval()
-        ml_model = model
-        print("[ML] Model Loaded Successfully!")
+        if ML_BACKEND == 'onnx':
+            from app.services.onnx_backend import OnnxBackend
+            backend = OnnxBackend(model_path, preprocess_numpy, intra_op_threads=ONNX_THREADS)
+            # The exported graph carries its own class list
+            if not CLASS_NAMES and backend.class_names:
+                CLASS_NAMES.extend(backend.class_names)
+            inference_backend = backend
+        elif ML_BACKEND == 'process':
+            # Imported here so worker processes don't import it recursively
+            from app.services.process_backend import ProcessPoolBackend
+            backend = ProcessPoolBackend(num_workers=PROCESS_WORKERS, threads_per_worker=THREADS_PER_WORKER,
+                                         pin_cpus=PIN_CPUS)
+            backend.start()
+            inference_backend = backend
+        elif ML_BACKEND == 'int8':
+            model = load_torchscript_model(model_path)
+            ml_model = model
+            inference_backend = TorchBackend(model, name="int8", run_device="cpu")
+        elif ML_BACKEND == 'torchscript':
+            model = load_torchscript_model(model_path).to(device)
+            ml_model = model
+            inference_backend = TorchBackend(model, name="torchscript")
+        elif ML_BACKEND == 'ensemble':
+            from app.services.ensemble_backend import EnsembleBackend
+            fold_paths = sorted(glob.glob(ENSEMBLE_GLOB))
+            print(f"[ML] Loading {len(fold_paths)} fold models for the ensemble")
+            fold_models = [build_model(path, arch='efficientnet_v2_s') for path in fold_paths]
+            inference_backend = EnsembleBackend(fold_models, batch_preprocess, device)
+        else:
+            model = build_model()
+            ml_model = model
+            inference_backend = TorchBackend(model)
+        inference_backend = _with_cascade(_with_progressive(inference_backend))
+        active_version = "default"
+        print(f"[ML] Model Loaded Successfully! (backend: {inference_backend.name})")
     except Exception as e:
         print(f"[ML] Failed to load model: {e}")
 
-def predict_image(image: Image.Image):
-    if ml_model is None:
-        raise Exception("ML Model is not loaded")
+def _with_progressive(backend):
+    """Runs backend at PROGRESSIVE_LOW_SIZE first when progressive resolution is enabled"""
+    if not PROGRESSIVE_ENABLED:
+        return backend
+    if torch is None or not isinstance(getattr(backend, 'preprocess', None), FusedPreprocessor):
+        print(f"[ML] Progressive resolution needs an in-process PyTorch backend, not {backend.name}. Disabled.")
+        return backend
 
-    # Preprocess
-    input_tensor = inference_transform(image)
-    input_batch = input_tensor.unsqueeze(0).to(device)
+    from app.services.progressive_backend import ProgressiveBackend
+    # Same model and weights, only the input size differs
+    low_backend = copy.copy(backend)
+    low_backend.preprocess = backend.preprocess.with_size(PROGRESSIVE_LOW_SIZE)
+    low_backend.name = f"{backend.name}@{PROGRESSIVE_LOW_SIZE}"
+    print(f"[ML] Progressive resolution enabled: {PROGRESSIVE_LOW_SIZE}px first, escalating below "
+          f"confidence {PROGRESSIVE_MIN_CONFIDENCE:.2f} / margin {PROGRESSIVE_MIN_MARGIN:.2f}")
+    return ProgressiveBackend(low_backend, backend, PROGRESSIVE_LOW_SIZE, backend.preprocess.img_size,
+                              min_confidence=PROGRESSIVE_MIN_CONFIDENCE, min_margin=PROGRESSIVE_MIN_MARGIN)
 
-    # Predict
-    with torch.no_grad():
-        output = ml_model(input_batch)
-        probabilities = torch.nn.functional.softmax(output[0], dim=0)
-        
-        # Get top prediction
-        top_prob, top_catid = torch.topk(probabilities, 1)
-        class_id = top_catid.item()
-        score = top_prob.item()
-        
-        # Safety check if class_id is valid
-        if class_id < len(CLASS_NAMES):
-            class_name = CLASS_NAMES[class_id]
+fast_backend = None
+
+def _with_cascade(backend):
+    """Puts the fast first-stage model in front of backend when the cascade is enabled"""
+    global fast_backend
+    if not CASCADE_ENABLED:
+        return backend
+    # Look through a progressive wrapper at the model it runs
+    served = getattr(backend, 'full', backend)
+    if torch is None or not isinstance(getattr(served, 'preprocess', None), FusedPreprocessor):
+        print(f"[ML] Cascade needs an in-process PyTorch backend, not {backend.name}. Disabled.")
+        return backend
+    if not os.path.exists(CASCADE_FAST_PATH):
+        print(f"[ML] Cascade fast model not found at {CASCADE_FAST_PATH}. Cascade disabled.")
+        return backend
+
+    from app.services.cascade_backend import CascadeBackend
+    if fast_backend is None:
+        preprocess = make_batch_preprocess(CASCADE_FAST_IMG_SIZE, NORMALIZE_MEAN, NORMALIZE_STD)
+        if CASCADE_FAST_PATH.endswith('.pt'):
+            model = load_torchscript_model(CASCADE_FAST_PATH).to(device)
         else:
-            class_name = f"Unknown_Class_{class_id}"
-        
-        # Get all probabilities
-        all_probs = {CLASS_NAMES[i]: prob.item() for i, prob in enumerate(probabilities) if i < len(CLASS_NAMES)}
+            model = build_model(CASCADE_FAST_PATH, arch=CASCADE_FAST_ARCH)
+        fast_backend = TorchBackend(model, name=CASCADE_FAST_ARCH, preprocess=preprocess)
+        print(f"[ML] Cascade enabled: {CASCADE_FAST_ARCH} first, escalating below {CASCADE_THRESHOLD:.2f}")
+    return CascadeBackend(fast_backend, backend, threshold=CASCADE_THRESHOLD)
+
+def unload_ml_model():
+    global ml_model, inference_backend, previous_backend
+    for backend in (inference_backend, previous_backend):
+        if backend is not None and hasattr(backend, 'shutdown'):
+            backend.shutdown()
+    inference_backend = None
+    previous_backend = None
+    ml_model = None
+
+def _format_prediction(probabilities: np.ndarray, class_names=None):
+    """Turns one softmax row into the response dict used by /identify_tool"""
+    class_names = class_names or CLASS_NAMES
+
+    # Get top prediction
+    class_id = int(np.argmax(probabilities))
+    score = float(probabilities[class_id])
+
+    # Safety check if class_id is valid
+    if class_id < len(class_names):
+        class_name = class_names[class_id]
+    else:
+        class_name = f"Unknown_Class_{class_id}"
+
+    # Get all probabilities
+    all_probs = {class_names[i]: float(prob) for i, prob in enumerate(probabilities) if i < len(class_names)}
 
     return {
         "prediction": class_name,
         "score": score,
         "all_probabilities": all_probs
     }
+
+def predict_batch(images: list[Image.Image]) -> list[dict]:
+    """Runs several images through the model as a single tensor batch"""
+    # Take one reference so a concurrent model swap can't mix two models in a batch
+    with _swap_lock:
+        backend, version = inference_backend, active_version
+    if backend is None:
+        raise Exception("ML Model is not loaded")
+    if not images:
+        return []
+
+    class_names = getattr(backend, 'class_names', None)
+    if hasattr(backend, 'predict_detailed'):
+        # Backends that report how each image was answered (e.g. which cascade stage)
+        probabilities, details = backend.predict_detailed(images)
+        return [{**_format_prediction(row, class_names), **detail, "model_version": version}
+                for row, detail in zip(probabilities, details)]
+
+    probabilities = backend.predict_proba(images)
+    return [{**_format_prediction(row, class_names), "model_version": version} for row in probabilities]
+
+def decode_image(contents: bytes):
+    """
+    Returns a PIL image, or a HWC uint8 array for raw uploads (raw_image.py).
+    Every backend accepts both.
+    """
+    if is_raw_image(contents):
+        return decode_raw_image(contents)
+    image = Image.open(io.BytesIO(contents))
+    if JPEG_DRAFT and image.format == 'JPEG':
+        # Picks the largest DCT scale-down that keeps both sides >= DRAFT_MIN_SIZE;
+        # the resize to IMG_SIZE afterwards still downsamples (or keeps) with antialiasing
+        image.draft('RGB', (DRAFT_MIN_SIZE, DRAFT_MIN_SIZE))
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    image.load()
+    return image
+
+def predict_image(image: Image.Image):
+    if inference_backend is None:
+        raise Exception("ML Model is not loaded")
+
+    # Share a forward pass with concurrent callers when the scheduler is running
+    if batch_scheduler is not None and batch_scheduler.running:
+        return batch_scheduler.submit(image).result()
+
+    return predict_batch([image])[0]
+
+def predict_image_bytes(contents: bytes):
+    """Decodes an uploaded image and predicts it. Blocking - run it on the inference executor."""
+    if prediction_cache is None:
+        return predict_image(decode_image(contents))
+
+    # Repeated uploads skip decoding and inference entirely
+    return prediction_cache.get_or_compute(
+        hash_bytes(contents),
+        lambda: predict_image(decode_image(contents)),
+    )
+
+def predict_images_bytes(contents_list: list[bytes]) -> list[dict]:
+    """
+    Batch version of predict_image_bytes: every uncached image goes through the
+    model in one tensor batch. Results are returned in input order.
+    """
+    keys = [hash_bytes(contents) for contents in contents_list]
+    results = [None] * len(contents_list)
+    if prediction_cache is not None:
+        generation = prediction_cache.generation
+        results = [prediction_cache.get(key) for key in keys]
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        predictions = predict_batch([decode_image(contents_list[i]) for i in missing])
+        for i, prediction in zip(missing, predictions):
+            if prediction_cache is not None:
+                prediction_cache.put(keys[i], prediction, generation)
+            results[i] = dict(prediction)
+    return results
+
+prediction_cache = None
+if CACHE_ENABLED:
+    prediction_cache = PredictionCache(
+        max_entries=CACHE_MAX_ENTRIES,
+        ttl_seconds=CACHE_TTL_SECONDS,
+        max_bytes=int(CACHE_MAX_MB * 1024 * 1024),
+    )
+
+# ==========================================
+# BATCH SCHEDULER
+# ==========================================
+batch_scheduler = None
+
+def start_batch_scheduler():
+    global batch_scheduler
+    if not BATCH_ENABLED or batch_scheduler is not None:
+        return
+    batch_scheduler = BatchScheduler(
+        predict_batch,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+    )
+    batch_scheduler.start()
+
+def stop_batch_scheduler():
+    global batch_scheduler
+    if batch_scheduler is not None:
+        batch_scheduler.stop()
+        batch_scheduler = None
+
+# ==========================================
+# INFERENCE EXECUTOR
+# ==========================================
+inference_executor = None
+
+def start_inference_executor():
+    global inference_executor
+    if inference_executor is None:
+        inference_executor = InferenceExecutor(
+            max_workers=EXECUTOR_WORKERS,
+            max_queue=QUEUE_MAX_DEPTH,
+            deadline_seconds=QUEUE_DEADLINE_SECONDS,
+        )
+        print(f"[ML] Inference executor started with {EXECUTOR_WORKERS} workers "
+              f"(queue {QUEUE_MAX_DEPTH or 'unbounded'}, deadline {QUEUE_DEADLINE_SECONDS or 'none'}s)")
+
+def stop_inference_executor():
+    global inference_executor
+    if inference_executor is not None:
+        inference_executor.shutdown()
+        inference_executor = None
+
+async def run_inference(fn, *args, is_disconnected=None):
+    """
+    Awaits a blocking ML call without stalling the event loop.
+    Raises QueueFullError / DeadlineExceededError / ClientDisconnectedError when the request is shed.
+    """
+    if inference_executor is None:
+        start_inference_executor()
+    return await inference_executor.run(fn, *args, is_disconnected=is_disconnected)
+
+# ==========================================
+# MODEL REGISTRY & HOT SWAP
+# ==========================================
+model_registry = ModelRegistry(REGISTRY_DIR)
+previous_backend = None
+previous_version = None
+model_load_status = {"state": "idle", "version": None, "error": None}
+_swap_lock = threading.Lock()
+
+def load_model_version(version):
+    """Builds (but does not activate) a backend for a registry version. Blocking."""
+    metadata = model_registry.get(version)
+    class_names = metadata.get('class_names') or CLASS_NAMES
+    img_size = metadata.get('img_size', IMG_SIZE)
+    mean = metadata.get('normalize_mean', NORMALIZE_MEAN)
+    std = metadata.get('normalize_std', NORMALIZE_STD)
+    model_format = metadata.get('format', 'pth')
+    artifact_path = metadata['artifact_path']
+
+    if model_format == 'onnx':
+        from app.services.onnx_backend import OnnxBackend
+        backend = OnnxBackend(artifact_path, make_numpy_preprocess(img_size, mean, std), intra_op_threads=ONNX_THREADS)
+        backend.class_names = class_names
+        return backend
+
+    if torch is None:
+        raise Exception(f"Model format '{model_format}' needs torch (server runs with ML_BACKEND=onnx)")
+    preprocess = make_batch_preprocess(img_size, mean, std)
+    if model_format == 'pth':
+        model = build_model(artifact_path, num_classes=len(class_names), arch=metadata.get('arch', 'efficientnet_v2_s'))
+        return TorchBackend(model, class_names=class_names, preprocess=preprocess)
+    if model_format == 'int8':
+        return TorchBackend(load_torchscript_model(artifact_path), name="int8", run_device="cpu",
+                            class_names=class_names, preprocess=preprocess)
+    return TorchBackend(load_torchscript_model(artifact_path).to(device), name="torchscript",
+                        class_names=class_names, preprocess=preprocess)
+
+def _warm_up(backend):
+    # First calls allocate buffers / pick kernels - pay that before taking traffic
+    dummy = Image.new('RGB', (IMG_SIZE, IMG_SIZE), color=(128, 128, 128))
+    for _ in range(WARMUP_ITERATIONS):
+        backend.predict_proba([dummy])
+
+def _swap_backend(backend, version):
+    """Atomically makes backend the served model; the old one stays resident for rollback"""
+    global inference_backend, ml_model, active_version, previous_backend, previous_version
+    with _swap_lock:
+        retired = previous_backend if previous_backend not in (backend, inference_backend) else None
+        previous_backend, previous_version = inference_backend, active_version
+        inference_backend, active_version = backend, version
+        ml_model = getattr(backend, 'model', None)
+
+    # Cached results came from the old model
+    if prediction_cache is not None:
+        prediction_cache.clear()
+    if retired is not None and hasattr(retired, 'shutdown'):
+        retired.shutdown()
+    print(f"[ML] Now serving model version {version} (previous: {previous_version})")
+
+def activate_model_version(version):
+    """Loads a registry version, warms it up and swaps it in. Blocking - run in the background."""
+    model_load_status.update(state="loading", version=version, error=None)
+    try:
+        backend = _with_cascade(_with_progressive(load_model_version(version)))
+        _warm_up(backend)
+        _swap_backend(backend, version)
+        model_load_status.update(state="ready")
+    except Exception as e:
+        model_load_status.update(state="failed", error=str(e))
+        print(f"[ML] Failed to activate model version {version}: {e}")
+        raise
+
+def rollback_model():
+    """Swaps back to the previous model, which is still in memory"""
+    if previous_backend is None:
+        raise Exception("No previous model to roll back to")
+    _swap_backend(previous_backend, previous_version)
+
+# ==========================================
+# PREDICTION LOG
+# ==========================================
+prediction_log = None
+if PREDICTION_LOG_ENABLED:
+    prediction_log = PredictionLog(PREDICTION_LOG_DIR, segment_records=PREDICTION_LOG_SEGMENT_RECORDS)
+
+def log_predictions(contents_list: list[bytes], results: list[dict]):
+    """Appends answered uploads to the prediction log. Runs after the response is sent."""
+    if prediction_log is None:
+        return
+    embeddings = None
+    if PREDICTION_LOG_EMBEDDINGS:
+        try:
+            embeddings = embed_images([decode_image(contents) for contents in contents_list])
+        except Exception as e:
+            print(f"[ML] Prediction log: embedding failed, logging without it: {e}")
+
+    for i, (contents, result) in enumerate(zip(contents_list, results)):
+        # The response's own class order, so a concurrent model swap can't misalign it
+        class_names = list(result["all_probabilities"])
+        try:
+            prediction_log.append(
+                hash_bytes(contents), result.get("model_version"), class_names,
+                [result["all_probabilities"][name] for name in class_names],
+                embedding=embeddings[i] if embeddings is not None else None,
+                image_filename=result.get("image_filename"),
+            )
+        except Exception as e:
+            print(f"[ML] Prediction log: append failed: {e}")
+
+def link_prediction_image(image_filename: str, image_path: str):
+    """Links the logged prediction of a temp upload to its permanent transactions.image_path"""
+    if prediction_log is not None:
+        prediction_log.link_image(image_filename, image_path)
+
+def close_prediction_log():
+    if prediction_log is not None:
+        prediction_log.close()
+
+# ==========================================
+# SHADOW EVALUATION
+# ==========================================
+shadow_evaluator = ShadowEvaluator(SHADOW_LOG_PATH, sample_rate=SHADOW_SAMPLE_RATE, max_backlog=SHADOW_MAX_BACKLOG)
+shadow_load_status = {"state": "idle", "version": None, "error": None}
+
+def load_shadow_model(version):
+    """Loads a registry version as the shadow candidate. Blocking - run in the background."""
+    shadow_load_status.update(state="loading", version=version, error=None)
+    try:
+        backend = load_model_version(version)
+        _warm_up(backend)
+        shadow_evaluator.set_candidate(backend, version)
+        shadow_load_status.update(state="ready")
+    except Exception as e:
+        shadow_load_status.update(state="failed", error=str(e))
+        print(f"[ML] Failed to load shadow model version {version}: {e}")
+        raise
+
+def start_shadow_evaluation():
+    if SHADOW_VERSION:
+        try:
+            load_shadow_model(SHADOW_VERSION)
+        except Exception:
+            pass  # Already logged; the served model is unaffected
+
+def stop_shadow_evaluation():
+    shadow_evaluator.clear_candidate()
+    shadow_load_status.update(state="idle", version=None, error=None)
+
+def _shadow_predict(backend, contents: bytes) -> dict:
+    # Straight to the candidate - the cache and batch scheduler belong to the served model
+    probabilities = backend.predict_proba([decode_image(contents)])
+    return _format_prediction(probabilities[0], getattr(backend, 'class_names', None))
+
+def submit_shadow(contents: bytes, production: dict, image_filename: str):
+    """Queues a shadow prediction of an upload that was already answered"""
+    shadow_evaluator.submit(contents, production, image_filename,
+                            production.get("model_version", active_version), _shadow_predict)
+
+def record_shadow_label(image_filename: str, tool_name: str, classification_correct=None, image_path=None):
+    shadow_evaluator.record_label(image_filename, tool_name, classification_correct, image_path)
+
+def get_shadow_stats() -> dict:
+    return {"load_status": dict(shadow_load_status), **shadow_evaluator.get_stats()}
+
+def get_model_versions() -> dict:
+    return {
+        "active_version": active_version,
+        "previous_version": previous_version,
+        "load_status": dict(model_load_status),
+        "versions": model_registry.list_versions(),
+    }
+
+# ==========================================
+# EMBEDDINGS & k-NN INDEX
+# ==========================================
+embedding_model = None
+embedding_index = EmbeddingIndex(INDEX_PATH)
+
+def _embedding_source():
+    """
+    Returns (model, preprocess, version) of the served model. Embeddings need the
+    eager model's submodules; the served backend's own weights and preprocessing
+    are used so index entries and queries come from the model that is answering.
+    The default model served as process/int8/torchscript is embedded with an eager
+    copy of MODEL_PATH, its source weights, built lazily.
+    """
+    global embedding_model
+    if torch is None:
+        raise Exception("Embeddings require torch (not available with ML_BACKEND=onnx)")
+    with _swap_lock:
+        backend, version = inference_backend, active_version
+    if backend is None:
+        raise Exception("ML Model is not loaded")
+    # Cascade / progressive wrappers: the full-size stage is the served model
+    while hasattr(backend, 'full'):
+        backend = backend.full
+
+    model = getattr(backend, 'model', None)
+    if isinstance(model, torch.nn.Module) and not isinstance(model, torch.jit.ScriptModule) and hasattr(model, 'features'):
+        return model, backend.preprocess, version
+    if version == "default" and ML_BACKEND in ('process', 'int8', 'torchscript'):
+        if embedding_model is None:
+            embedding_model = build_model()
+        return embedding_model, batch_preprocess, version
+    raise Exception(f"Embeddings need an eager PyTorch model, model version {version} is served by {backend.name}")
+
+def embed_images(images: list[Image.Image], source=None) -> np.ndarray:
+    """
+    Returns L2-normalized penultimate-layer embeddings, shape (N, D) where D is the
+    model's feature width. source: _embedding_source() result, default the served model.
+    """
+    model, preprocess, _ = source or _embedding_source()
+    input_batch = preprocess(images).to(next(model.parameters()).device)
+    with torch.no_grad():
+        # Same path as EfficientNet.forward, minus the classifier head
+        features = torch.flatten(model.avgpool(model.features(input_batch)), 1)
+        features = torch.nn.functional.normalize(features, dim=1)
+    return features.cpu().numpy()
+
+def load_embedding_index():
+    try:
+        embedding_index.load()
+    except Exception as e:
+        print(f"[ML] Failed to load embedding index: {e}")
+
+def refresh_embedding_index():
+    """Embeds captures that aren't indexed yet and drops deleted ones. Blocking."""
+    from app.services import image_service
+    samples = image_service.list_tool_images(decision='Yes')
+    # One model for the whole refresh, even if another version is swapped in meanwhile
+    source = _embedding_source()
+    return embedding_index.refresh(
+        samples,
+        lambda paths: embed_images([Image.open(path).convert('RGB') for path in paths], source),
+        model_version=source[2],
+    )
+
+def knn_predict_image_bytes(contents: bytes, k=None):
+    """Identifies an uploaded image by its nearest labeled captures. Blocking."""
+    if len(embedding_index) == 0:
+        raise Exception("Embedding index is empty - refresh it first")
+    source = _embedding_source()
+    if embedding_index.model_version != source[2]:
+        raise StaleIndexError(f"Embedding index was built with model version {embedding_index.model_version}, "
+                              f"serving {source[2]} - refresh it first")
+    embedding = embed_images([decode_image(contents)], source)
+    return embedding_index.predict(embedding, k=k or KNN_K)[0]
+
+def get_ml_stats() -> dict:
+    return {
+        "model_loaded": inference_backend is not None,
+        "backend": inference_backend.name if inference_backend is not None else None,
+        "model_version": active_version,
+        "device": str(device),
+        "backend_stats": inference_backend.get_stats() if hasattr(inference_backend, 'get_stats') else None,
+        "batch_scheduler": batch_scheduler.get_stats() if batch_scheduler is not None else None,
+        "inference_executor": inference_executor.get_stats() if inference_executor is not None else None,
+        "prediction_cache": prediction_cache.get_stats() if prediction_cache is not None else None,
+        "embedding_index": embedding_index.get_stats(),
+        "prediction_log": prediction_log.get_stats() if prediction_log is not None else None,
+    }
@@ -0,0 +1,89 @@
+import os
+import json
+import time
+import shutil
+
+# ==========================================
+# MODEL REGISTRY
+# ==========================================
+# Versioned model artifacts live in one directory per version:
+#
+#   model_registry/
+#     2026-03-01_v3/
+#       model.pth            (or model.onnx / model.pt)
+#       metadata.json        {"format", "arch", "class_names", "img_size", "normalize_mean", ...}
+#
+# ml_service loads a version in the background and swaps it in atomically.
+
+ARTIFACT_NAMES = {
+    'pth': 'model.pth',
+    'torchscript': 'model.pt',
+    'int8': 'model.pt',
+    'onnx': 'model.onnx',
+}
+
+
+class ModelRegistry:
+    def __init__(self, root):
+        self.root = root
+
+    def _version_dir(self, version):
+        # Versions are directory names; don't let them escape the registry
+        if not version or os.path.basename(version) != version or version in ('.', '..'):
+            raise ValueError(f"Invalid model version: {version!r}")
+        return os.path.join(self.root, version)
+
+    def list_versions(self) -> list[dict]:
+        if not os.path.isdir(self.root):
+            return []
+        versions = []
+        for name in sorted(os.listdir(self.root)):
+            try:
+                versions.append(self.get(name))
+            except (FileNotFoundError, ValueError, json.JSONDecodeError):
+                continue
+        return versions
+
+    def get(self, version) -> dict:
+        """Returns the version's metadata plus the absolute artifact path"""
+        version_dir = self._version_dir(version)
+        metadata_path = os.path.join(version_dir, 'metadata.json')
+        with open(metadata_path, 'r') as f:
+            metadata = json.load(f)
+
+        model_format = metadata.get('format', 'pth')
+        if model_format not in ARTIFACT_NAMES:
+            raise ValueError(f"Unsupported model format: {model_format}")
+        artifact_path = os.path.join(version_dir, ARTIFACT_NAMES[model_format])
+        if not os.path.exists(artifact_path):
+            raise FileNotFoundError(artifact_path)
+
+        metadata['version'] = version
+        metadata['artifact_path'] = artifact_path
+        return metadata
+
+    def register(self, version, artifact_path, model_format, class_names,
+                 img_size, normalize_mean, normalize_std, notes=None, arch='efficientnet_v2_s') -> dict:
+        """Copies an artifact into the registry under a new version"""
+        if model_format not in ARTIFACT_NAMES:
+            raise ValueError(f"Unsupported model format: {model_format}")
+        version_dir = self._version_dir(version)
+        if os.path.exists(version_dir):
+            raise FileExistsError(f"Version {version} already exists")
+
+        os.makedirs(version_dir)
+        shutil.copy2(artifact_path, os.path.join(version_dir, ARTIFACT_NAMES[model_format]))
+        metadata = {
+            "format": model_format,
+            "arch": arch,
+            "class_names": class_names,
+            "img_size": img_size,
+            "normalize_mean": normalize_mean,
+            "normalize_std": normalize_std,
+            "source": os.path.basename(artifact_path),
+            "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "notes": notes,
+        }
+        with open(os.path.join(version_dir, 'metadata.json'), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        return self.get(version)
@@ -0,0 +1,63 @@
+import json
+import time
+import threading
+import numpy as np
+import onnxruntime as ort
+from PIL import Image
+
+# ==========================================
+# ONNX RUNTIME INFERENCE BACKEND
+# ==========================================
+# Serves the graph produced by scripts/export_onnx.py on ONNX Runtime's CPU
+# execution provider. Nothing here imports torch, so ML-only nodes can run with
+# just onnxruntime + numpy + Pillow installed.
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, model_path, preprocess, intra_op_threads=0):
+        """
+        preprocess: callable turning a PIL image into a normalized CHW float32 array.
+        """
+        self.model_path = model_path
+        self.preprocess = preprocess
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+        # Class names are embedded by the export script
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.class_names = json.loads(metadata['class_names']) if 'class_names' in metadata else []
+
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._total_time = 0.0
+
+    def predict_proba(self, images: list[Image.Image]) -> np.ndarray:
+        started = time.perf_counter()
+        input_batch = np.stack([self.preprocess(image) for image in images]).astype(np.float32, copy=False)
+        logits = self.session.run(None, {self.input_name: input_batch})[0]
+        probabilities = softmax(logits)
+
+        with self._lock:
+            self._calls += 1
+            self._total_time += time.perf_counter() - started
+        return probabilities
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "model_path": self.model_path,
+                "calls": self._calls,
+                "avg_call_ms": (self._total_time / self._calls * 1000) if self._calls else 0.0,
+            }
@@ -0,0 +1,160 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# ==========================================
+# PREDICTION CACHE
+# ==========================================
+# Kiosks resend the same capture when users retry, and the AdminWeb ML debug page
+# re-posts the same test images. Predictions are cached by a hash of the uploaded
+# bytes (bounded LRU with TTL and a memory limit). Identical requests that arrive
+# while the first one is still running wait on that computation instead of
+# starting another forward pass. clear() (model swap) bumps a generation counter;
+# results computed before it are returned to their caller but not cached.
+
+def hash_bytes(contents: bytes) -> str:
+    return hashlib.blake2b(contents, digest_size=16).hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, max_entries=1024, ttl_seconds=600, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self.max_bytes = int(max_bytes)
+
+        self._entries = OrderedDict()  # key -> (result, expires_at, size)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.generation = 0  # Bumped by clear()
+
+        # Stats
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached result for key, waits for an identical in-flight
+        computation, or runs compute() and caches its result.
+        Always returns a shallow copy so callers can add their own fields.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, expires_at, _ = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return dict(result)
+                self._remove(key)
+                self._expirations += 1
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = Future()
+                self._inflight[key] = pending
+                generation = self.generation
+                owner = True
+                self._misses += 1
+            else:
+                owner = False
+                self._coalesced += 1
+
+        if not owner:
+            return dict(pending.result())
+
+        try:
+            result = compute()
+        except Exception as e:
+            with self._lock:
+                self._finish(key, pending)
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            self._finish(key, pending)
+            # The model may have been swapped while this ran
+            if generation == self.generation:
+                self._store(key, result)
+        pending.set_result(result)
+        return dict(result)
+
+    def get(self, key):
+        """Returns a copy of the cached result, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, expires_at, _ = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return dict(result)
+                self._remove(key)
+                self._expirations += 1
+            self._misses += 1
+            return None
+
+    def put(self, key, result, generation=None):
+        """
+        generation: self.generation read before computing result. A clear() that
+        happened meanwhile makes the result stale, so it is not stored.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._store(key, result)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            # Later identical requests must not wait on a computation of the old model
+            self._inflight.clear()
+            self.generation += 1
+
+    def _finish(self, key, pending):
+        # After a clear() the key may belong to a newer computation
+        if self._inflight.get(key) is pending:
+            del self._inflight[key]
+
+    def _store(self, key, result):
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (result, time.monotonic() + self.ttl, size)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses + self._coalesced
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "inflight": len(self._inflight),
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "hit_rate": ((self._hits + self._coalesced) / lookups) if lookups else 0.0,
+            }
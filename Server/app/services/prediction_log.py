@@ -0,0 +1,305 @@
+import os
+import csv
+import glob
+import json
+import time
+import uuid
+import threading
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process simply starts its own segments
+    fcntl = None
+
+# ==========================================
+# PREDICTION LOG
+# ==========================================
+# Every answered upload is appended to fixed-size binary segment files, one
+# record per image, so analytics, calibration and retraining can read past
+# softmax outputs straight from disk instead of re-running the model over
+# captured_images.
+#
+#   prediction_log/
+#     segment_000001.bin    records (preallocated, memory-mapped)
+#     segment_000001.json   {"class_names", "embedding_dim", "versions", "capacity", "created"}
+#     index.csv             upload_id,image_path,linked_at
+#
+# Record layout (little endian, see record_dtype):
+#   image_hash     16 bytes  blake2b-128 of the uploaded bytes (prediction_cache.hash_bytes)
+#   upload_id      16 bytes  UUID of the temp image_filename returned by /identify_tool
+#   timestamp      f8        unix time; 0 marks the unwritten tail of a segment
+#   version        u2        index into the segment's "versions" list
+#   prediction     u2        argmax class index
+#   probabilities  f2[C]     softmax vector in class_names order
+#   embedding      f2[D]     optional (embedding_dim > 0)
+#
+# Each server process writes to its own segment and holds an exclusive advisory
+# lock (flock) on it, so several uvicorn workers never share a file. A segment is
+# closed when it is full or when the class list / embedding size changes (model
+# swap), so every segment has a single fixed record size. Partly filled segments
+# whose writer has exited are picked up again by the next process.
+#
+# When a checkout stores an upload, index.csv gets an upload_id -> image_path
+# line. The join with the records happens at read time (read_index), so links
+# survive restarts and work whichever worker served the upload.
+
+SEGMENT_PATTERN = 'segment_*.bin'
+
+
+def record_dtype(num_classes, embedding_dim=0):
+    fields = [
+        ('image_hash', 'S16'),
+        ('upload_id', 'S16'),
+        ('timestamp', '<f8'),
+        ('version', '<u2'),
+        ('prediction', '<u2'),
+        ('probabilities', '<f2', (num_classes,)),
+    ]
+    if embedding_dim:
+        fields.append(('embedding', '<f2', (embedding_dim,)))
+    return np.dtype(fields)
+
+
+def upload_id(image_filename) -> bytes:
+    """16-byte key for a temp image_filename ("<uuid4>.jpg"); empty when it isn't one"""
+    try:
+        return uuid.UUID(os.path.splitext(os.path.basename(image_filename))[0]).bytes
+    except (TypeError, ValueError):
+        return b''
+
+
+def _segment_id(bin_path):
+    return int(os.path.basename(bin_path)[len('segment_'):-len('.bin')])
+
+
+def read_segment(bin_path):
+    """
+    Returns (metadata, records) for one segment. records is a read-only
+    memory-mapped structured array holding only the written rows.
+    """
+    with open(bin_path[:-len('.bin')] + '.json', 'r') as f:
+        metadata = json.load(f)
+    dtype = record_dtype(len(metadata['class_names']), metadata.get('embedding_dim', 0))
+    if os.path.getsize(bin_path) < dtype.itemsize:
+        return metadata, np.zeros(0, dtype=dtype)
+    records = np.memmap(bin_path, dtype=dtype, mode='r')
+    # Records are appended in order, so the written rows are a prefix
+    return metadata, records[:int(np.count_nonzero(records['timestamp']))]
+
+
+def iter_segments(root):
+    """Yields (segment_id, metadata, records) for every segment under root, oldest first"""
+    for bin_path in sorted(glob.glob(os.path.join(root, SEGMENT_PATTERN))):
+        if not os.path.exists(bin_path[:-len('.bin')] + '.json'):
+            continue  # Being created
+        metadata, records = read_segment(bin_path)
+        yield _segment_id(bin_path), metadata, records
+
+
+def read_index(root) -> dict:
+    """Returns {upload_id (16 bytes): image_path} from index.csv; match it against records['upload_id']"""
+    index = {}
+    index_path = os.path.join(root, 'index.csv')
+    if not os.path.exists(index_path):
+        return index
+    with open(index_path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            index[bytes.fromhex(row['upload_id'])] = row['image_path']
+    return index
+
+
+class PredictionLog:
+    def __init__(self, root, segment_records=65536):
+        """
+        Args:
+            root (str): Directory holding the segments and index.csv.
+            segment_records (int): Records preallocated per segment file.
+        """
+        self.root = root
+        self.segment_records = max(1, int(segment_records))
+
+        self._lock = threading.Lock()
+        self._segment_id = None
+        self._metadata = None
+        self._records = None
+        self._lock_file = None
+        self._count = 0
+
+        # Stats
+        self._appended = 0
+        self._linked = 0
+        self._errors = 0
+
+    # --- Segments ---
+    def _metadata_path(self, segment_id):
+        return os.path.join(self.root, f"segment_{segment_id:06d}.json")
+
+    def _bin_path(self, segment_id):
+        return os.path.join(self.root, f"segment_{segment_id:06d}.bin")
+
+    def _write_metadata(self):
+        tmp_path = f"{self._metadata_path(self._segment_id)}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._metadata, f)
+        os.replace(tmp_path, self._metadata_path(self._segment_id))
+
+    def _close_segment(self):
+        if self._records is not None:
+            self._records.flush()
+        if self._lock_file is not None:
+            self._lock_file.close()  # Releases the flock
+        self._segment_id = self._metadata = self._records = self._lock_file = None
+        self._count = 0
+
+    @staticmethod
+    def _try_lock(lock_file):
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _resume_segment(self, class_names, embedding_dim):
+        """Takes over the newest matching, partly filled segment no other process holds"""
+        if fcntl is None:
+            return False
+        for bin_path in sorted(glob.glob(os.path.join(self.root, SEGMENT_PATTERN)), reverse=True)[:8]:
+            lock_file = open(bin_path, 'r+b')
+            if not self._try_lock(lock_file):
+                lock_file.close()
+                continue
+            try:
+                metadata, written = read_segment(bin_path)
+            except (OSError, ValueError):
+                lock_file.close()
+                continue
+            if (metadata['class_names'] == class_names and metadata.get('embedding_dim', 0) == embedding_dim
+                    and len(written) < metadata['capacity']):
+                dtype = record_dtype(len(class_names), embedding_dim)
+                self._segment_id, self._metadata, self._count = _segment_id(bin_path), metadata, len(written)
+                self._records = np.memmap(bin_path, dtype=dtype, mode='r+')
+                self._lock_file = lock_file
+                return True
+            lock_file.close()
+        return False
+
+    def _open_segment(self, class_names, embedding_dim):
+        os.makedirs(self.root, exist_ok=True)
+        if self._resume_segment(class_names, embedding_dim):
+            return
+
+        # O_EXCL makes the segment id unique across processes
+        existing = glob.glob(os.path.join(self.root, SEGMENT_PATTERN))
+        segment_id = max((_segment_id(path) for path in existing), default=0) + 1
+        while True:
+            try:
+                fd = os.open(self._bin_path(segment_id), os.O_CREAT | os.O_EXCL | os.O_RDWR, 0o644)
+                break
+            except FileExistsError:
+                segment_id += 1
+        lock_file = os.fdopen(fd, 'r+b')
+        self._try_lock(lock_file)
+
+        dtype = record_dtype(len(class_names), embedding_dim)
+        # Zero-filled (sparse) file: timestamp 0 marks rows not written yet
+        lock_file.truncate(dtype.itemsize * self.segment_records)
+        self._segment_id, self._lock_file, self._count = segment_id, lock_file, 0
+        self._metadata = {
+            "class_names": list(class_names),
+            "embedding_dim": embedding_dim,
+            "versions": [],
+            "capacity": self.segment_records,
+            "created": time.time(),
+        }
+        self._write_metadata()
+        self._records = np.memmap(self._bin_path(segment_id), dtype=dtype, mode='r+')
+        print(f"[ML] Prediction log: started {os.path.basename(self._bin_path(segment_id))}")
+
+    # --- Writing ---
+    def append(self, image_hash: str, model_version, class_names, probabilities, embedding=None,
+               image_filename=None):
+        """
+        Appends one record. Returns (segment_id, row).
+
+        Args:
+            image_hash (str): Hex digest from prediction_cache.hash_bytes.
+            model_version (str): Version that produced the prediction.
+            class_names (list): Order of probabilities.
+            probabilities: Softmax vector.
+            embedding: Optional embedding vector.
+            image_filename (str): Temp filename; stored as upload_id for link_image().
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float16)
+        embedding_dim = 0 if embedding is None else int(np.size(embedding))
+        class_names = list(class_names)
+        version = model_version or 'default'
+
+        with self._lock:
+            try:
+                if (self._records is None or self._count >= self._metadata['capacity']
+                        or self._metadata['class_names'] != class_names
+                        or self._metadata['embedding_dim'] != embedding_dim):
+                    self._close_segment()
+                    self._open_segment(class_names, embedding_dim)
+
+                versions = self._metadata['versions']
+                if version not in versions:
+                    versions.append(version)
+                    self._write_metadata()
+
+                row = self._count
+                records = self._records
+                records['image_hash'][row] = bytes.fromhex(image_hash)
+                records['upload_id'][row] = upload_id(image_filename)
+                records['version'][row] = versions.index(version)
+                records['prediction'][row] = int(np.argmax(probabilities))
+                records['probabilities'][row] = probabilities
+                if embedding_dim:
+                    records['embedding'][row] = np.asarray(embedding, dtype=np.float16).reshape(-1)
+                # Written last: a non-zero timestamp is what makes the row visible to readers
+                records['timestamp'][row] = time.time()
+                self._count += 1
+                self._appended += 1
+                return self._segment_id, row
+            except Exception:
+                self._errors += 1
+                raise
+
+    def link_image(self, image_filename: str, image_path: str) -> bool:
+        """Records that the upload saved as image_filename is now transactions.image_path"""
+        key = upload_id(image_filename)
+        if not key:
+            return False
+        os.makedirs(self.root, exist_ok=True)
+        index_path = os.path.join(self.root, 'index.csv')
+        with self._lock, open(index_path, 'a', newline='') as f:
+            # Other workers append to the same file
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            writer = csv.writer(f)
+            if os.fstat(f.fileno()).st_size == 0:
+                writer.writerow(['upload_id', 'image_path', 'linked_at'])
+            writer.writerow([key.hex(), image_path, time.strftime('%Y-%m-%dT%H:%M:%S')])
+            f.flush()
+            self._linked += 1
+        return True
+
+    def close(self):
+        with self._lock:
+            self._close_segment()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "root": self.root,
+                "segment": self._segment_id,
+                "segment_rows": self._count,
+                "segment_capacity": self._metadata['capacity'] if self._metadata else self.segment_records,
+                "record_bytes": self._records.dtype.itemsize if self._records is not None else None,
+                "appended": self._appended,
+                "linked": self._linked,
+                "errors": self._errors,
+            }
@@ -0,0 +1,163 @@
+import os
+import time
+import threading
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from app.services.raw_image import rgb_bytes, image_size
+
+# ==========================================
+# MULTI-PROCESS INFERENCE BACKEND
+# ==========================================
+# One Python process with intra-op threads doesn't scale EfficientNet linearly on
+# many-core machines. This backend starts N worker processes that each hold a
+# copy of the model. The parent writes the decoded RGB pixels of a batch into one
+# shared-memory block and only sends (offset, width, height) tuples to the
+# workers, so large images are never pickled.
+
+# Per-process model, set by _init_worker
+_worker_model = None
+
+
+def _attach_shared_memory(name):
+    try:
+        # Python 3.13+: don't let the worker's resource tracker own the block
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # The parent unlinks the block; stop the tracker from doing it again
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _init_worker(threads_per_worker, slot_counter=None):
+    global _worker_model
+    import torch
+    from app.services import ml_service
+
+    if slot_counter is not None:
+        # Each worker takes the next block of threads_per_worker cores
+        with slot_counter.get_lock():
+            slot = slot_counter.value
+            slot_counter.value += 1
+        cpus = sorted(os.sched_getaffinity(0))
+        start = (slot * threads_per_worker) % len(cpus)
+        pinned = {cpus[(start + i) % len(cpus)] for i in range(threads_per_worker)}
+        os.sched_setaffinity(0, pinned)
+        print(f"[ML] Worker {os.getpid()} pinned to CPUs {sorted(pinned)}")
+
+    torch.set_num_threads(threads_per_worker)
+    torch.set_num_interop_threads(1)
+    _worker_model = ml_service.build_model(map_location="cpu")
+
+
+def _worker_ready():
+    return _worker_model is not None
+
+
+def _worker_predict(shm_name, specs):
+    import torch
+    from app.services import ml_service
+
+    shm = _attach_shared_memory(shm_name)
+    try:
+        images = []
+        for offset, width, height in specs:
+            with shm.buf[offset:offset + width * height * 3] as view:
+                images.append(Image.frombytes('RGB', (width, height), bytes(view)))
+    finally:
+        shm.close()
+
+    input_batch = ml_service.batch_preprocess(images)
+    with torch.no_grad():
+        output = _worker_model(input_batch)
+        probabilities = torch.nn.functional.softmax(output, dim=1)
+    return probabilities.numpy()
+
+
+class ProcessPoolBackend:
+    name = "process"
+
+    def __init__(self, num_workers=2, threads_per_worker=1, pin_cpus=False):
+        self.num_workers = max(1, int(num_workers))
+        self.threads_per_worker = max(1, int(threads_per_worker))
+        # CPU affinity is Linux-only
+        self.pin_cpus = pin_cpus and hasattr(os, 'sched_setaffinity')
+        self._pool = None
+        self._lock = threading.Lock()
+
+        # Stats
+        self._calls = 0
+        self._images = 0
+        self._total_time = 0.0
+
+    def start(self):
+        # 'spawn' so workers don't inherit the server's threads/event loop
+        context = mp.get_context('spawn')
+        slot_counter = context.Value('i', 0) if self.pin_cpus else None
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.threads_per_worker, slot_counter),
+        )
+        # Force every worker to start and load its model now instead of on the first request
+        ready = [self._pool.submit(_worker_ready) for _ in range(self.num_workers)]
+        if not all(f.result() for f in ready):
+            raise RuntimeError("Worker process failed to load the model")
+        print(f"[ML] Started {self.num_workers} inference workers x {self.threads_per_worker} threads")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def predict_proba(self, images: list[Image.Image]) -> np.ndarray:
+        if self._pool is None:
+            raise Exception("Process backend is not running")
+
+        started = time.perf_counter()
+        # PIL images or raw upload arrays, as packed RGB
+        pixels = [rgb_bytes(image) for image in images]
+
+        # Lay every image out back to back in one shared block
+        specs = []
+        offset = 0
+        for image in images:
+            width, height = image_size(image)
+            specs.append((offset, width, height))
+            offset += width * height * 3
+
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        try:
+            for buffer, (start, width, height) in zip(pixels, specs):
+                shm.buf[start:start + width * height * 3] = buffer
+
+            # Split the batch across workers so a single batch uses every core
+            chunks = np.array_split(np.arange(len(specs)), min(len(specs), self.num_workers))
+            futures = [
+                self._pool.submit(_worker_predict, shm.name, [specs[i] for i in chunk])
+                for chunk in chunks if len(chunk)
+            ]
+            probabilities = np.concatenate([f.result() for f in futures])
+        finally:
+            shm.close()
+            shm.unlink()
+
+        with self._lock:
+            self._calls += 1
+            self._images += len(images)
+            self._total_time += time.perf_counter() - started
+        return probabilities
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "num_workers": self.num_workers,
+                "threads_per_worker": self.threads_per_worker,
+                "calls": self._calls,
+                "images": self._images,
+                "avg_call_ms": (self._total_time / self._calls * 1000) if self._calls else 0.0,
+            }
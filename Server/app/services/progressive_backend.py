@@ -0,0 +1,105 @@
+import time
+import threading
+import numpy as np
+
+# ==========================================
+# PROGRESSIVE-RESOLUTION INFERENCE
+# ==========================================
+# EfficientNet ends in adaptive pooling, so the same weights run at any input
+# size. Every image is classified at a reduced resolution first (224 px costs
+# about a third of 384 px); it is re-run at full IMG_SIZE only when the low-res
+# answer is uncertain:
+#     top-1 probability < min_confidence   or   top-1 - top-2 < min_margin
+# scripts/calibrate_progressive.py picks the two thresholds from captured_images.
+
+def top2_margin(probabilities: np.ndarray):
+    """Returns (top-1 probability, top-1 minus top-2 probability) per row"""
+    top2 = np.partition(probabilities, -2, axis=1)[:, -2:]
+    return top2[:, 1], top2[:, 1] - top2[:, 0]
+
+
+class ProgressiveBackend:
+    def __init__(self, low_backend, full_backend, low_size, full_size, min_confidence=0.9, min_margin=0.0):
+        self.low = low_backend
+        self.full = full_backend
+        self.low_size = int(low_size)
+        self.full_size = int(full_size)
+        self.min_confidence = float(min_confidence)
+        self.min_margin = float(min_margin)
+        self.name = f"progressive({full_backend.name}@{self.low_size}->{self.full_size})"
+        self.class_names = getattr(full_backend, 'class_names', None)
+        self.model = getattr(full_backend, 'model', None)
+
+        self._lock = threading.Lock()
+        self._images = 0
+        self._low_hits = 0
+        self._low_confidence = 0
+        self._low_margin = 0
+        self._low_time = 0.0
+        self._full_time = 0.0
+
+    def predict_detailed(self, images):
+        """Returns (probabilities, [{"resolution": low_size|full_size}, ...])"""
+        started = time.perf_counter()
+        probabilities = self.low.predict_proba(images)
+        low_done = time.perf_counter()
+
+        confidence, margin = top2_margin(probabilities)
+        unsure_confidence = confidence < self.min_confidence
+        unsure_margin = margin < self.min_margin
+        escalate = np.flatnonzero(unsure_confidence | unsure_margin)
+        if len(escalate):
+            probabilities = probabilities.copy()
+            probabilities[escalate] = self.full.predict_proba([images[i] for i in escalate])
+        full_done = time.perf_counter()
+
+        with self._lock:
+            self._images += len(images)
+            self._low_hits += len(images) - len(escalate)
+            self._low_confidence += int(unsure_confidence.sum())
+            self._low_margin += int(unsure_margin.sum())
+            self._low_time += low_done - started
+            self._full_time += full_done - low_done
+
+        escalated = set(escalate.tolist())
+        return probabilities, [
+            {"resolution": self.full_size if i in escalated else self.low_size} for i in range(len(images))
+        ]
+
+    def predict_proba(self, images):
+        return self.predict_detailed(images)[0]
+
+    def shutdown(self):
+        if hasattr(self.full, 'shutdown'):
+            self.full.shutdown()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            images = self._images
+            escalated = images - self._low_hits
+            stats = {
+                "low_size": self.low_size,
+                "full_size": self.full_size,
+                "min_confidence": self.min_confidence,
+                "min_margin": self.min_margin,
+                "images": images,
+                "resolutions": {
+                    str(self.low_size): {
+                        "answered": self._low_hits,
+                        "hit_rate": self._low_hits / images if images else 0.0,
+                        "ms_per_image": (self._low_time / images * 1000) if images else 0.0,
+                    },
+                    str(self.full_size): {
+                        "answered": escalated,
+                        "hit_rate": escalated / images if images else 0.0,
+                        "ms_per_image": (self._full_time / escalated * 1000) if escalated else 0.0,
+                    },
+                },
+                # An image can fail both checks
+                "escalated_low_confidence": self._low_confidence,
+                "escalated_low_margin": self._low_margin,
+                "avg_ms_per_image": ((self._low_time + self._full_time) / images * 1000) if images else 0.0,
+            }
+        if hasattr(self.full, 'get_stats'):
+            stats["full_backend"] = self.full.get_stats()
+        return stats
@@ -0,0 +1,125 @@
+import struct
+import numpy as np
+from PIL import Image
+
+# ==========================================
+# RAW RGB UPLOAD FORMAT
+# ==========================================
+# The Station already pads/resizes captures to IMG_SIZE x IMG_SIZE. Instead of
+# JPEG-encoding that on the Pi and decoding it again here, it can upload the
+# pixels as-is:
+#
+#   header (14 bytes, little endian)
+#     magic    4s   b'TRGB'
+#     version  u8   1
+#     codec    u8   0 = none, 1 = zstd, 2 = lz4 (frame)
+#     height   u16
+#     width    u16
+#     length   u32  payload length in bytes (after compression)
+#   payload         height * width * 3 uint8 RGB, row-major (HWC), optionally compressed
+#
+# decode_raw_image wraps the (decompressed) payload as a read-only HWC uint8
+# array without copying it; the preprocessors accept these arrays wherever
+# they accept PIL images. Station/services/raw_image.py writes the same format.
+
+RAW_CONTENT_TYPE = 'application/x-toole-rgb8'
+RAW_MAGIC = b'TRGB'
+RAW_VERSION = 1
+HEADER = struct.Struct('<4sBBHHI')
+MAX_SIDE = 4096
+
+CODEC_NONE, CODEC_ZSTD, CODEC_LZ4 = 0, 1, 2
+CODECS = {'none': CODEC_NONE, 'zstd': CODEC_ZSTD, 'lz4': CODEC_LZ4}
+
+
+class RawImageError(ValueError):
+    """Malformed or unsupported raw upload (the route answers 400)"""
+
+
+def is_raw_image(contents: bytes) -> bool:
+    return contents[:4] == RAW_MAGIC
+
+
+def _decompress(codec, payload, expected_size):
+    """Output is capped just above expected_size, so a small payload can't expand into a huge buffer"""
+    if codec == CODEC_NONE:
+        return payload
+    if codec == CODEC_ZSTD:
+        try:
+            import zstandard
+        except ImportError:
+            raise RawImageError("zstd-compressed upload but the 'zstandard' package is not installed")
+        try:
+            return zstandard.ZstdDecompressor().decompress(payload, max_output_size=expected_size)
+        except zstandard.ZstdError as e:
+            raise RawImageError(f"Invalid zstd payload: {e}")
+    if codec == CODEC_LZ4:
+        try:
+            import lz4.frame
+        except ImportError:
+            raise RawImageError("LZ4-compressed upload but the 'lz4' package is not installed")
+        try:
+            # One byte more than expected is enough to tell an oversize payload apart
+            pixels = lz4.frame.LZ4FrameDecompressor().decompress(payload, max_length=expected_size + 1)
+        except RuntimeError as e:
+            raise RawImageError(f"Invalid LZ4 payload: {e}")
+        if len(pixels) > expected_size:
+            raise RawImageError(f"LZ4 payload decompresses to more than {expected_size} bytes")
+        return pixels
+    raise RawImageError(f"Unknown raw image codec {codec}")
+
+
+def decode_raw_image(contents: bytes) -> np.ndarray:
+    """Returns the pixels as a read-only (height, width, 3) uint8 array backed by the upload"""
+    if len(contents) < HEADER.size:
+        raise RawImageError("Raw image upload is shorter than its header")
+    magic, version, codec, height, width, length = HEADER.unpack_from(contents)
+    if magic != RAW_MAGIC or version != RAW_VERSION:
+        raise RawImageError(f"Unsupported raw image header ({magic!r}, version {version})")
+    if not (0 < height <= MAX_SIDE and 0 < width <= MAX_SIDE):
+        raise RawImageError(f"Invalid raw image size {width}x{height}")
+    if len(contents) - HEADER.size != length:
+        raise RawImageError(f"Raw image payload is {len(contents) - HEADER.size} bytes, header says {length}")
+
+    expected_size = height * width * 3
+    payload = memoryview(contents)[HEADER.size:]
+    pixels = _decompress(codec, payload, expected_size)
+    if len(pixels) != expected_size:
+        raise RawImageError(f"Raw image has {len(pixels)} bytes of pixels, expected {expected_size}")
+    return np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 3)
+
+
+def encode_raw_image(image, compression='none') -> bytes:
+    """PIL image or HWC uint8 array -> raw upload bytes"""
+    pixels = np.ascontiguousarray(np.asarray(to_pil(image) if isinstance(image, Image.Image) else image, dtype=np.uint8))
+    height, width = pixels.shape[:2]
+    payload = pixels.tobytes()
+    codec = CODECS[compression]
+    if codec == CODEC_ZSTD:
+        import zstandard
+        payload = zstandard.ZstdCompressor(level=3).compress(payload)
+    elif codec == CODEC_LZ4:
+        import lz4.frame
+        payload = lz4.frame.compress(payload)
+    return HEADER.pack(RAW_MAGIC, RAW_VERSION, codec, height, width, len(payload)) + payload
+
+
+# --- Helpers for code that takes either PIL images or raw arrays ---
+def to_pil(image) -> Image.Image:
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(image, 'RGB')
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+
+def image_size(image):
+    """(width, height), like PIL's Image.size"""
+    if isinstance(image, np.ndarray):
+        return image.shape[1], image.shape[0]
+    return image.size
+
+
+def rgb_bytes(image):
+    """Packed RGB pixel buffer (no copy for raw arrays)"""
+    if isinstance(image, np.ndarray):
+        return memoryview(np.ascontiguousarray(image)).cast('B')
+    return to_pil(image).tobytes()
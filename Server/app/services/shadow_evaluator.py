@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from app.services.image_service import normalize_label
+
+# ==========================================
+# SHADOW EVALUATION
+# ==========================================
+# A candidate model version runs next to the served one on a random sample of
+# /identify_tool uploads. The route hands the upload over after the response is
+# sent; a single background thread predicts it with the candidate, so kiosks
+# never wait for it and at most one shadow forward pass runs at a time. When the
+# backlog is full, samples are dropped instead of queued.
+#
+# Every sample is appended to a JSONL log:
+#   {"type": "prediction", "image_filename", "production": {...}, "candidate": {...}, "agree"}
+# When the checkout referencing that image_filename arrives in /transactions the
+# label follows:
+#   {"type": "label", "image_filename", "image_path", "tool_name", "classification_correct",
+#    "production_correct", "candidate_correct"}
+# Agreement and accuracy are aggregated incrementally for GET /ml/shadow.
+
+class ShadowEvaluator:
+    def __init__(self, log_path, sample_rate=0.1, max_backlog=16, max_unlabeled=10000):
+        """
+        Args:
+            log_path (str): JSONL file the samples and labels are appended to.
+            sample_rate (float): Fraction of /identify_tool requests sent to the candidate.
+            max_backlog (int): Samples waiting for the shadow thread before new ones are dropped.
+            max_unlabeled (int): Samples remembered while waiting for their transaction.
+        """
+        self.log_path = log_path
+        self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+        self.max_backlog = max(1, int(max_backlog))
+        self.max_unlabeled = max(1, int(max_unlabeled))
+        self.backend = None
+        self.version = None
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ml-shadow")
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._unlabeled = OrderedDict()  # image_filename -> (production, candidate)
+        self._backlog = 0
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._since = time.time()
+        self._samples = 0
+        self._agreements = 0
+        self._dropped = 0
+        self._errors = 0
+        self._total_time = 0.0
+        self._labeled = 0
+        self._production_correct = 0
+        self._candidate_correct = 0
+        self._fixed = 0
+        self._regressed = 0
+
+    @property
+    def enabled(self):
+        return self.backend is not None and self.sample_rate > 0
+
+    def set_candidate(self, backend, version):
+        """Starts evaluating backend. Stats restart; samples of the previous candidate are forgotten."""
+        with self._lock:
+            retired = self.backend
+            self.backend, self.version = backend, version
+            self._unlabeled.clear()
+            self._reset_stats()
+        if retired is not None and retired is not backend and hasattr(retired, 'shutdown'):
+            retired.shutdown()
+        print(f"[ML] Shadow-evaluating model version {version} on {self.sample_rate:.0%} of traffic")
+
+    def clear_candidate(self):
+        self.set_candidate(None, None)
+
+    def should_sample(self) -> bool:
+        return self.enabled and random.random() < self.sample_rate
+
+    def submit(self, contents: bytes, production: dict, image_filename: str, production_version, predict):
+        """
+        Queues a shadow prediction. Returns immediately.
+
+        Args:
+            contents (bytes): The uploaded image.
+            production (dict): The response /identify_tool sent.
+            image_filename (str): Temp filename the later transaction refers to.
+            production_version: Served model version (None for the default model file).
+            predict: predict(backend, contents) -> prediction dict, called on the shadow thread.
+        """
+        with self._lock:
+            backend, version = self.backend, self.version
+            if backend is None:
+                return
+            if self._backlog >= self.max_backlog:
+                self._dropped += 1
+                return
+            self._backlog += 1
+        self._executor.submit(self._evaluate, backend, version, contents, production,
+                              image_filename, production_version, predict)
+
+    def _evaluate(self, backend, version, contents, production, image_filename, production_version, predict):
+        started = time.perf_counter()
+        try:
+            candidate = predict(backend, contents)
+        except Exception as e:
+            with self._lock:
+                self._backlog -= 1
+                self._errors += 1
+            print(f"[ML] Shadow prediction failed: {e}")
+            return
+        elapsed = time.perf_counter() - started
+
+        production = {"prediction": production.get("prediction"), "score": production.get("score")}
+        candidate = {"prediction": candidate["prediction"], "score": candidate["score"]}
+        agree = production["prediction"] == candidate["prediction"]
+        with self._lock:
+            self._backlog -= 1
+            # The candidate was replaced while this sample waited
+            if backend is not self.backend:
+                return
+            self._samples += 1
+            self._agreements += int(agree)
+            self._total_time += elapsed
+            self._unlabeled[image_filename] = (production["prediction"], candidate["prediction"])
+            while len(self._unlabeled) > self.max_unlabeled:
+                self._unlabeled.popitem(last=False)
+
+        self._append({
+            "type": "prediction",
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "image_filename": image_filename,
+            "production": {"version": production_version, **production},
+            "candidate": {"version": version, **candidate},
+            "agree": agree,
+        })
+
+    def record_label(self, image_filename: str, tool_name: str, classification_correct=None, image_path=None):
+        """
+        Joins a transaction's label to its shadow sample, if the upload was sampled.
+        The tool actually borrowed is the ground truth; classification_correct is the
+        kiosk's verdict on the production prediction and is used for it when present.
+        """
+        with self._lock:
+            sample = self._unlabeled.pop(image_filename, None)
+        if sample is None:
+            return
+        production_prediction, candidate_prediction = sample
+
+        label = normalize_label(tool_name)
+        if classification_correct is None:
+            production_correct = normalize_label(production_prediction) == label
+        else:
+            production_correct = bool(classification_correct)
+        candidate_correct = normalize_label(candidate_prediction) == label
+
+        with self._lock:
+            self._labeled += 1
+            self._production_correct += int(production_correct)
+            self._candidate_correct += int(candidate_correct)
+            self._fixed += int(candidate_correct and not production_correct)
+            self._regressed += int(production_correct and not candidate_correct)
+
+        self._append({
+            "type": "label",
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "image_filename": image_filename,
+            "image_path": image_path,
+            "tool_name": tool_name,
+            "classification_correct": classification_correct,
+            "production_correct": production_correct,
+            "candidate_correct": candidate_correct,
+        })
+
+    def _append(self, entry):
+        try:
+            with self._log_lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+                with open(self.log_path, 'a') as f:
+                    f.write(json.dumps(entry) + '\n')
+        except OSError as e:
+            print(f"[ML] Could not write shadow log {self.log_path}: {e}")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            samples, labeled = self._samples, self._labeled
+            return {
+                "candidate_version": self.version,
+                "sample_rate": self.sample_rate,
+                "since": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self._since)),
+                "samples": samples,
+                "agreement": (self._agreements / samples) if samples else None,
+                "dropped": self._dropped,
+                "errors": self._errors,
+                "backlog": self._backlog,
+                "avg_ms": (self._total_time / samples * 1000) if samples else 0.0,
+                "labeled": labeled,
+                "awaiting_label": len(self._unlabeled),
+                "production_accuracy": (self._production_correct / labeled) if labeled else None,
+                "candidate_accuracy": (self._candidate_correct / labeled) if labeled else None,
+                # Labeled samples only the candidate got right / only production got right
+                "candidate_fixed": self._fixed,
+                "candidate_regressed": self._regressed,
+                "log_path": self.log_path,
+            }
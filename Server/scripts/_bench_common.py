@@ -0,0 +1,49 @@
+"""
+Helpers shared by the benchmark, tuning and model-conversion scripts.
+Importing this module does not pull in torch or the app, so lightweight
+drivers (load_benchmark, autotune_cpu's parent process) can use it too.
+"""
+import os
+import time
+import subprocess
+
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git_commit():
+    """Short hash of the checked-out commit, or None outside a git checkout"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVER_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure_latency(run, example, iterations, warmup=3):
+    """
+    Single-input latency in ms. Wrap the call in torch.no_grad() when run is a
+    PyTorch module.
+
+    Args:
+        run: Callable taking example.
+        example: The input, e.g. a (1, 3, H, W) tensor.
+        iterations (int): Timed calls.
+        warmup (int): Untimed calls before them.
+    """
+    timings = []
+    for i in range(warmup + iterations):
+        started = time.perf_counter()
+        run(example)
+        if i >= warmup:
+            timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "mean_ms": float(np.mean(timings)),
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p95_ms": float(np.percentile(timings, 95)),
+    }
+
+
+def int_list(value):
+    """argparse type for comma-separated integers, e.g. "1,4,16" """
+    return [int(v) for v in value.split(',') if v.strip()]
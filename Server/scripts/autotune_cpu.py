@@ -0,0 +1,249 @@
+"""
+Finds the CPU thread/worker settings that serve the classifier fastest on this
+machine and writes them to a profile (app/services/cpu_profile.json) that
+ml_service applies at startup.
+
+Every candidate configuration runs in its own subprocess - torch only accepts
+the inter-op thread count once per process - which loads the model exactly as
+the server does (ML_BACKEND, batch scheduler, inference executor, prediction
+cache off) and drives /identify_tool's code path with --concurrency parallel
+requests built from ML/test*.jpg for --duration seconds. What is searched
+depends on the backend:
+    torch, torchscript, int8, ensemble   torch intra-op x inter-op threads x executor workers
+    process                              threads per worker (workers fill the cores), CPU pinning
+    onnx                                 ONNX Runtime threads x executor workers
+Explicit ML_* environment variables still override the profile, and the profile
+is ignored when the server runs a different ML_BACKEND than it was tuned for.
+
+Run from the Server/ directory:
+    python -m scripts.autotune_cpu
+    python -m scripts.autotune_cpu --backend process --concurrency 16 --duration 20
+    python -m scripts.autotune_cpu --objective latency --dry-run
+"""
+import os
+import sys
+import glob
+import json
+import time
+import asyncio
+import argparse
+import itertools
+import subprocess
+
+from scripts._bench_common import git_commit, int_list
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ML_DIR = os.path.join(os.path.dirname(SERVER_DIR), 'ML')
+DEFAULT_PROFILE = os.path.join(SERVER_DIR, 'app', 'services', 'cpu_profile.json')
+RESULT_PREFIX = 'AUTOTUNE_RESULT '
+
+TORCH_BACKENDS = ['torch', 'torchscript', 'int8', 'ensemble']
+BACKENDS = TORCH_BACKENDS + ['process', 'onnx']
+
+
+# --- Candidate configurations ---
+def powers_of_two(limit):
+    values, value = [], 1
+    while value <= limit:
+        values.append(value)
+        value *= 2
+    if values[-1] != limit:
+        values.append(limit)
+    return values
+
+
+def candidate_configs(args):
+    """Settings per candidate, keyed like the profile (and ML_<KEY> env vars)"""
+    cores = args.cores
+    threads = args.threads or powers_of_two(cores)
+    executor_workers = args.executor_workers or [1, 2, 4]
+
+    if args.backend == 'process':
+        configs = []
+        for threads_per_worker, pin in itertools.product(threads, args.pin):
+            configs.append({
+                "threads_per_worker": threads_per_worker,
+                "process_workers": max(1, cores // threads_per_worker),
+                "pin_cpus": pin,
+            })
+        return configs
+
+    if args.backend == 'onnx':
+        return [
+            {"onnx_threads": t, "executor_workers": e}
+            for t, e in itertools.product(threads, executor_workers)
+            if t * e <= cores * args.max_oversubscription
+        ]
+
+    return [
+        {"torch_threads": t, "torch_interop_threads": i, "executor_workers": e}
+        for t, i, e in itertools.product(threads, args.interop, executor_workers)
+        if t * e <= cores * args.max_oversubscription
+    ]
+
+
+# --- Child: measure one configuration ---
+async def drive(ml_service, images, concurrency, duration):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client(index):
+        nonlocal errors
+        i = index
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                await ml_service.run_inference(ml_service.predict_image_bytes, images[i % len(images)])
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+            i += concurrency
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run_child(args):
+    from app.services import ml_service
+
+    images = []
+    for path in sorted(glob.glob(os.path.join(ML_DIR, 'test*.jpg'))):
+        with open(path, 'rb') as f:
+            images.append(f.read())
+    if not images:
+        raise SystemExit(f"[TUNE] No sample images found in {ML_DIR}")
+
+    ml_service.load_ml_model()
+    ml_service.start_batch_scheduler()
+    ml_service.start_inference_executor()
+    try:
+        asyncio.run(drive(ml_service, images, args.concurrency, args.warmup))
+        latencies, errors, elapsed = asyncio.run(drive(ml_service, images, args.concurrency, args.duration))
+    finally:
+        ml_service.stop_inference_executor()
+        ml_service.stop_batch_scheduler()
+        ml_service.unload_ml_model()
+
+    latencies.sort()
+    result = {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+# --- Parent: search and write the profile ---
+def measure(config, args):
+    env = dict(os.environ)
+    env.update({
+        'ML_BACKEND': args.backend,
+        'ML_CACHE_ENABLED': '0',
+        # Candidates must not pick up a previous profile
+        'ML_CPU_PROFILE': os.devnull,
+        # No admission control: shed 429/503s would count as errors and hide slow configurations
+        'ML_QUEUE_MAX_DEPTH': '0',
+        'ML_QUEUE_DEADLINE_SECONDS': '0',
+    })
+    env.update({f"ML_{key.upper()}": str(int(value) if isinstance(value, bool) else value)
+                for key, value in config.items()})
+    command = [sys.executable, '-m', 'scripts.autotune_cpu', '--child',
+               '--concurrency', str(args.concurrency),
+               '--duration', str(args.duration), '--warmup', str(args.warmup)]
+    completed = subprocess.run(command, cwd=SERVER_DIR, env=env, capture_output=True, text=True,
+                               timeout=args.duration + args.warmup + 300)
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    tail = (completed.stderr or completed.stdout).strip().splitlines()[-1:] or ['no output']
+    return {"error": f"exit code {completed.returncode}: {tail[0]}"}
+
+
+def sort_key(result, objective):
+    if objective == 'latency':
+        return (result["p95_ms"], -result["throughput_rps"])
+    return (-result["throughput_rps"], result["p95_ms"])
+
+
+def main(args):
+    configs = candidate_configs(args)
+    print(f"[TUNE] ML_BACKEND={args.backend} | {args.cores} cores | {len(configs)} configurations "
+          f"x {args.warmup + args.duration:.0f}s at concurrency {args.concurrency}")
+    if args.dry_run:
+        for config in configs:
+            print(f"    {config}")
+        return
+
+    candidates = []
+    for n, config in enumerate(configs, 1):
+        print(f"[TUNE] ({n}/{len(configs)}) {config} ...", end=' ', flush=True)
+        result = measure(config, args)
+        if "error" in result:
+            print(f"failed: {result['error']}")
+        elif not result["requests"] or result["errors"]:
+            print(f"failed: {result['errors']} errors")
+        else:
+            print(f"{result['throughput_rps']:.1f} req/s, p95 {result['p95_ms']:.1f} ms")
+        candidates.append({"config": config, **result})
+
+    valid = [c for c in candidates if "error" not in c and c["requests"] and not c["errors"]]
+    if not valid:
+        raise SystemExit("[TUNE] No configuration completed. Check that the model loads with this ML_BACKEND.")
+    best = min(valid, key=lambda c: sort_key(c, args.objective))
+
+    profile = {
+        "backend": args.backend,
+        **best["config"],
+        "tuned_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "commit": git_commit(),
+        "cpu_count": os.cpu_count(),
+        "objective": args.objective,
+        "concurrency": args.concurrency,
+        "throughput_rps": best["throughput_rps"],
+        "p95_ms": best["p95_ms"],
+        "candidates": candidates,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(profile, f, indent=2)
+
+    print(f"[TUNE] Best: {best['config']} - {best['throughput_rps']:.1f} req/s, p95 {best['p95_ms']:.1f} ms")
+    print(f"[TUNE] Profile written to {args.output}. Restart the server to apply it.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tune CPU threads/workers for the TOOL-E classifier")
+    parser.add_argument('--backend', default=os.getenv('ML_BACKEND', 'torch').lower(), choices=BACKENDS)
+    parser.add_argument('--threads', type=int_list, default=None,
+                        help="Intra-op / ONNX / per-worker thread counts to try (default: powers of two up to --cores)")
+    parser.add_argument('--interop', type=int_list, default=[1, 2], help="torch inter-op thread counts to try")
+    parser.add_argument('--executor-workers', type=int_list, default=None,
+                        help="Inference executor sizes to try (default: 1,2,4)")
+    parser.add_argument('--pin', type=lambda v: [p.strip() in ('1', 'true') for p in v.split(',')],
+                        default=[False, True], help="process backend: CPU pinning options, e.g. 0,1")
+    parser.add_argument('--cores', type=int, default=len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1))
+    parser.add_argument('--max-oversubscription', type=float, default=1.0,
+                        help="Skip configurations whose threads x executor workers exceed cores x this")
+    parser.add_argument('--concurrency', type=int, default=8, help="Parallel requests, i.e. busy kiosks")
+    parser.add_argument('--duration', type=float, default=15.0, help="Measured seconds per configuration")
+    parser.add_argument('--warmup', type=float, default=3.0)
+    parser.add_argument('--objective', choices=['throughput', 'latency'], default='throughput')
+    parser.add_argument('--output', default=DEFAULT_PROFILE)
+    parser.add_argument('--dry-run', action='store_true', help="List the configurations without running them")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args)
+    else:
+        main(args)
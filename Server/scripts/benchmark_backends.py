@@ -0,0 +1,219 @@
+"""
+Micro-benchmark matrix for the classifier's inference backends on CPU.
+
+For every model form
+    eager          FP32 PyTorch (ML_BACKEND=torch)
+    torchscript    traced + frozen TorchScript (ML_BACKEND=torchscript)
+    onnx           ONNX Runtime CPU provider (ML_BACKEND=onnx)
+    int8           quantized TorchScript from scripts/quantize_model.py (ML_BACKEND=int8)
+    channels_last  FP32 eager with NHWC memory format
+it measures single-image latency, batched throughput for each batch size, and
+top-1 agreement with the eager FP32 reference on real images (ML/test*.jpg plus
+captures from captured_images/Yes). Only the forward pass is timed; every form
+gets the same preprocessed tensors.
+
+The torchscript and onnx forms are built from the FP32 weights on the fly, so the
+matrix always compares like with like. The int8 form needs an existing artifact
+(ML_INT8_PATH) and is skipped without one.
+
+Run from the Server/ directory:
+    python -m scripts.benchmark_backends
+    python -m scripts.benchmark_backends --forms eager,onnx --batch-sizes 1,8,32 --threads 4
+"""
+import os
+import glob
+import json
+import time
+import random
+import argparse
+import tempfile
+
+# The reference model is always the FP32 PyTorch one
+os.environ['ML_BACKEND'] = 'torch'
+
+import numpy as np
+import torch
+from PIL import Image
+from app.services import ml_service, image_service
+from scripts._bench_common import git_commit, measure_latency, int_list
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ML_DIR = os.path.join(os.path.dirname(SERVER_DIR), 'ML')
+
+FORMS = ['eager', 'torchscript', 'onnx', 'int8', 'channels_last']
+
+
+# --- Model forms ---
+# Each builder returns run(batch: torch.Tensor) -> logits as a NumPy array
+def build_eager(model, args):
+    def run(batch):
+        with torch.no_grad():
+            return model(batch).numpy()
+    return run
+
+
+def build_torchscript(model, args):
+    example = torch.randn(1, 3, ml_service.IMG_SIZE, ml_service.IMG_SIZE)
+    with torch.no_grad():
+        scripted = torch.jit.freeze(torch.jit.trace(model, example))
+    return build_eager(scripted, args)
+
+
+def build_channels_last(model, args):
+    nhwc_model = ml_service.build_model(map_location='cpu').to(memory_format=torch.channels_last)
+
+    def run(batch):
+        with torch.no_grad():
+            return nhwc_model(batch.contiguous(memory_format=torch.channels_last)).numpy()
+    return run
+
+
+def build_int8(model, args):
+    if not os.path.exists(ml_service.INT8_MODEL_PATH):
+        raise FileNotFoundError(f"{ml_service.INT8_MODEL_PATH} (run python -m scripts.quantize_model first)")
+    return build_eager(ml_service.load_torchscript_model(ml_service.INT8_MODEL_PATH), args)
+
+
+def build_onnx(model, args):
+    import onnxruntime as ort
+
+    onnx_path = os.path.join(tempfile.mkdtemp(prefix='toole_bench_'), 'model.onnx')
+    example = torch.randn(1, 3, ml_service.IMG_SIZE, ml_service.IMG_SIZE)
+    torch.onnx.export(model, example, onnx_path, input_names=['input'], output_names=['logits'],
+                      dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+                      opset_version=17, do_constant_folding=True)
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = args.threads
+    session = ort.InferenceSession(onnx_path, sess_options=options, providers=['CPUExecutionProvider'])
+
+    def run(batch):
+        return session.run(None, {'input': batch.numpy()})[0]
+    return run
+
+
+BUILDERS = {
+    'eager': build_eager,
+    'torchscript': build_torchscript,
+    'onnx': build_onnx,
+    'int8': build_int8,
+    'channels_last': build_channels_last,
+}
+
+
+# --- Measurements ---
+def load_eval_tensors(max_captures, seed):
+    paths = sorted(glob.glob(os.path.join(ML_DIR, 'test*.jpg')))
+    captures = [path for path, _ in image_service.list_tool_images('Yes')]
+    random.Random(seed).shuffle(captures)
+    paths += captures[:max_captures]
+    if not paths:
+        raise SystemExit("[BENCH] No images found in ML/test*.jpg or captured_images/Yes")
+    return torch.stack([ml_service.inference_transform(Image.open(path).convert('RGB')) for path in paths])
+
+
+def predict_top1(run, tensors, batch_size=8):
+    return np.concatenate([run(tensors[i:i + batch_size]).argmax(axis=1) for i in range(0, len(tensors), batch_size)])
+
+
+def make_batch(tensors, batch_size):
+    repeats = -(-batch_size // len(tensors))
+    return tensors.repeat(repeats, 1, 1, 1)[:batch_size].contiguous()
+
+
+def measure_throughput(run, tensors, batch_size, iterations, warmup):
+    """Images per second at a fixed batch size"""
+    batch = make_batch(tensors, batch_size)
+    for _ in range(warmup):
+        run(batch)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        run(batch)
+    elapsed = time.perf_counter() - started
+    return {
+        "images_per_s": batch_size * iterations / elapsed,
+        "ms_per_batch": elapsed / iterations * 1000,
+    }
+
+
+def print_table(results, batch_sizes):
+    header = f"{'form':<14}{'p50 ms':>9}{'p95 ms':>9}{'agree':>8}" + ''.join(f"{f'bs{b} img/s':>12}" for b in batch_sizes)
+    print(header)
+    print('-' * len(header))
+    for form, result in results.items():
+        if "error" in result:
+            print(f"{form:<14}skipped: {result['error']}")
+            continue
+        row = f"{form:<14}{result['latency']['p50_ms']:>9.1f}{result['latency']['p95_ms']:>9.1f}"
+        row += f"{result['top1_agreement']:>8.3f}"
+        row += ''.join(f"{result['throughput'][str(b)]['images_per_s']:>12.1f}" for b in batch_sizes)
+        print(row)
+
+
+def main(args):
+    torch.set_num_threads(args.threads)
+
+    tensors = load_eval_tensors(args.images, args.seed)
+    print(f"[BENCH] {len(tensors)} evaluation images | {args.threads} threads | batch sizes {args.batch_sizes}")
+
+    model = ml_service.build_model(map_location='cpu')
+    reference = predict_top1(build_eager(model, args), tensors)
+
+    results = {}
+    for form in args.forms:
+        try:
+            run = BUILDERS[form](model, args)
+        except Exception as e:
+            print(f"[BENCH] Skipping {form}: {e}")
+            results[form] = {"error": str(e)}
+            continue
+
+        print(f"[BENCH] Measuring {form}...")
+        predictions = predict_top1(run, tensors)
+        results[form] = {
+            "top1_agreement": float(np.mean(predictions == reference)),
+            "latency": measure_latency(run, tensors[:1].contiguous(), args.latency_iters, args.warmup),
+            "throughput": {
+                str(batch_size): measure_throughput(run, tensors, batch_size, args.throughput_iters, args.warmup)
+                for batch_size in args.batch_sizes
+            },
+        }
+
+    print()
+    print_table(results, args.batch_sizes)
+
+    report = {
+        "commit": git_commit(),
+        "started_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "torch_version": torch.__version__,
+        "threads": args.threads,
+        "img_size": ml_service.IMG_SIZE,
+        "eval_images": len(tensors),
+        "results": results,
+    }
+    output = args.output or os.path.join(SERVER_DIR, 'benchmark_results',
+                                         f"backends_{report['commit'] or 'nogit'}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n[BENCH] Results written to {output}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the TOOL-E classifier across backends")
+    parser.add_argument('--forms', default=','.join(FORMS), type=lambda v: [f.strip() for f in v.split(',')],
+                        help=f"Comma-separated, from {FORMS}")
+    parser.add_argument('--batch-sizes', default=[1, 2, 4, 8, 16, 32], type=int_list)
+    parser.add_argument('--threads', type=int, default=torch.get_num_threads())
+    parser.add_argument('--images', type=int, default=100, help="Captures from captured_images/Yes used for agreement")
+    parser.add_argument('--latency-iters', type=int, default=30)
+    parser.add_argument('--throughput-iters', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    unknown = [f for f in args.forms if f not in BUILDERS]
+    if unknown:
+        parser.error(f"Unknown forms {unknown}; choose from {FORMS}")
+    main(args)
@@ -0,0 +1,117 @@
+"""
+Compares the serving preprocessing path (draft JPEG decode + fused batch
+preprocessing, see app/services/preprocessing.py) with the reference per-image
+path (full PIL decode, convert, Resize/ToTensor/Normalize, torch.stack).
+
+Reports JPEG decode time per image with and without draft (and how many
+images draft actually decoded at reduced scale), time per image for decode and
+preprocessing, the largest input-tensor difference, and top-1 agreement of the
+model on both inputs.
+
+Run from the Server/ directory:
+    python -m scripts.benchmark_preprocessing
+    python -m scripts.benchmark_preprocessing --images 200 --batch-size 8 --no-model
+"""
+import io
+import os
+import glob
+import time
+import random
+import argparse
+
+# The fused path needs torch
+os.environ['ML_BACKEND'] = 'torch'
+
+import torch
+from PIL import Image
+from app.services import ml_service, image_service
+
+ML_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'ML')
+
+
+def reference_pipeline(batch_contents):
+    images = [Image.open(io.BytesIO(contents)).convert('RGB') for contents in batch_contents]
+    return torch.stack([ml_service.inference_transform(image) for image in images])
+
+
+def fused_pipeline(batch_contents):
+    images = [ml_service.decode_image(contents) for contents in batch_contents]
+    # Copy out of the reusable buffer so the result can be compared later
+    return ml_service.batch_preprocess(images).clone()
+
+
+def full_decode(contents):
+    image = Image.open(io.BytesIO(contents)).convert('RGB')
+    image.load()
+    return image
+
+
+def time_decode(decode, contents, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for data in contents:
+            decode(data)
+    return (time.perf_counter() - started) / (len(contents) * repeats) * 1000
+
+
+def run(pipeline, batches, repeats):
+    outputs = [pipeline(batch) for batch in batches]
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for batch in batches:
+            pipeline(batch)
+    elapsed = time.perf_counter() - started
+    images = sum(len(batch) for batch in batches) * repeats
+    return torch.cat(outputs), elapsed / images * 1000
+
+
+def main(args):
+    torch.set_num_threads(args.threads)
+    paths = sorted(glob.glob(os.path.join(ML_DIR, 'test*.jpg')))
+    captures = [path for path, _ in image_service.list_tool_images('Yes')]
+    random.Random(args.seed).shuffle(captures)
+    paths += captures[:args.images]
+    if not paths:
+        raise SystemExit("[BENCH] No images found in ML/test*.jpg or captured_images/Yes")
+
+    contents = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            contents.append(f.read())
+    batches = [contents[i:i + args.batch_size] for i in range(0, len(contents), args.batch_size)]
+    print(f"[BENCH] {len(contents)} images, batch size {args.batch_size}, draft {'on' if ml_service.JPEG_DRAFT else 'off'}")
+
+    reduced = sum(ml_service.decode_image(data).size != Image.open(io.BytesIO(data)).size for data in contents)
+    full_ms = time_decode(full_decode, contents, args.repeats)
+    draft_ms = time_decode(ml_service.decode_image, contents, args.repeats)
+    print(f"[BENCH] Decode: full {full_ms:.2f} ms/image, serving {draft_ms:.2f} ms/image "
+          f"({full_ms / draft_ms:.2f}x) | draft reduced {reduced}/{len(contents)} images "
+          f"(target {ml_service.DRAFT_MIN_SIZE}px)")
+
+    reference, reference_ms = run(reference_pipeline, batches, args.repeats)
+    fused, fused_ms = run(fused_pipeline, batches, args.repeats)
+    max_diff = float((reference - fused).abs().max())
+
+    print(f"[BENCH] Reference: {reference_ms:.2f} ms/image")
+    print(f"[BENCH] Fused:     {fused_ms:.2f} ms/image ({reference_ms / fused_ms:.2f}x)")
+    print(f"[BENCH] Max input difference: {max_diff:.5f}")
+
+    if args.model:
+        model = ml_service.build_model(map_location='cpu')
+        with torch.no_grad():
+            ref_probs = torch.cat([torch.softmax(model(chunk), dim=1) for chunk in reference.split(args.batch_size)])
+            new_probs = torch.cat([torch.softmax(model(chunk), dim=1) for chunk in fused.split(args.batch_size)])
+        agreement = float((ref_probs.argmax(dim=1) == new_probs.argmax(dim=1)).float().mean())
+        prob_diff = float((ref_probs - new_probs).abs().max())
+        print(f"[BENCH] Top-1 agreement: {agreement:.4f} | max probability difference: {prob_diff:.5f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the TOOL-E preprocessing path")
+    parser.add_argument('--images', type=int, default=100, help="Captures from captured_images/Yes to include")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=torch.get_num_threads())
+    parser.add_argument('--no-model', dest='model', action='store_false', help="Skip the prediction comparison")
+    parser.add_argument('--seed', type=int, default=42)
+    main(parser.parse_args())
@@ -0,0 +1,131 @@
+"""
+Chooses the thresholds for progressive-resolution inference (ML_PROGRESSIVE_ENABLED=1).
+
+Every labeled capture in captured_images/Yes and captured_images/No (both are
+filed under the tool actually borrowed) is classified once at the low resolution
+and once at full IMG_SIZE. Each (min_confidence, min_margin) pair on a grid is
+then replayed offline: escalated images take the full-resolution answer. The
+script reports accuracy, agreement with full resolution, escalation rate and the
+expected ms/image, and recommends the cheapest pair whose accuracy is within
+--max-drop of always running at full resolution.
+
+Run from the Server/ directory:
+    python -m scripts.calibrate_progressive
+    python -m scripts.calibrate_progressive --low-size 256 --max-drop 0.002
+"""
+import os
+import json
+import time
+import argparse
+
+# Calibration runs the PyTorch model directly
+os.environ['ML_BACKEND'] = 'torch'
+
+import numpy as np
+import torch
+from PIL import Image
+from app.services import ml_service, image_service
+from app.services.progressive_backend import top2_margin
+
+
+def run_at_size(model, paths, img_size, batch_size):
+    """Returns (probabilities, ms per image)"""
+    preprocess = ml_service.make_batch_preprocess(img_size, ml_service.NORMALIZE_MEAN, ml_service.NORMALIZE_STD)
+    outputs = []
+    elapsed = 0.0
+    for i in range(0, len(paths), batch_size):
+        images = [Image.open(path).convert('RGB') for path in paths[i:i + batch_size]]
+        started = time.perf_counter()
+        with torch.no_grad():
+            logits = model(preprocess(images).to(ml_service.device))
+            outputs.append(torch.softmax(logits, dim=1).cpu().numpy())
+        elapsed += time.perf_counter() - started
+    return np.concatenate(outputs), elapsed / len(paths) * 1000
+
+
+def main(args):
+    samples = []
+    for decision in args.decisions:
+        samples.extend(image_service.list_labeled_images(ml_service.CLASS_NAMES, decision=decision))
+    if not samples:
+        raise SystemExit(f"[CALIB] No labeled images found under {image_service.CAPTURED_IMAGES_DIR}")
+    paths = [path for path, _ in samples]
+    labels = np.array([label for _, label in samples])
+
+    model = ml_service.build_model()
+    full_size = ml_service.IMG_SIZE
+    print(f"[CALIB] {len(samples)} images | {args.low_size}px vs {full_size}px")
+
+    # Warm up both sizes so the first batch's kernel selection isn't timed
+    run_at_size(model, paths[:args.batch_size], args.low_size, args.batch_size)
+    run_at_size(model, paths[:args.batch_size], full_size, args.batch_size)
+    low_probs, low_ms = run_at_size(model, paths, args.low_size, args.batch_size)
+    full_probs, full_ms = run_at_size(model, paths, full_size, args.batch_size)
+
+    low_pred, full_pred = low_probs.argmax(axis=1), full_probs.argmax(axis=1)
+    full_acc = float(np.mean(full_pred == labels))
+    low_acc = float(np.mean(low_pred == labels))
+    confidence, margin = top2_margin(low_probs)
+
+    grid = []
+    for min_confidence in args.confidences:
+        for min_margin in args.margins:
+            escalate = (confidence < min_confidence) | (margin < min_margin)
+            final = np.where(escalate, full_pred, low_pred)
+            rate = float(escalate.mean())
+            grid.append({
+                "min_confidence": min_confidence,
+                "min_margin": min_margin,
+                "top1": float(np.mean(final == labels)),
+                "agreement_with_full": float(np.mean(final == full_pred)),
+                "escalation_rate": rate,
+                "low_hit_rate": 1.0 - rate,
+                "expected_ms_per_image": low_ms + rate * full_ms,
+            })
+
+    acceptable = [g for g in grid if g["top1"] >= full_acc - args.max_drop]
+    recommended = min(acceptable, key=lambda g: (g["expected_ms_per_image"], -g["top1"])) if acceptable else None
+
+    report = {
+        "images": len(samples),
+        "low_size": args.low_size,
+        "full_size": full_size,
+        "low": {"top1": low_acc, "ms_per_image": low_ms},
+        "full": {"top1": full_acc, "ms_per_image": full_ms},
+        "max_allowed_drop": args.max_drop,
+        "recommended": recommended,
+        "grid": grid,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"[CALIB] {args.low_size}px: top-1 {low_acc:.4f}, {low_ms:.1f} ms/image")
+    print(f"[CALIB] {full_size}px: top-1 {full_acc:.4f}, {full_ms:.1f} ms/image")
+    if recommended:
+        print(f"[CALIB] Recommended: top-1 {recommended['top1']:.4f}, "
+              f"{recommended['low_hit_rate']:.1%} answered at {args.low_size}px, "
+              f"~{recommended['expected_ms_per_image']:.1f} ms/image")
+        print(f"    ML_PROGRESSIVE_ENABLED=1 ML_PROGRESSIVE_LOW_SIZE={args.low_size} "
+              f"ML_PROGRESSIVE_MIN_CONFIDENCE={recommended['min_confidence']} "
+              f"ML_PROGRESSIVE_MIN_MARGIN={recommended['min_margin']}")
+    else:
+        print(f"[CALIB] No threshold pair stays within {args.max_drop} of full-resolution accuracy")
+    print(f"[CALIB] Report written to {args.output}")
+
+
+def float_list(value):
+    return [float(v) for v in value.split(',') if v.strip()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Calibrate progressive-resolution thresholds")
+    parser.add_argument('--low-size', type=int, default=ml_service.PROGRESSIVE_LOW_SIZE)
+    parser.add_argument('--confidences', type=float_list,
+                        default=[0.0, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.97, 0.99])
+    parser.add_argument('--margins', type=float_list, default=[0.0, 0.05, 0.1, 0.2, 0.3, 0.5])
+    parser.add_argument('--max-drop', type=float, default=0.005, help="Largest acceptable top-1 drop vs full resolution")
+    parser.add_argument('--decisions', default=['Yes', 'No'], type=lambda v: v.split(','),
+                        help="captured_images subfolders to use")
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--output', default=os.path.join(ml_service.BASE_DIR, 'progressive_calibration.json'))
+    main(parser.parse_args())
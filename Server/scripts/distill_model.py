@@ -0,0 +1,323 @@
+"""
+Distills the cross-validation fold ensemble into one compact student model.
+
+The teacher is the set of fold checkpoints matched by ML_ENSEMBLE_GLOB (the same
+models ML_BACKEND=ensemble serves), or the single default model if there are no
+folds. Teacher logits are computed once per image at IMG_SIZE and cached on disk
+(keyed by path and mtime), so re-runs with different student settings only pay
+for images that are new or changed since the last run.
+
+The student (default MobileNetV3-Large at 224 px) is trained on
+    alpha * T^2 * KL(student / T || mean fold softmax / T) + (1 - alpha) * CE(label)
+and saved as a plain state_dict that ml_service.build_model can load:
+
+    ML_MODEL_PATH=app/services/student_mobilenet_v3_large.pth \
+    ML_MODEL_ARCH=mobilenet_v3_large ML_IMG_SIZE=224 uvicorn app.main:app
+
+or registered as a model version with --register.
+
+The images are split into train, validation (picks the best epoch) and test
+(--test-fraction); the reported and registered top-1 come from the test images
+only, which the student neither trained on nor was selected with.
+
+Training images come from --dataset (an ImageFolder-style <root>/<ToolName>/ tree,
+e.g. the notebook's training set) plus the kiosk captures in captured_images/Yes
+and captured_images/No (both are filed under the tool the user actually borrowed).
+
+Run from the Server/ directory:
+    python -m scripts.distill_model --dataset ../ML/dataset/train
+    python -m scripts.distill_model --student-arch mobilenet_v3_small --epochs 30 --register 2026-10-17_student
+"""
+import os
+import glob
+import json
+import random
+import argparse
+
+# Distillation runs the PyTorch teacher models
+os.environ['ML_BACKEND'] = 'torch'
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torchvision import models, transforms
+from PIL import Image
+from app.services import ml_service, image_service
+from scripts._bench_common import measure_latency
+
+
+def teacher_paths():
+    paths = sorted(glob.glob(ml_service.ENSEMBLE_GLOB))
+    return paths or [ml_service.MODEL_PATH]
+
+
+def load_samples(dataset_dirs):
+    samples = []
+    for root in dataset_dirs:
+        samples.extend(image_service.list_labeled_images(ml_service.CLASS_NAMES, root=root))
+    for decision in ('Yes', 'No'):
+        samples.extend(image_service.list_labeled_images(ml_service.CLASS_NAMES, decision=decision))
+    # The same file can be reachable through more than one root
+    return list(dict(samples).items())
+
+
+# --- Teacher logits cache ---
+def load_teacher_cache(cache_path, fold_paths):
+    """Returns {image_path: (mtime, logits[num_folds, C])} for a cache built by the same teachers"""
+    if not os.path.exists(cache_path):
+        return {}
+    data = np.load(cache_path, allow_pickle=True)
+    if list(data['teachers']) != [os.path.basename(p) for p in fold_paths]:
+        print("[DISTILL] Teacher set changed; rebuilding the logit cache")
+        return {}
+    return {path: (float(mtime), logits) for path, mtime, logits in zip(data['paths'], data['mtimes'], data['logits'])}
+
+
+def save_teacher_cache(cache_path, fold_paths, cache):
+    paths = sorted(cache)
+    tmp_path = cache_path + '.tmp.npz'
+    np.savez(
+        tmp_path,
+        teachers=np.array([os.path.basename(p) for p in fold_paths], dtype=object),
+        paths=np.array(paths, dtype=object),
+        mtimes=np.array([cache[p][0] for p in paths]),
+        logits=np.stack([cache[p][1] for p in paths]).astype(np.float32),
+    )
+    os.replace(tmp_path, cache_path)
+
+
+def compute_teacher_logits(samples, fold_paths, cache_path, batch_size):
+    """Returns (N, num_folds, C) teacher logits aligned with samples, computing only uncached images"""
+    cache = load_teacher_cache(cache_path, fold_paths)
+    missing = [path for path, _ in samples
+               if path not in cache or cache[path][0] != os.path.getmtime(path)]
+    print(f"[DISTILL] Teacher logits: {len(samples) - len(missing)} cached, {len(missing)} to compute")
+
+    if missing:
+        teachers = [ml_service.build_model(path, arch='efficientnet_v2_s') for path in fold_paths]
+        for i in range(0, len(missing), batch_size):
+            chunk = missing[i:i + batch_size]
+            batch = torch.stack([
+                ml_service.inference_transform(Image.open(path).convert('RGB')) for path in chunk
+            ]).to(ml_service.device)
+            with torch.no_grad():
+                logits = torch.stack([teacher(batch) for teacher in teachers], dim=1).cpu().numpy()
+            for path, row in zip(chunk, logits):
+                cache[path] = (os.path.getmtime(path), row)
+        save_teacher_cache(cache_path, fold_paths, cache)
+        del teachers
+
+    return np.stack([cache[path][1] for path, _ in samples])
+
+
+# --- Student ---
+def build_student(arch, num_classes, pretrained):
+    if not pretrained:
+        return getattr(models, arch)(weights=None, num_classes=num_classes)
+    # ImageNet weights, new classification head
+    model = getattr(models, arch)(weights='DEFAULT')
+    head = model.classifier[-1]
+    model.classifier[-1] = nn.Linear(head.in_features, num_classes)
+    return model
+
+
+class DistillDataset(torch.utils.data.Dataset):
+    def __init__(self, samples, teacher_logits, transform):
+        self.samples = samples
+        self.teacher_logits = torch.from_numpy(teacher_logits)
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, i):
+        path, label = self.samples[i]
+        image = self.transform(Image.open(path).convert('RGB'))
+        return image, label, self.teacher_logits[i]
+
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature, alpha):
+    """teacher_logits: (batch, num_folds, C); the folds are averaged in probability space"""
+    soft_targets = F.softmax(teacher_logits / temperature, dim=2).mean(dim=1)
+    kd = F.kl_div(F.log_softmax(student_logits / temperature, dim=1), soft_targets,
+                  reduction='batchmean') * temperature ** 2
+    return alpha * kd + (1 - alpha) * F.cross_entropy(student_logits, labels)
+
+
+def evaluate(model, loader):
+    """Returns (top1_accuracy, student_predictions, teacher_predictions, labels)"""
+    model.eval()
+    student_preds, teacher_preds, labels = [], [], []
+    with torch.no_grad():
+        for images, batch_labels, teacher_logits in loader:
+            student_preds.extend(model(images.to(ml_service.device)).argmax(dim=1).tolist())
+            teacher_preds.extend(F.softmax(teacher_logits, dim=2).mean(dim=1).argmax(dim=1).tolist())
+            labels.extend(batch_labels.tolist())
+    accuracy = float(np.mean([p == l for p, l in zip(student_preds, labels)])) if labels else None
+    return accuracy, student_preds, teacher_preds, labels
+
+
+def model_latency(forward, img_size, iterations):
+    """Single-image latency in ms on a random input"""
+    example = torch.randn(1, 3, img_size, img_size, device=ml_service.device)
+    with torch.no_grad():
+        return measure_latency(forward, example, iterations)
+
+
+def main(args):
+    torch.manual_seed(args.seed)
+    samples = load_samples(args.dataset)
+    if not samples:
+        raise SystemExit("[DISTILL] No labeled images found")
+
+    fold_paths = teacher_paths()
+    print(f"[DISTILL] Teacher: {len(fold_paths)} model(s) | {len(samples)} images")
+    teacher_logits = compute_teacher_logits(samples, fold_paths, args.teacher_cache, args.batch_size)
+
+    # Test images are only used for the final report, validation images pick the epoch
+    order = list(range(len(samples)))
+    random.Random(args.seed).shuffle(order)
+    n_test = max(1, int(len(samples) * args.test_fraction))
+    n_val = max(1, int(len(samples) * args.val_fraction))
+    test_idx, val_idx, train_idx = order[:n_test], order[n_test:n_test + n_val], order[n_test + n_val:]
+    if not train_idx:
+        raise SystemExit(f"[DISTILL] {len(samples)} images are too few for a train / validation / test split "
+                         f"(--val-fraction {args.val_fraction}, --test-fraction {args.test_fraction})")
+    print(f"[DISTILL] Split: {len(train_idx)} train | {len(val_idx)} validation | {len(test_idx)} test")
+
+    mean, std = ml_service.NORMALIZE_MEAN, ml_service.NORMALIZE_STD
+    train_transform = transforms.Compose([
+        transforms.RandomResizedCrop(args.img_size, scale=(0.7, 1.0)),
+        transforms.RandomHorizontalFlip(),
+        transforms.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.2),
+        transforms.ToTensor(),
+        transforms.Normalize(mean, std),
+    ])
+    eval_transform = ml_service.make_transform(args.img_size, mean, std)
+
+    def subset(indices, transform):
+        return DistillDataset([samples[i] for i in indices], teacher_logits[indices], transform)
+
+    train_loader = torch.utils.data.DataLoader(subset(train_idx, train_transform), batch_size=args.batch_size,
+                                               shuffle=True, num_workers=args.workers)
+    val_loader = torch.utils.data.DataLoader(subset(val_idx, eval_transform), batch_size=args.batch_size,
+                                             num_workers=args.workers)
+    test_loader = torch.utils.data.DataLoader(subset(test_idx, eval_transform), batch_size=args.batch_size,
+                                              num_workers=args.workers)
+
+    num_classes = len(ml_service.CLASS_NAMES)
+    student = build_student(args.student_arch, num_classes, args.pretrained).to(ml_service.device)
+    optimizer = torch.optim.AdamW(student.parameters(), lr=args.lr, weight_decay=args.weight_decay)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=args.epochs)
+
+    best_acc, best_state = -1.0, None
+    for epoch in range(args.epochs):
+        student.train()
+        total_loss = 0.0
+        for images, labels, batch_teacher_logits in train_loader:
+            images = images.to(ml_service.device)
+            labels = labels.to(ml_service.device)
+            batch_teacher_logits = batch_teacher_logits.to(ml_service.device)
+            loss = distillation_loss(student(images), batch_teacher_logits, labels, args.temperature, args.alpha)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(images)
+        scheduler.step()
+
+        accuracy, *_ = evaluate(student, val_loader)
+        print(f"[DISTILL] Epoch {epoch + 1}/{args.epochs} | loss {total_loss / len(train_idx):.4f} | val top-1 {accuracy:.4f}")
+        if accuracy > best_acc:
+            best_acc = accuracy
+            best_state = {k: v.detach().cpu().clone() for k, v in student.state_dict().items()}
+
+    student.load_state_dict(best_state)
+    torch.save(best_state, args.output)
+    print(f"[DISTILL] Saved student to {args.output}")
+
+    # Accuracy (held-out test images) + latency report
+    student_acc, student_preds, teacher_preds, labels = evaluate(student, test_loader)
+    teacher_acc = float(np.mean([p == l for p, l in zip(teacher_preds, labels)]))
+    agreement = float(np.mean([s == t for s, t in zip(student_preds, teacher_preds)]))
+
+    torch.set_num_threads(args.threads)
+    teachers = [ml_service.build_model(path, arch='efficientnet_v2_s') for path in fold_paths]
+    teacher_latency = model_latency(lambda x: [t(x) for t in teachers], ml_service.IMG_SIZE, args.latency_iters)
+    student_latency = model_latency(student, args.img_size, args.latency_iters)
+
+    report = {
+        "train_images": len(train_idx),
+        "val_images": len(val_idx),
+        "test_images": len(test_idx),
+        "best_val_top1": best_acc,
+        "threads": args.threads,
+        "teacher": {
+            "models": [os.path.basename(p) for p in fold_paths],
+            "img_size": ml_service.IMG_SIZE,
+            "top1": teacher_acc,
+            "latency": teacher_latency,
+            "size_mb": sum(os.path.getsize(p) for p in fold_paths) / 1e6,
+        },
+        "student": {
+            "arch": args.student_arch,
+            "img_size": args.img_size,
+            "top1": student_acc,
+            "latency": student_latency,
+            "size_mb": os.path.getsize(args.output) / 1e6,
+        },
+        "top1_agreement": agreement,
+        "top1_drop": teacher_acc - student_acc,
+        "speedup": teacher_latency["mean_ms"] / student_latency["mean_ms"],
+        "temperature": args.temperature,
+        "alpha": args.alpha,
+        "epochs": args.epochs,
+    }
+    report_path = os.path.splitext(args.output)[0] + '.report.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"[DISTILL] Test top-1 teacher: {teacher_acc:.4f} | {teacher_latency['mean_ms']:.1f} ms")
+    print(f"[DISTILL] Test top-1 student: {student_acc:.4f} | {student_latency['mean_ms']:.1f} ms")
+    print(f"[DISTILL] Agreement: {agreement:.4f} | Speedup: {report['speedup']:.2f}x. Report written to {report_path}")
+
+    if args.register:
+        metadata = ml_service.model_registry.register(
+            args.register,
+            args.output,
+            'pth',
+            class_names=ml_service.CLASS_NAMES,
+            img_size=args.img_size,
+            normalize_mean=mean,
+            normalize_std=std,
+            notes=f"Distilled from {len(fold_paths)} fold model(s); test top-1 {student_acc:.4f}",
+            arch=args.student_arch,
+        )
+        print(f"[DISTILL] Registered version {args.register} at {metadata['artifact_path']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Distill the TOOL-E fold ensemble into a compact student")
+    parser.add_argument('--dataset', action='append', default=[],
+                        help="ImageFolder-style training root (<root>/<ToolName>/); may be repeated")
+    parser.add_argument('--student-arch', default='mobilenet_v3_large')
+    parser.add_argument('--img-size', type=int, default=224)
+    parser.add_argument('--pretrained', action='store_true', help="Start the student from ImageNet weights")
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--teacher-cache', default=os.path.join(ml_service.BASE_DIR, 'teacher_logits.npz'))
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--lr', type=float, default=1e-3)
+    parser.add_argument('--weight-decay', type=float, default=1e-4)
+    parser.add_argument('--temperature', type=float, default=4.0)
+    parser.add_argument('--alpha', type=float, default=0.7, help="Weight of the distillation term vs. cross-entropy")
+    parser.add_argument('--val-fraction', type=float, default=0.15, help="Images used to pick the best epoch")
+    parser.add_argument('--test-fraction', type=float, default=0.15, help="Held-out images for the reported top-1")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--latency-iters', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=torch.get_num_threads())
+    parser.add_argument('--register', default=None, metavar='VERSION', help="Also add the student to the model registry")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    args.output = args.output or os.path.join(ml_service.BASE_DIR, f'student_{args.student_arch}.pth')
+    main(args)
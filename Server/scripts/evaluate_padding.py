@@ -0,0 +1,76 @@
+"""
+Measures the classifier's top-1 accuracy on the confirmed captures in
+captured_images/Yes/<ToolName>/ as they were uploaded, and after the Station's
+capture padding (PAD_CAPTURES: letterboxed to 384x384 on white with LANCZOS,
+see Station/View/CaptureScreen/capture_screen.py). Enable PAD_CAPTURES on the
+kiosks only if the padded accuracy is not lower.
+
+Run from the Server/ directory:
+    python -m scripts.evaluate_padding
+    python -m scripts.evaluate_padding --images 500 --output padding_report.json
+"""
+import os
+import json
+import random
+import argparse
+
+import numpy as np
+from PIL import Image, ImageOps
+from app.services import ml_service, image_service
+
+STATION_SIZE = 384
+
+
+def pad_like_station(image):
+    return ImageOps.pad(image, (STATION_SIZE, STATION_SIZE), method=Image.LANCZOS,
+                        color="white", centering=(0.5, 0.5))
+
+
+def evaluate(samples, transform, batch_size):
+    """Returns (top1_accuracy, predictions)"""
+    predictions = []
+    for i in range(0, len(samples), batch_size):
+        chunk = samples[i:i + batch_size]
+        images = [transform(Image.open(path).convert('RGB')) for path, _ in chunk]
+        predictions.extend(result["prediction"] for result in ml_service.predict_batch(images))
+    labels = [ml_service.CLASS_NAMES[label] for _, label in samples]
+    return float(np.mean([p == l for p, l in zip(predictions, labels)])), predictions
+
+
+def main(args):
+    ml_service.load_ml_model()
+    if ml_service.inference_backend is None:
+        raise SystemExit("[EVAL] The model could not be loaded")
+
+    samples = image_service.list_labeled_images(ml_service.CLASS_NAMES, decision='Yes')
+    random.Random(args.seed).shuffle(samples)
+    samples = samples[:args.images] if args.images else samples
+    if not samples:
+        raise SystemExit("[EVAL] No labeled captures found in captured_images/Yes")
+
+    print(f"[EVAL] {len(samples)} captures, backend {ml_service.inference_backend.name}")
+    unpadded_acc, unpadded_preds = evaluate(samples, lambda image: image, args.batch_size)
+    padded_acc, padded_preds = evaluate(samples, pad_like_station, args.batch_size)
+    report = {
+        "images": len(samples),
+        "backend": ml_service.inference_backend.name,
+        "unpadded_top1": unpadded_acc,
+        "padded_top1": padded_acc,
+        "top1_agreement": float(np.mean([a == b for a, b in zip(unpadded_preds, padded_preds)])),
+    }
+    print(f"[EVAL] Unpadded top-1: {unpadded_acc:.4f} | padded top-1: {padded_acc:.4f} "
+          f"| agreement {report['top1_agreement']:.4f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[EVAL] Report written to {args.output}")
+    ml_service.unload_ml_model()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Classifier accuracy on padded vs unpadded captures")
+    parser.add_argument('--images', type=int, default=0, help="Captures to evaluate (default: all)")
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help="Optional JSON report path")
+    main(parser.parse_args())
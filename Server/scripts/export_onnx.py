@@ -0,0 +1,78 @@
+"""
+Exports the fine-tuned EfficientNetV2-S (.pth + class_names.json) to ONNX so the
+server can run with ML_BACKEND=onnx.
+
+Run from the Server/ directory:
+    python -m scripts.export_onnx
+    python -m scripts.export_onnx --weights ../ML/efficientnet_finetuned_sprint2.pth \
+        --class-names ../ML/class_names.json --output ../ML/efficientnet_finetuned_sprint2.onnx
+"""
+import os
+import json
+import argparse
+
+# Exporting always needs the PyTorch model, whatever backend the server is set to
+os.environ['ML_BACKEND'] = 'torch'
+
+import numpy as np
+import torch
+import onnx
+import onnxruntime as ort
+from app.services import ml_service
+
+
+def export(weights_path, class_names_path, output_path, opset):
+    with open(class_names_path, 'r') as f:
+        class_names = json.load(f)
+
+    model = ml_service.build_model(weights_path, num_classes=len(class_names), map_location='cpu')
+
+    print(f"[EXPORT] Exporting {weights_path} -> {output_path} (opset {opset})")
+    dummy = torch.randn(1, 3, ml_service.IMG_SIZE, ml_service.IMG_SIZE)
+    torch.onnx.export(
+        model,
+        dummy,
+        output_path,
+        input_names=['input'],
+        output_names=['logits'],
+        dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+        opset_version=opset,
+        do_constant_folding=True,
+    )
+
+    # Embed class names and preprocessing so the .onnx file is self-describing
+    onnx_model = onnx.load(output_path)
+    metadata = {
+        'class_names': json.dumps(class_names),
+        'img_size': str(ml_service.IMG_SIZE),
+        'normalize_mean': json.dumps(ml_service.NORMALIZE_MEAN),
+        'normalize_std': json.dumps(ml_service.NORMALIZE_STD),
+    }
+    for key, value in metadata.items():
+        entry = onnx_model.metadata_props.add()
+        entry.key = key
+        entry.value = value
+    onnx.checker.check_model(onnx_model)
+    onnx.save(onnx_model, output_path)
+
+    # Sanity check: ONNX Runtime output should match eager PyTorch
+    check = torch.randn(4, 3, ml_service.IMG_SIZE, ml_service.IMG_SIZE)
+    with torch.no_grad():
+        expected = model(check).numpy()
+    session = ort.InferenceSession(output_path, providers=['CPUExecutionProvider'])
+    actual = session.run(None, {'input': check.numpy()})[0]
+    max_diff = float(np.abs(expected - actual).max())
+    same_top1 = bool((expected.argmax(axis=1) == actual.argmax(axis=1)).all())
+    print(f"[EXPORT] Max logit difference vs PyTorch: {max_diff:.6f}, top-1 match: {same_top1}")
+    print(f"[EXPORT] Done. Start the server with ML_BACKEND=onnx to use it.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the TOOL-E classifier to ONNX")
+    parser.add_argument('--weights', default=ml_service.MODEL_PATH)
+    parser.add_argument('--class-names', default=ml_service.CLASS_NAMES_PATH)
+    parser.add_argument('--output', default=ml_service.ONNX_MODEL_PATH)
+    parser.add_argument('--opset', type=int, default=17)
+    args = parser.parse_args()
+
+    export(args.weights, args.class_names, args.output, args.opset)
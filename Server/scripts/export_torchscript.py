@@ -0,0 +1,46 @@
+"""
+Serializes the fine-tuned classifier as a self-contained, frozen TorchScript
+artifact (architecture + weights + class names in one file). The server loads it
+with ML_BACKEND=torchscript without building the torchvision model at all.
+
+Run from the Server/ directory:
+    python -m scripts.export_torchscript
+"""
+import os
+import json
+import argparse
+
+# Exporting always needs the PyTorch model, whatever backend the server is set to
+os.environ['ML_BACKEND'] = 'torch'
+
+import torch
+from app.services import ml_service
+
+
+def export(weights_path, output_path):
+    model = ml_service.build_model(weights_path, map_location='cpu')
+    example = torch.randn(1, 3, ml_service.IMG_SIZE, ml_service.IMG_SIZE)
+
+    with torch.no_grad():
+        scripted = torch.jit.freeze(torch.jit.trace(model, example))
+        max_diff = float((scripted(example) - model(example)).abs().max())
+
+    metadata = {
+        "class_names": ml_service.CLASS_NAMES,
+        "img_size": ml_service.IMG_SIZE,
+        "normalize_mean": ml_service.NORMALIZE_MEAN,
+        "normalize_std": ml_service.NORMALIZE_STD,
+        "source_weights": os.path.basename(weights_path),
+    }
+    torch.jit.save(scripted, output_path, _extra_files={'metadata.json': json.dumps(metadata)})
+    print(f"[EXPORT] Saved {output_path} (max logit difference vs eager: {max_diff:.6f})")
+    print(f"[EXPORT] Start the server with ML_BACKEND=torchscript to use it.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the TOOL-E classifier to TorchScript")
+    parser.add_argument('--weights', default=ml_service.MODEL_PATH)
+    parser.add_argument('--output', default=ml_service.TORCHSCRIPT_MODEL_PATH)
+    args = parser.parse_args()
+
+    export(args.weights, args.output)
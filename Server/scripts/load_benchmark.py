@@ -0,0 +1,343 @@
+"""
+End-to-end load benchmark for /identify_tool and the kiosk API.
+
+Drives the FastAPI app with a fixed number of concurrent clients (each one sends
+its next request as soon as the previous one returns) and reports throughput
+and p50/p95/p99 latency per endpoint and concurrency level. Uploads cycle
+through the sample images in ML/test*.jpg; by default every upload gets a few
+random trailing bytes (ignored by JPEG decoders) so the prediction cache doesn't
+turn the run into a cache benchmark.
+
+Targets:
+    in-process (default)  the app runs inside this process through httpx's ASGI transport
+    --spawn-server        starts a local uvicorn with the same settings and benchmarks it over HTTP
+    --url URL             benchmarks an already running server
+
+Databases:
+    --db sqlite (default) a throwaway SQLite file with the tool list, seeded users and
+                          transactions (via USER_DB_URL / TOOLS_DB_URL, see app/database.py)
+    --db env              whatever .env.local points at, e.g. a local MySQL copy
+
+Results are written as JSON (with the git commit) so runs can be compared across commits.
+
+Run from the Server/ directory:
+    python -m scripts.load_benchmark
+    python -m scripts.load_benchmark --concurrency 1,4,16 --duration 30 --endpoints identify_tool,tools
+    python -m scripts.load_benchmark --spawn-server --workers 2
+"""
+import os
+import sys
+import json
+import glob
+import time
+import random
+import asyncio
+import sqlite3
+import tempfile
+import argparse
+import subprocess
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import httpx
+
+from scripts._bench_common import git_commit, int_list
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ML_DIR = os.path.join(os.path.dirname(SERVER_DIR), 'ML')
+TOOLS_SEED_PATH = os.path.join(SERVER_DIR, 'sql', 'insert_tools_data.sql')
+
+BENCH_UCID = 30000001
+BENCH_USERS = 50
+
+
+# --- SQLite stand-in ---
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS MakerspaceCapstone (
+    FirstName TEXT, LastName TEXT, email TEXT, UCID INTEGER, UNICARDBarcode TEXT, recordDate DATE
+);
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT, user_name TEXT NOT NULL, email TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS tools (
+    tool_id INTEGER PRIMARY KEY AUTOINCREMENT, tool_name TEXT NOT NULL, tool_size TEXT,
+    tool_type TEXT NOT NULL, current_status TEXT DEFAULT 'Available', total_quantity INTEGER NOT NULL,
+    available_quantity INTEGER NOT NULL, consumed_quantity INTEGER DEFAULT 0, trained BOOLEAN DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, tool_id INTEGER,
+    checkout_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP, desired_return_date TIMESTAMP,
+    return_timestamp TIMESTAMP, quantity INTEGER DEFAULT 1, purpose TEXT, image_path TEXT,
+    classification_correct BOOLEAN, weight INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_checkout_timestamp_id ON transactions (checkout_timestamp, transaction_id);
+"""
+
+
+def create_sqlite_db(path, transactions=2000, seed=42):
+    """Creates one SQLite file that stands in for both the Museum and tool_e_db databases"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(SQLITE_SCHEMA)
+    with open(TOOLS_SEED_PATH, 'r') as f:
+        # Backtick identifiers are accepted by SQLite as well
+        conn.execute(f.read().strip().rstrip(';'))
+
+    today = date.today()
+    conn.executemany(
+        "INSERT INTO MakerspaceCapstone VALUES (?, ?, ?, ?, ?, ?)",
+        [(f"Bench{i}", "User", f"bench{i}@example.com", BENCH_UCID + i, f"{BENCH_UCID + i};", today)
+         for i in range(BENCH_USERS)],
+    )
+    conn.executemany(
+        "INSERT INTO users (user_id, user_name, email) VALUES (?, ?, ?)",
+        [(BENCH_UCID + i, f"Bench{i} User", f"bench{i}@example.com") for i in range(BENCH_USERS)],
+    )
+    now = datetime.now().replace(microsecond=0)
+    rows = []
+    for i in range(transactions):
+        checkout = now - timedelta(minutes=rng.randint(0, 60 * 24 * 120))
+        returned = checkout + timedelta(hours=rng.randint(1, 72)) if rng.random() < 0.8 else None
+        rows.append((BENCH_UCID + rng.randrange(BENCH_USERS), rng.randint(1, 15), checkout,
+                     checkout + timedelta(days=7), returned, 1, "benchmark", None, 1, 0))
+    conn.executemany(
+        """INSERT INTO transactions (user_id, tool_id, checkout_timestamp, desired_return_date, return_timestamp,
+           quantity, purpose, image_path, classification_correct, weight) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+
+
+# --- Requests ---
+def load_images():
+    paths = sorted(glob.glob(os.path.join(ML_DIR, 'test*.jpg')))
+    if not paths:
+        raise SystemExit(f"[BENCH] No sample images found in {ML_DIR}")
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append(f.read())
+    return images
+
+
+class RequestFactory:
+    """Builds the i-th request for an endpoint; returns kwargs for httpx.AsyncClient.request"""
+
+    def __init__(self, images, unique_uploads, batch_images):
+        self.images = images
+        self.unique_uploads = unique_uploads
+        self.batch_images = batch_images
+
+    def _image(self, i):
+        contents = self.images[i % len(self.images)]
+        if self.unique_uploads:
+            contents += os.urandom(8)
+        return contents
+
+    def build(self, endpoint, i):
+        if endpoint == 'identify_tool':
+            return {"method": "POST", "url": "/identify_tool",
+                    "files": {"file": ("capture.jpg", self._image(i), "image/jpeg")}}
+        if endpoint == 'identify_tool_batch':
+            files = [("files", (f"capture{j}.jpg", self._image(i + j), "image/jpeg"))
+                     for j in range(self.batch_images)]
+            return {"method": "POST", "url": "/identify_tool/batch", "files": files}
+        if endpoint == 'tools':
+            return {"method": "GET", "url": "/tools"}
+        if endpoint == 'validate_user':
+            return {"method": "POST", "url": "/validate_user", "json": {"UCID": BENCH_UCID + i % BENCH_USERS}}
+        if endpoint == 'transactions':
+            return {"method": "GET", "url": "/transactions",
+                    "params": {"user_id": BENCH_UCID + i % BENCH_USERS, "page": 1, "limit": 20}}
+        if endpoint == 'transactions_batch':
+            return {"method": "POST", "url": "/transactions/batch", "json": {"transactions": [{
+                "user_id": BENCH_UCID + i % BENCH_USERS,
+                "tool_id": i % 15 + 1,
+                "desired_return_date": (date.today() + timedelta(days=7)).isoformat(),
+                "purpose": "benchmark",
+            }]}}
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+ENDPOINTS = ['identify_tool', 'identify_tool_batch', 'tools', 'validate_user', 'transactions', 'transactions_batch']
+DEFAULT_ENDPOINTS = 'identify_tool,identify_tool_batch,tools,validate_user'
+
+
+# --- Load generation ---
+async def run_level(client, factory, endpoint, concurrency, duration, max_requests, warmup):
+    """Closed-loop load: `concurrency` clients, each sending its next request when the previous returns"""
+    for i in range(warmup):
+        await client.request(**factory.build(endpoint, i))
+
+    latencies = []
+    errors = {}
+    counter = iter(range(10 ** 12))
+    deadline = time.perf_counter() + duration
+
+    async def client_loop():
+        while time.perf_counter() < deadline:
+            i = next(counter)
+            if max_requests and i >= max_requests:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.request(**factory.build(endpoint, i))
+                ok = response.status_code < 400
+                key = str(response.status_code)
+            except httpx.HTTPError as e:
+                ok = False
+                key = type(e).__name__
+            if ok:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors[key] = errors.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, errors, elapsed, concurrency)
+
+
+def summarize(latencies, errors, elapsed, concurrency):
+    timings = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": float(timings.mean()),
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p95_ms": float(np.percentile(timings, 95)),
+        "p99_ms": float(np.percentile(timings, 99)),
+        "max_ms": float(timings.max()),
+    }
+
+
+async def run_benchmark(client, args):
+    factory = RequestFactory(load_images(), args.unique_uploads, args.batch_images)
+    results = {}
+    for endpoint in args.endpoints:
+        results[endpoint] = []
+        for concurrency in args.concurrency:
+            level = await run_level(client, factory, endpoint, concurrency, args.duration,
+                                    args.max_requests, args.warmup)
+            results[endpoint].append(level)
+            print(f"[BENCH] {endpoint:<20} c={concurrency:<3} {level['throughput_rps']:8.1f} req/s | "
+                  f"p50 {level['p50_ms']:7.1f} ms | p95 {level['p95_ms']:7.1f} ms | "
+                  f"p99 {level['p99_ms']:7.1f} ms | errors {sum(level['errors'].values())}")
+    return results
+
+
+async def run_in_process(args):
+    # Imported late so USER_DB_URL / TOOLS_DB_URL are set before app.database creates its engines
+    from app.main import app
+
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            return await run_benchmark(client, args)
+    finally:
+        await app.router.shutdown()
+
+
+async def run_over_http(url, args):
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        return await run_benchmark(client, args)
+
+
+def spawn_server(port, workers):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=SERVER_DIR,
+        env=os.environ.copy(),
+    )
+    url = f"http://127.0.0.1:{port}"
+    # The model loads during startup, so wait for the root endpoint to answer
+    for _ in range(600):
+        if process.poll() is not None:
+            raise SystemExit(f"[BENCH] uvicorn exited with code {process.returncode}")
+        try:
+            if httpx.get(url + '/', timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit("[BENCH] uvicorn did not come up within 5 minutes")
+
+
+def main(args):
+    unknown = [e for e in args.endpoints if e not in ENDPOINTS]
+    if unknown:
+        raise SystemExit(f"[BENCH] Unknown endpoints {unknown}; choose from {ENDPOINTS}")
+
+    tmp_dir = None
+    if args.db == 'sqlite' and not args.url:
+        tmp_dir = tempfile.mkdtemp(prefix='toole_bench_')
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        create_sqlite_db(db_path, transactions=args.seed_transactions)
+        os.environ['USER_DB_URL'] = os.environ['TOOLS_DB_URL'] = f"sqlite:///{db_path}"
+        print(f"[BENCH] Using SQLite stand-in at {db_path}")
+    elif args.db == 'sqlite':
+        print("[BENCH] --url given: the server uses its own databases")
+
+    server = None
+    started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    try:
+        if args.url:
+            target = args.url
+            results = asyncio.run(run_over_http(args.url, args))
+        elif args.spawn_server:
+            server, target = spawn_server(args.port, args.workers)
+            results = asyncio.run(run_over_http(target, args))
+        else:
+            target = "in-process"
+            results = asyncio.run(run_in_process(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = {
+        "commit": git_commit(),
+        "started_at": started_at,
+        "target": target,
+        "db": "external" if args.url else args.db,
+        "ml_backend": os.getenv('ML_BACKEND', 'torch'),
+        "duration_per_level_s": args.duration,
+        "unique_uploads": args.unique_uploads,
+        "results": results,
+    }
+    output = args.output or os.path.join(SERVER_DIR, 'benchmark_results',
+                                         f"load_{report['commit'] or 'nogit'}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"[BENCH] Results written to {output}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load benchmark for the TOOL-E server")
+    parser.add_argument('--endpoints', default=DEFAULT_ENDPOINTS, type=lambda v: [e.strip() for e in v.split(',')],
+                        help=f"Comma-separated, from {ENDPOINTS}. transactions_batch writes rows.")
+    parser.add_argument('--concurrency', default=[1, 4, 8], type=int_list, help="Comma-separated client counts")
+    parser.add_argument('--duration', type=float, default=15.0, help="Seconds per endpoint and concurrency level")
+    parser.add_argument('--max-requests', type=int, default=0, help="Stop a level early after this many requests")
+    parser.add_argument('--warmup', type=int, default=3, help="Untimed requests before each level")
+    parser.add_argument('--batch-images', type=int, default=4, help="Images per /identify_tool/batch request")
+    parser.add_argument('--allow-cache-hits', dest='unique_uploads', action='store_false',
+                        help="Upload the sample images unchanged, so repeats hit the prediction cache")
+    parser.add_argument('--db', choices=['sqlite', 'env'], default='sqlite')
+    parser.add_argument('--seed-transactions', type=int, default=2000)
+    parser.add_argument('--url', default=None, help="Benchmark an already running server")
+    parser.add_argument('--spawn-server', action='store_true', help="Start a local uvicorn instead of running in-process")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1, help="uvicorn workers for --spawn-server")
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--output', default=None)
+    main(parser.parse_args())
@@ -0,0 +1,167 @@
+"""
+Builds an INT8 version of the classifier for CPU serving (ML_BACKEND=int8).
+
+- Convolutions: static post-training quantization (FX graph mode), calibrated on
+  the confirmed captures in captured_images/Yes/<ToolName>/.
+- Linear head: dynamic quantization.
+
+The result is saved as a TorchScript artifact together with a report comparing
+top-1 accuracy and latency against the FP32 model. Only switch the server to
+int8 if the reported top-1 drop is acceptable.
+
+Run from the Server/ directory:
+    python -m scripts.quantize_model
+    python -m scripts.quantize_model --calibration-images 300 --max-drop 0.005
+"""
+import os
+import copy
+import json
+import random
+import argparse
+
+# Quantization always starts from the FP32 PyTorch model
+os.environ['ML_BACKEND'] = 'torch'
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.ao.quantization import QConfigMapping, get_default_qconfig, quantize_dynamic
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+from PIL import Image
+from app.services import ml_service, image_service
+from scripts._bench_common import measure_latency
+
+
+def load_tensor(path):
+    return ml_service.inference_transform(Image.open(path).convert('RGB'))
+
+
+def iter_batches(samples, batch_size):
+    for i in range(0, len(samples), batch_size):
+        chunk = samples[i:i + batch_size]
+        yield torch.stack([load_tensor(path) for path, _ in chunk]), [label for _, label in chunk]
+
+
+def quantize(model, calibration_samples, engine, batch_size):
+    torch.backends.quantized.engine = engine
+
+    # Static INT8 everywhere except Linear, which is quantized dynamically below
+    qconfig_mapping = QConfigMapping().set_global(get_default_qconfig(engine)).set_object_type(nn.Linear, None)
+    example = torch.randn(1, 3, ml_service.IMG_SIZE, ml_service.IMG_SIZE)
+    prepared = prepare_fx(copy.deepcopy(model), qconfig_mapping, example_inputs=(example,))
+
+    print(f"[QUANT] Calibrating on {len(calibration_samples)} images...")
+    with torch.no_grad():
+        for images, _ in iter_batches(calibration_samples, batch_size):
+            prepared(images)
+
+    quantized = convert_fx(prepared)
+    quantized = quantize_dynamic(quantized, {nn.Linear}, dtype=torch.qint8)
+    quantized.eval()
+    return quantized
+
+
+def evaluate(model, samples, batch_size):
+    """Returns (top1_accuracy, predictions)"""
+    predictions = []
+    correct = 0
+    with torch.no_grad():
+        for images, labels in iter_batches(samples, batch_size):
+            predicted = model(images).argmax(dim=1).tolist()
+            predictions.extend(predicted)
+            correct += sum(p == l for p, l in zip(predicted, labels))
+    accuracy = correct / len(samples) if samples else None
+    return accuracy, predictions
+
+
+def model_latency(model, iterations):
+    """Single-image latency in ms on a random input"""
+    example = torch.randn(1, 3, ml_service.IMG_SIZE, ml_service.IMG_SIZE)
+    with torch.no_grad():
+        return measure_latency(model, example, iterations)
+
+
+def main(args):
+    samples = image_service.list_labeled_images(ml_service.CLASS_NAMES, decision='Yes')
+    if not samples:
+        raise SystemExit(f"[QUANT] No labeled images found under {image_service.CAPTURED_IMAGES_DIR}/Yes")
+
+    # Calibration and evaluation use disjoint images: the evaluation share is set
+    # aside first, calibration takes up to --calibration-images of the rest
+    random.Random(args.seed).shuffle(samples)
+    n_eval = max(1, int(len(samples) * args.eval_fraction))
+    eval_samples = samples[:n_eval]
+    calibration_samples = samples[n_eval:n_eval + args.calibration_images]
+    if not calibration_samples:
+        raise SystemExit(f"[QUANT] {len(samples)} labeled images are too few to calibrate and evaluate "
+                         f"on separate images (--eval-fraction {args.eval_fraction})")
+    print(f"[QUANT] {len(calibration_samples)} calibration / {len(eval_samples)} evaluation images")
+
+    fp32_model = ml_service.build_model(map_location='cpu')
+    int8_model = quantize(fp32_model, calibration_samples, args.engine, args.batch_size)
+
+    # Save as TorchScript so the server can load it without the FX quantization code
+    example = torch.randn(1, 3, ml_service.IMG_SIZE, ml_service.IMG_SIZE)
+    with torch.no_grad():
+        scripted = torch.jit.freeze(torch.jit.trace(int8_model, example))
+    metadata = {
+        "quantized_engine": args.engine,
+        "class_names": ml_service.CLASS_NAMES,
+        "img_size": ml_service.IMG_SIZE,
+        "source_weights": os.path.basename(ml_service.MODEL_PATH),
+        "calibration_images": len(calibration_samples),
+    }
+    torch.jit.save(scripted, args.output, _extra_files={'metadata.json': json.dumps(metadata)})
+    print(f"[QUANT] Saved INT8 model to {args.output}")
+
+    # Accuracy + latency report
+    torch.set_num_threads(args.threads)
+    fp32_acc, fp32_preds = evaluate(fp32_model, eval_samples, args.batch_size)
+    int8_acc, int8_preds = evaluate(scripted, eval_samples, args.batch_size)
+    agreement = float(np.mean([a == b for a, b in zip(fp32_preds, int8_preds)]))
+    top1_drop = fp32_acc - int8_acc
+
+    report = {
+        "eval_images": len(eval_samples),
+        "threads": args.threads,
+        "fp32": {
+            "top1": fp32_acc,
+            "latency": model_latency(fp32_model, args.latency_iters),
+            "size_mb": os.path.getsize(ml_service.MODEL_PATH) / 1e6,
+        },
+        "int8": {
+            "top1": int8_acc,
+            "latency": model_latency(scripted, args.latency_iters),
+            "size_mb": os.path.getsize(args.output) / 1e6,
+        },
+        "top1_agreement": agreement,
+        "top1_drop": top1_drop,
+        "max_allowed_drop": args.max_drop,
+        "acceptable": top1_drop <= args.max_drop,
+    }
+    report["speedup"] = report["fp32"]["latency"]["mean_ms"] / report["int8"]["latency"]["mean_ms"]
+
+    report_path = os.path.splitext(args.output)[0] + '.report.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"[QUANT] FP32 top-1: {fp32_acc:.4f} | {report['fp32']['latency']['mean_ms']:.1f} ms")
+    print(f"[QUANT] INT8 top-1: {int8_acc:.4f} | {report['int8']['latency']['mean_ms']:.1f} ms")
+    print(f"[QUANT] Drop: {top1_drop:.4f} | Agreement: {agreement:.4f} | Speedup: {report['speedup']:.2f}x")
+    verdict = "OK to serve with ML_BACKEND=int8" if report["acceptable"] else "Drop too large - keep serving FP32"
+    print(f"[QUANT] {verdict}. Report written to {report_path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Quantize the TOOL-E classifier to INT8")
+    parser.add_argument('--output', default=ml_service.INT8_MODEL_PATH)
+    parser.add_argument('--engine', default='x86', help="Quantized engine: x86, fbgemm or qnnpack (ARM)")
+    parser.add_argument('--calibration-images', type=int, default=200, help="Most images used for calibration")
+    parser.add_argument('--eval-fraction', type=float, default=0.3,
+                        help="Share of the labeled images held out for the accuracy report")
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--latency-iters', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=torch.get_num_threads())
+    parser.add_argument('--max-drop', type=float, default=0.01, help="Largest acceptable top-1 accuracy drop")
+    parser.add_argument('--seed', type=int, default=42)
+    main(parser.parse_args())
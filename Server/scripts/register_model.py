@@ -0,0 +1,54 @@
+"""
+Adds a model artifact to the versioned model registry so it can be hot-swapped
+in with POST /ml/models/{version}/activate (or served at startup with
+ML_MODEL_VERSION=<version>).
+
+Run from the Server/ directory:
+    python -m scripts.register_model --artifact efficientnet_finetuned_v3.pth --version v3
+    python -m scripts.register_model --artifact efficientnet_int8.pt --format int8 --notes "calibrated on March captures"
+"""
+import os
+import json
+import time
+import argparse
+
+from app.services import ml_service
+
+
+def infer_format(artifact_path):
+    extension = os.path.splitext(artifact_path)[1].lower()
+    if extension == '.onnx':
+        return 'onnx'
+    if extension == '.pt':
+        return 'torchscript'
+    return 'pth'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Register a model version for hot reload")
+    parser.add_argument('--artifact', required=True, help="Path to a .pth state_dict, TorchScript .pt or .onnx file")
+    parser.add_argument('--version', default=time.strftime('%Y%m%d_%H%M%S'))
+    parser.add_argument('--format', choices=['pth', 'torchscript', 'int8', 'onnx'], default=None,
+                        help="Defaults to a guess from the file extension")
+    parser.add_argument('--arch', default='efficientnet_v2_s', help="torchvision architecture of a .pth state_dict")
+    parser.add_argument('--class-names', default=ml_service.CLASS_NAMES_PATH)
+    parser.add_argument('--img-size', type=int, default=ml_service.IMG_SIZE)
+    parser.add_argument('--notes', default=None)
+    args = parser.parse_args()
+
+    with open(args.class_names, 'r') as f:
+        class_names = json.load(f)
+
+    metadata = ml_service.model_registry.register(
+        args.version,
+        args.artifact,
+        args.format or infer_format(args.artifact),
+        class_names,
+        args.img_size,
+        ml_service.NORMALIZE_MEAN,
+        ml_service.NORMALIZE_STD,
+        notes=args.notes,
+        arch=args.arch,
+    )
+    print(f"[REGISTRY] Registered version {args.version} ({metadata['format']}) at {metadata['artifact_path']}")
+    print(f"[REGISTRY] Activate with: POST /ml/models/{args.version}/activate")
@@ -0,0 +1,3 @@
+-- Composite index for GET /transactions keyset (cursor) pagination.
+-- Only needed for tables created before the index was added to create_transactions_table.sql.
+ALTER TABLE `transactions` ADD INDEX `idx_checkout_timestamp_id` (`checkout_timestamp`, `transaction_id`);
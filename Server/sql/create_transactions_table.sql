@@ -10,5 +10,6 @@ CREATE TABLE IF NOT EXISTS `transactions` (
     `image_path` VARCHAR(255) DEFAULT NULL,
     `classification_correct` BOOLEAN DEFAULT NULL,
     `weight` INT DEFAULT 0,
-    PRIMARY KEY (`transaction_id`)
+    PRIMARY KEY (`transaction_id`),
+    KEY `idx_checkout_timestamp_id` (`checkout_timestamp`, `transaction_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+
+# The app reads its database URLs and ML_BACKEND at import time: point it at a
+# throwaway SQLite database (the load benchmark's stand-in) and skip torch
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='toole_tests_'), 'tool_e.db')
+os.environ['USER_DB_URL'] = os.environ['TOOLS_DB_URL'] = f"sqlite:///{DB_PATH}"
+os.environ['ML_BACKEND'] = 'onnx'
+
+import pytest
+from sqlalchemy import text
+from fastapi.testclient import TestClient
+from scripts.load_benchmark import create_sqlite_db
+
+create_sqlite_db(DB_PATH, transactions=0)
+
+from app.main import app
+from app.database import engine_tools
+from app.routers import transactions
+
+
+@pytest.fixture
+def client():
+    """Startup events (model loading) are not run; every test starts with no transactions"""
+    with engine_tools.begin() as conn:
+        conn.execute(text("DELETE FROM transactions"))
+    transactions.count_cache.clear()
+    return TestClient(app)
+
+
+@pytest.fixture
+def insert_transaction():
+    """insert_transaction(checkout_timestamp) -> transaction_id"""
+    def insert(checkout_timestamp, user_id=1, tool_id=1):
+        with engine_tools.begin() as conn:
+            return conn.execute(
+                text("INSERT INTO transactions (user_id, tool_id, checkout_timestamp, purpose) "
+                     "VALUES (:user_id, :tool_id, :ts, 'test')"),
+                {"user_id": user_id, "tool_id": tool_id, "ts": checkout_timestamp},
+            ).lastrowid
+    return insert
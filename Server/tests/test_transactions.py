@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def walk_pages(client, **params):
+    """Follows next_cursor from the first page; returns (transaction_ids, first page's total)"""
+    response = client.get("/transactions", params=params).json()
+    total = response["total"]
+    ids = [item["transaction_id"] for item in response["items"]]
+    while response["next_cursor"]:
+        response = client.get("/transactions", params={**params, "cursor": response["next_cursor"]}).json()
+        ids += [item["transaction_id"] for item in response["items"]]
+    return ids, total
+
+
+@pytest.mark.parametrize("sort_order", ["desc", "asc"])
+def test_cursor_pages_past_null_timestamps(client, insert_transaction, sort_order):
+    base = datetime(2026, 1, 1, 12, 0, 0)
+    timestamps = [base, None, base + timedelta(hours=1), base, None, base - timedelta(days=1)]
+    inserted = [insert_transaction(ts) for ts in timestamps]
+
+    offset_ids = [item["transaction_id"] for item in
+                  client.get("/transactions", params={"sort_order": sort_order, "limit": 0}).json()["items"]]
+    cursor_ids, total = walk_pages(client, sort_order=sort_order, limit=2)
+
+    assert sorted(cursor_ids) == sorted(inserted)
+    assert cursor_ids == offset_ids
+    assert total == len(inserted)
+    # NULL timestamps sort lowest
+    nulls = [inserted[1], inserted[4]]
+    expected_nulls = sorted(nulls, reverse=True) if sort_order == "desc" else sorted(nulls)
+    assert (cursor_ids[-2:] if sort_order == "desc" else cursor_ids[:2]) == expected_nulls
+
+
+def test_cursor_starting_on_a_null_row(client, insert_transaction):
+    for ts in [None, None, None, datetime(2026, 1, 1)]:
+        insert_transaction(ts)
+    ids, _ = walk_pages(client, limit=1)
+    assert len(ids) == 4 and len(set(ids)) == 4
+
+
+def test_total_reflects_a_write_immediately(client, insert_transaction):
+    insert_transaction(datetime(2026, 1, 1))
+    assert client.get("/transactions", params={"user_id": 1}).json()["total"] == 1
+
+    response = client.post("/transactions", json={"user_id": 1, "tool_id": 1, "purpose": "test"})
+    assert response.status_code == 200
+    assert client.get("/transactions", params={"user_id": 1}).json()["total"] == 2
+
+    # A write this process never sees (another worker, api_server.py) is still counted
+    insert_transaction(datetime(2026, 1, 2))
+    total = client.get("/transactions", params={"user_id": 1}).json()
+    assert total["total"] == 3 and not total["total_approximate"]
+
+
+def test_approximate_total_may_be_cached(client, insert_transaction):
+    insert_transaction(datetime(2026, 1, 1))
+    params = {"user_id": 1, "approximate_total": "true"}
+    first = client.get("/transactions", params=params).json()
+    assert first["total"] == 1 and not first["total_approximate"]
+
+    insert_transaction(datetime(2026, 1, 2))
+    cached = client.get("/transactions", params=params).json()
+    assert cached["total"] == 1 and cached["total_approximate"]
+
+    # Writes through the router clear the cache
+    client.post("/transactions", json={"user_id": 1, "tool_id": 1, "purpose": "test"})
+    assert client.get("/transactions", params=params).json()["total"] == 3
@@ -10,6 +10,15 @@ from kivy.clock import Clock, mainthread
 from kivy.graphics.texture import Texture
 from View.baseScreen import BaseScreen
 from PIL import Image, ImageOps
+from services.tray_roi import TrayROI
+from config import (
+    PAD_CAPTURES,
+    TRAY_ROI_ENABLED,
+    TRAY_REFERENCE_PATH,
+    TRAY_REFERENCE_DELAY,
+    TRAY_ROI_DIFF_THRESHOLD,
+    TRAY_ROI_MARGIN
+)
 
 # Detect if we are on the Pi
 IS_RASPBERRY_PI = platform.machine() in ("aarch64", "armv7l")
@@ -19,6 +28,9 @@ class CaptureScreen(BaseScreen):
     capture = None  # For OpenCV (laptop)
     picam2 = None   # For Picamera2 (Pi)
     update_event = None
+    last_capture = None  # Processed 384x384 PIL image of the latest capture (raw uploads)
+    tray_roi = None      # Background-subtraction cropper (TRAY_ROI_ENABLED)
+    tray_reference_event = None
     
     def on_enter(self):
         """
@@ -73,9 +85,44 @@ class CaptureScreen(BaseScreen):
             self.set_processing_mode(False)
             self.update_event = Clock.schedule_interval(self.update_feed, 1.0/30.0)
             
+            # The tray is empty until the user puts the tool down - use it as the ROI reference
+            if TRAY_ROI_ENABLED:
+                if self.tray_roi is None:
+                    self.tray_roi = TrayROI(
+                        TRAY_REFERENCE_PATH,
+                        diff_threshold=TRAY_ROI_DIFF_THRESHOLD,
+                        margin=TRAY_ROI_MARGIN,
+                    )
+                # On the Kivy clock like update_feed, so the camera is never read from two threads
+                self.tray_reference_event = Clock.schedule_once(
+                    lambda dt: self.capture_tray_reference(),
+                    TRAY_REFERENCE_DELAY,
+                )
+            
         else:
             self.ids.loading_label.text = "Camera Error!"
     
+    def capture_tray_reference(self):
+        """
+        Main Thread: photographs the empty tray the same way as a capture
+        (full resolution, through the saved file) and sets it as the ROI reference.
+        """
+        self.tray_reference_event = None
+        try:
+            if IS_RASPBERRY_PI and self.picam2:
+                self.picam2.capture_file(TRAY_REFERENCE_PATH)
+            elif self.capture:
+                ret, frame = self.capture.read()
+                if not ret:
+                    return
+                cv2.imwrite(TRAY_REFERENCE_PATH, frame)
+            else:
+                return
+            reference = np.asarray(Image.open(TRAY_REFERENCE_PATH).convert("RGB"))
+            self.tray_roi.set_reference(reference, save=False)
+        except Exception as e:
+            print(f"[UI] Tray reference Error: {e}")
+    
     def on_leave(self):
         """
         Called when leaving this screen.
@@ -91,6 +138,9 @@ class CaptureScreen(BaseScreen):
         if self.update_event:
             self.update_event.cancel()
             self.update_event = None
+        if self.tray_reference_event:
+            self.tray_reference_event.cancel()
+            self.tray_reference_event = None
             
         # 3. Stop Pi Camera
         if self.picam2:
@@ -240,22 +290,38 @@ class CaptureScreen(BaseScreen):
             
     def process_image_pil(self, filepath):
         """
-        Custom resizing logic using PIl
+        Custom resizing logic using PIl.
+        With PAD_CAPTURES, keeps the result in self.last_capture so it can be
+        uploaded as raw pixels.
         """
+        self.last_capture = None
         try:
             target_size = 384
-            img = Image.open(filepath)
+            img = Image.open(filepath).convert("RGB")
+            
+            # Crop to the tool (background subtraction against the empty tray)
+            if self.tray_roi is not None and self.tray_roi.has_reference:
+                box = self.tray_roi.find(np.asarray(img))
+                if box:
+                    img = img.crop(box)
+                    img.save(filepath, quality=95)
+                    print(f"[UI] Cropped capture to tool region {box}")
+            
+            if not PAD_CAPTURES:
+                return
             
             # Pad and Resize
             new_img = ImageOps.pad(
                 img,
                 (target_size, target_size),
-                method=image.LANCZOS,
+                method=Image.LANCZOS,
                 color="white",
                 centering=(0.5, 0.5),
             )
             
+            # Still saved for the confirm screen preview
             new_img.save(filepath, quality=95)
+            self.last_capture = new_img
             print(f"[UI] Image resized/padded to {target_size}x{target_size}")
             
         except Exception as e:
@@ -269,7 +335,7 @@ class CaptureScreen(BaseScreen):
         # Call the API Client
         # Assumes app.api_client.upload_tool_image returns {'success': ..., 'data': ...}
         try:
-            result = app.api_client.upload_tool_image(filepath)
+            result = app.api_client.upload_tool_image(filepath, image=self.last_capture)
         except Exception as e:
             result = {'success': False, 'error': str(e)}
         
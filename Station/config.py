@@ -20,6 +20,30 @@ API_GET_TOOLS     = f"{BASE_URL}/tools"
 # Timeouts (in seconds)
 NETWORK_TIMEOUT = 5.0
 
+# Capture upload format for /identify_tool:
+#   "jpeg" - the saved capture file (default)
+#   "raw"  - the padded 384x384 RGB pixels (services/raw_image.py), no JPEG encode/decode.
+#            Needs PAD_CAPTURES; unpadded captures are still sent as JPEG
+UPLOAD_FORMAT = os.getenv("UPLOAD_FORMAT", "jpeg").lower()
+# Compression for raw uploads: "none", "zstd" or "lz4"
+UPLOAD_COMPRESSION = os.getenv("UPLOAD_COMPRESSION", "none").lower()
+
+# --- CAPTURE PADDING ---
+# Letterbox captures to 384x384 on white before uploading. Kiosks have always sent
+# unpadded captures, so this changes the classifier's input - compare accuracy with
+# `python -m scripts.evaluate_padding` on the server before enabling it.
+PAD_CAPTURES = os.getenv("PAD_CAPTURES", "0") == "1"
+
+# --- TRAY ROI CROPPING ---
+# Crop captures to the tool before padding/uploading (services/tray_roi.py).
+# A reference photo of the empty tray is taken each time the capture screen opens.
+# Note: the classifier was trained on uncropped captures - check accuracy before enabling.
+TRAY_ROI_ENABLED = os.getenv("TRAY_ROI_ENABLED", "0") == "1"
+TRAY_REFERENCE_PATH = os.getenv("TRAY_REFERENCE_PATH", os.path.join(os.path.dirname(__file__), 'tray_reference.jpg'))
+TRAY_REFERENCE_DELAY = 1.5  # Seconds after camera start (let auto-exposure settle)
+TRAY_ROI_DIFF_THRESHOLD = int(os.getenv("TRAY_ROI_DIFF_THRESHOLD", 30))
+TRAY_ROI_MARGIN = 0.15      # Padding around the detected tool, relative to its size
+
 
 # --- HARDWARE SETTINGS --- ##### NEED #####
 # GPIO Pins (BCM Numbering)
@@ -2,6 +2,7 @@ import requests
 import os
 import json
 from kivy.event import EventDispatcher
+from services.raw_image import encode_raw_image, RAW_CONTENT_TYPE
 
 # Import settings from the config file
 from config import (
@@ -9,7 +10,9 @@ from config import (
     API_IDENTIFY_TOOL,
     API_TRANSACTION,
     API_GET_TOOLS,
-    NETWORK_TIMEOUT
+    NETWORK_TIMEOUT,
+    UPLOAD_FORMAT,
+    UPLOAD_COMPRESSION
 )
 
 class APIClient(EventDispatcher):
@@ -93,34 +96,47 @@ class APIClient(EventDispatcher):
             print(f"[API] Error fetching tools: {e}")
             return []
 
-    def upload_tool_image(self, image_path):
+    def upload_tool_image(self, image_path, image=None):
         """
         Uploads the captured image for recognition.
         
         Args:
             image_path(str): Full path to the .jpg file on the Pi.
+            image(PIL.Image): The processed capture already in memory. With
+                UPLOAD_FORMAT="raw" its pixels are sent instead of the JPEG file.
         
         Returns:
             dict: {'sucess': True, 'tool': 'Hammer', 'conf': 0.98} OR Error dict
         """ 
         print(f"[API] Uploading image: {image_path}...")
         
-        if not os.path.exists(image_path):
+        if image is None and not os.path.exists(image_path):
             return{'success': False, 'error': "Image file not found on disk."}
         
         try:
-            # Open file in binary mode
-            with open(image_path, 'rb') as img_file:
-                # 'file' matches the parameter name in the FastAPI endpoint
-                # Value is a tuple: (filename, file_object, content_type)
-                files = {'file': ('capture.jpg', img_file, 'image/jpeg')}
-                
-                response = requests.post(
-                    API_IDENTIFY_TOOL,
-                    files=files,
-                    timeout=10.0 # Give images some more time than simple JSON
-                )
+            if UPLOAD_FORMAT == 'raw' and image is not None:
+                # Raw RGB pixels - the server skips JPEG decode and resize
+                payload = encode_raw_image(image, UPLOAD_COMPRESSION)
+                files = {'file': ('capture.rgb', payload, RAW_CONTENT_TYPE)}
+                response = requests.post(API_IDENTIFY_TOOL, files=files, timeout=10.0)
+            else:
+                # Open file in binary mode
+                with open(image_path, 'rb') as img_file:
+                    # 'file' matches the parameter name in the FastAPI endpoint
+                    # Value is a tuple: (filename, file_object, content_type)
+                    files = {'file': ('capture.jpg', img_file, 'image/jpeg')}
+                    
+                    response = requests.post(
+                        API_IDENTIFY_TOOL,
+                        files=files,
+                        timeout=10.0 # Give images some more time than simple JSON
+                    )
                 
+            if response.status_code in (429, 503):
+                # Server shed the request under load - it tells us when to come back
+                print(f"[API] Server busy, retry after {response.headers.get('Retry-After', '?')}s")
+                return {'success': False, 'error': "Server is busy. Please try again in a few seconds."}
+
             response.raise_for_status()
             data = response.json()
             
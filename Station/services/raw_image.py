@@ -0,0 +1,44 @@
+import struct
+import numpy as np
+
+# Raw RGB upload format for /identify_tool (mirrors Server/app/services/raw_image.py).
+# Captures are already padded/resized to 384x384 by CaptureScreen, so sending the
+# pixels directly skips the JPEG encode here and the decode + resize on the server.
+#
+#   header: magic b'TRGB' | version u8 | codec u8 | height u16 | width u16 | payload length u32
+#   payload: height * width * 3 uint8 RGB (HWC), optionally zstd/LZ4 compressed
+
+RAW_CONTENT_TYPE = 'application/x-toole-rgb8'
+RAW_MAGIC = b'TRGB'
+RAW_VERSION = 1
+HEADER = struct.Struct('<4sBBHHI')
+
+CODECS = {'none': 0, 'zstd': 1, 'lz4': 2}
+
+
+def encode_raw_image(image, compression='none'):
+    """
+    Args:
+        image: PIL image (converted to RGB) or HWC uint8 array
+        compression: 'none', 'zstd' (needs zstandard) or 'lz4' (needs lz4)
+
+    Returns:
+        bytes: header + payload
+    """
+    if hasattr(image, 'convert'):
+        image = image.convert('RGB') if image.mode != 'RGB' else image
+    pixels = np.ascontiguousarray(np.asarray(image, dtype=np.uint8))
+    height, width = pixels.shape[:2]
+    payload = pixels.tobytes()
+
+    if compression == 'zstd':
+        import zstandard
+        payload = zstandard.ZstdCompressor(level=3).compress(payload)
+    elif compression == 'lz4':
+        import lz4.frame
+        payload = lz4.frame.compress(payload)
+    elif compression != 'none':
+        raise ValueError(f"Unknown compression: {compression}")
+
+    header = HEADER.pack(RAW_MAGIC, RAW_VERSION, CODECS[compression], height, width, len(payload))
+    return header + payload
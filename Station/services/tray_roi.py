@@ -0,0 +1,110 @@
+import os
+import cv2
+import numpy as np
+
+class TrayROI:
+    """
+    Finds the tool on the tray by background subtraction against a reference
+    image of the empty tray, so the capture can be cropped before it is padded
+    to 384x384 and uploaded. The classifier then gets more pixels of the tool
+    instead of the tray, and the upload gets smaller.
+
+    All the work happens on a small grayscale copy of the frame (work_width px
+    wide), so a 1920x1080 capture costs a few milliseconds on the Pi.
+    """
+
+    def __init__(self, reference_path, work_width=480, diff_threshold=30,
+                 min_area=0.002, max_area=0.8, margin=0.15):
+        """
+        Args:
+            reference_path (str): Where the empty-tray image is stored.
+            work_width (int): Width the frames are downscaled to for the comparison.
+            diff_threshold (int): Per-pixel gray-level difference that counts as "changed".
+            min_area (float): Smallest changed region (fraction of the frame) treated as a tool.
+            max_area (float): Above this fraction the reference is probably stale
+                (lighting/camera moved) and the full frame is used instead.
+            margin (float): Padding added around the detected box, relative to its size.
+        """
+        self.reference_path = reference_path
+        self.work_width = work_width
+        self.diff_threshold = diff_threshold
+        self.min_area = min_area
+        self.max_area = max_area
+        self.margin = margin
+        self._reference = None
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+        if os.path.exists(reference_path):
+            saved = cv2.imread(reference_path)
+            if saved is None:
+                # Unreadable file: crop nothing until a new reference is taken
+                print(f"[ROI] Could not read tray reference {reference_path}. Using the full frame.")
+            else:
+                self.set_reference(cv2.cvtColor(saved, cv2.COLOR_BGR2RGB), save=False)
+
+    @property
+    def has_reference(self):
+        return self._reference is not None
+
+    def _prepare(self, rgb):
+        """RGB frame -> blurred grayscale at work_width"""
+        height, width = rgb.shape[:2]
+        scale = self.work_width / width
+        small = cv2.resize(rgb, (self.work_width, max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def set_reference(self, rgb, save=True):
+        """
+        Args:
+            rgb (np.ndarray): HxWx3 RGB frame of the empty tray.
+            save (bool): Also write it to reference_path.
+        """
+        self._reference = self._prepare(rgb)
+        if save:
+            os.makedirs(os.path.dirname(os.path.abspath(self.reference_path)), exist_ok=True)
+            cv2.imwrite(self.reference_path, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+        print(f"[ROI] Tray reference set ({rgb.shape[1]}x{rgb.shape[0]})")
+
+    def find(self, rgb):
+        """
+        Args:
+            rgb (np.ndarray): HxWx3 RGB frame with the tool on the tray.
+
+        Returns:
+            tuple: (left, top, right, bottom) in frame pixels, or None to keep the full frame.
+        """
+        if self._reference is None:
+            return None
+
+        gray = self._prepare(rgb)
+        if gray.shape != self._reference.shape:
+            print("[ROI] Frame size differs from the tray reference. Skipping crop.")
+            return None
+
+        # Changed pixels, cleaned of sensor noise and small gaps
+        diff = cv2.absdiff(gray, self._reference)
+        _, mask = cv2.threshold(diff, self.diff_threshold, 255, cv2.THRESH_BINARY)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self._kernel, iterations=2)
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        frame_area = mask.shape[0] * mask.shape[1]
+        # A tool can show up as several blobs (e.g. handle + head) - keep every significant one
+        blobs = [c for c in contours if cv2.contourArea(c) >= self.min_area * frame_area]
+        if not blobs:
+            return None
+
+        x, y, w, h = cv2.boundingRect(np.concatenate(blobs))
+        if w * h > self.max_area * frame_area:
+            print("[ROI] Most of the tray changed - reference is probably stale. Skipping crop.")
+            return None
+
+        # Pad, map back to full resolution, clamp to the frame
+        pad_x, pad_y = w * self.margin, h * self.margin
+        scale = rgb.shape[1] / mask.shape[1]
+        left = max(0, int((x - pad_x) * scale))
+        top = max(0, int((y - pad_y) * scale))
+        right = min(rgb.shape[1], int((x + w + pad_x) * scale))
+        bottom = min(rgb.shape[0], int((y + h + pad_y) * scale))
+        return left, top, right, bottom